@@ -0,0 +1,232 @@
+"""
+Benchmarks for transform_text(), compile_profile(), encode_tsf() and decode_tsf(), using synthetic TMUD profiles.
+
+Doesn't need a Discord connection, nor a .env file, and never touches the real cache. Run it with:
+
+    python src/benchmark.py [--iterations N] [--seed N] [--filter TEXT] [--output results.json] [--compare old.json]
+"""
+import argparse
+import atexit
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+# The bot's configuration is read on import, so it has to be set up before importing anything from the bot. The cache
+# always lives in a temporary directory, so the real data is never touched.
+os.environ["CACHE_PATH"] = tempfile.mkdtemp(prefix="transformate-benchmark-")
+os.environ.pop("SQLITE_PATH", None)
+atexit.register(shutil.rmtree, os.environ["CACHE_PATH"], True)
+for name, value in {"BOT_TOKEN": "benchmark", "WEBHOOK_NAME": "TransforMate", "BLOCKED_USERS": "[]",
+                    "USER_REPORTS_CHANNEL_ID": "0", "MAX_REGEN_USERS": "100", "STORAGE_BACKEND": "json"}.items():
+    os.environ.setdefault(name, value)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import utils
+
+WORDS: list[str] = ("the quick brown fox jumps over a lazy dog while hello there friend cat meow purr yes no maybe "
+                    "please thanks sorry okay really what why how when where who 42 2024 :3 <@123456789012345678> "
+                    "http://example.com/image.png wow nice cool fun game play run walk talk sing").split(" ")
+
+
+def make_message(length: int, rng: random.Random) -> str:
+    """
+    :param length: Roughly how many characters the message should have.
+    :param rng: Where to draw the words from.
+
+    :return: A message made out of random words, with some punctuation.
+    """
+    words = []
+    while sum(len(word) + 1 for word in words) < length:
+        word = rng.choice(WORDS)
+        words.append(word + rng.choice(["", "", "", ",", ".", "!", "?"]) if not word.startswith(("<", "http")) else word)
+    return " ".join(words)[:length]
+
+
+def make_profile(**changes) -> dict:
+    """
+    :param changes: The fields to change from the base profile.
+
+    :return: A TMUD-compliant server profile, with nothing but the given modifiers active.
+    """
+    profile = {
+        'blocked_channels': [],
+        'blocked_users': [],
+        'transformed_by': 1,
+        'into': "Benchmark",
+        'image_url': "https://example.com/avatar.png",
+        'claim': 0,
+        'eternal': False,
+        'prefix': {},
+        'suffix': {},
+        'big': False,
+        'small': False,
+        'hush': False,
+        'backwards': False,
+        'censor': {},
+        'sprinkle': {},
+        'muffle': {},
+        'alt_muffle': {},
+        'stutter': 0,
+        'bio': None
+    }
+    profile.update(changes)
+    return profile
+
+
+def make_profiles(rng: random.Random) -> dict[str, dict]:
+    """
+    :param rng: Where to draw the random parts of the profiles from.
+
+    :return: Every synthetic profile, keyed by name. Most of them use a single modifier, so each one can be measured on
+    its own, and the last few are realistic and worst-case combinations.
+    """
+    many_censors = {f"{rng.choice(WORDS)}{i}": f"censored{i}" for i in range(500)}
+    many_censors.update({word: "****" for word in WORDS[:20]})
+    regex_censors = {f"/{word[:3]}[a-z]*": "###" for word in WORDS[:40]}
+    regex_censors.update({f"-/{WORDS[i]} {WORDS[i + 1]}": "~~~" for i in range(10)})
+    return {
+        'none': make_profile(),
+        'prefix_suffix': make_profile(prefix={"*purrs* ": 50, "Meow, ": 30}, suffix={" :3": 50, " nya~": 40}),
+        'muffle': make_profile(muffle={"mmph": 30, "mrrf": 20, "hmm": 10}),
+        'sprinkle': make_profile(sprinkle={"uwu": 20, "owo": 20, "nya": 10}),
+        'stutter': make_profile(stutter=60),
+        'alt_muffle': make_profile(alt_muffle={"*meows*": 5, "*purrs*": 5}),
+        'censor_literal': make_profile(censor=many_censors),
+        'censor_regex': make_profile(censor=regex_censors),
+        'small_backwards': make_profile(small=True, backwards=True),
+        'big_hush': make_profile(big=True, hush=True),
+        'realistic': make_profile(prefix={"*purrs* ": 20}, suffix={" :3": 30}, sprinkle={"nya": 10},
+                                  muffle={"mrrp": 5}, stutter=20,
+                                  censor={"hello": "meow", "friend": "fren", "/[Ss]orry": "sowwy"}),
+        'worst_case': make_profile(prefix={f"p{i} ": 90 for i in range(10)}, suffix={f" s{i}": 90 for i in range(10)},
+                                   sprinkle={f"sp{i}": 80 for i in range(20)}, muffle={f"mf{i}": 80 for i in range(20)},
+                                   stutter=100, censor=many_censors | regex_censors, small=True, backwards=True,
+                                   alt_muffle={"*silence*": 0.1})
+    }
+
+
+def percentile(samples: list[float], fraction: float) -> float:
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def measure(function, iterations: int) -> dict:
+    """
+    Runs a function many times, timing every run.
+
+    :param function: The function to run, without any arguments.
+    :param iterations: How many times to run it.
+
+    :return: The throughput (in operations per second) and latency percentiles (in microseconds) of the function.
+    """
+    function()  # Warm up
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter_ns()
+        function()
+        samples.append((time.perf_counter_ns() - start) / 1000)
+    samples.sort()
+    return {
+        'iterations': iterations,
+        'ops_per_sec': round(1_000_000 * iterations / sum(samples), 1) if sum(samples) else float('inf'),
+        'mean_us': round(statistics.fmean(samples), 2),
+        'p50_us': round(percentile(samples, 0.5), 2),
+        'p90_us': round(percentile(samples, 0.9), 2),
+        'p99_us': round(percentile(samples, 0.99), 2),
+        'max_us': round(samples[-1], 2)
+    }
+
+
+def run(iterations: int, seed: int, name_filter: str = "") -> list[dict]:
+    """
+    Runs every benchmark.
+
+    :param iterations: How many times to run each benchmark.
+    :param seed: The seed for the synthetic data and for the transformations themselves.
+    :param name_filter: Only run the benchmarks whose name contains this text.
+
+    :return: A list with the results of each benchmark.
+    """
+    rng = random.Random(seed)
+    profiles = make_profiles(rng)
+    messages = {'short': make_message(60, rng), 'medium': make_message(400, rng), 'long': make_message(2000, rng)}
+
+    benchmarks = []
+    for profile_name, profile in profiles.items():
+        plan = utils.compile_profile(profile)
+        benchmarks.append((f"compile_profile/{profile_name}", lambda profile=profile: utils.compile_profile(profile)))
+        for message_name, message in messages.items():
+            sequential = random.Random(seed)
+            benchmarks.append((f"transform_text/{profile_name}/{message_name}/sequential",
+                               lambda plan=plan, message=message, rng=sequential:
+                               utils.transform_text(plan, message, rng=rng)))
+            batched = utils.BatchRandom(seed)
+            benchmarks.append((f"transform_text/{profile_name}/{message_name}/batched",
+                               lambda plan=plan, message=message, rng=batched:
+                               utils.transform_text(plan, message, rng=rng)))
+        benchmarks.append((f"transform_text/{profile_name}/long/uncompiled",
+                           lambda profile=profile, rng=random.Random(seed):
+                           utils.transform_text(profile, messages['long'], rng=rng)))
+        tsf = utils.encode_tsf(profile)
+        benchmarks.append((f"encode_tsf/{profile_name}", lambda profile=profile: utils.encode_tsf(profile)))
+        benchmarks.append((f"decode_tsf/{profile_name}", lambda tsf=tsf: utils.decode_tsf(tsf)))
+
+    results = []
+    for name, function in benchmarks:
+        if name_filter not in name:
+            continue
+        result = {'name': name} | measure(function, iterations)
+        results.append(result)
+        print(f"{name:<60} {result['ops_per_sec']:>12.1f} ops/s   p50 {result['p50_us']:>10.2f} us   "
+              f"p99 {result['p99_us']:>10.2f} us")
+    return results
+
+
+def compare(results: list[dict], path: str) -> None:
+    """
+    Prints how much faster (or slower) each benchmark got since a previous run.
+
+    :param results: The results of this run.
+    :param path: The JSON file with the results of the previous run.
+
+    :return: This function does not return anything.
+    """
+    with open(path, "r") as f:
+        previous = {result['name']: result for result in json.load(f)['results']}
+    print(f"\nCompared to {path}:")
+    for result in results:
+        if result['name'] not in previous or not previous[result['name']]['p50_us']:
+            continue
+        speedup = previous[result['name']]['p50_us'] / result['p50_us'] if result['p50_us'] else float('inf')
+        print(f"{result['name']:<60} {speedup:>8.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark TransforMate's text transformations")
+    parser.add_argument("--iterations", type=int, default=200, help="How many times to run each benchmark")
+    parser.add_argument("--seed", type=int, default=1234, help="Seed for the synthetic data and the transformations")
+    parser.add_argument("--filter", default="", help="Only run the benchmarks whose name contains this text")
+    parser.add_argument("--output", help="Save the results to this JSON file")
+    parser.add_argument("--compare", help="Compare the results to a previous JSON file")
+    args = parser.parse_args()
+
+    benchmark_results = run(args.iterations, args.seed, args.filter)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'numpy': utils.numpy is not None,
+                'seed': args.seed,
+                'iterations': args.iterations,
+                'results': benchmark_results
+            }, f, indent=4)
+        print(f"\nSaved results to \"{args.output}\"")
+    if args.compare:
+        compare(benchmark_results, args.compare)
@@ -3,6 +3,7 @@ from discord.ext import commands
 
 import utils
 from config import WEBHOOK_NAME, MAX_REGEN_USERS
+from loop_watchdog import loop_watchdog
 
 
 class Admin(commands.Cog):
@@ -18,6 +19,7 @@ class Admin(commands.Cog):
         for wh in await ctx.guild.webhooks():
             if wh.name == WEBHOOK_NAME:  # Delete only our webhooks, which all *should* have the same name
                 await wh.delete()
+        utils.invalidate_webhooks(ctx.guild.channels, WEBHOOK_NAME)
         await ctx.respond("All webhooks have been deleted! The bot will regenerate them as needed.", ephemeral=True)
 
     @admin_command.command(description="(Un)block a channel from having users being transformed in")
@@ -27,8 +29,8 @@ class Admin(commands.Cog):
                             channel: discord.Option(discord.TextChannel) = None) -> None:
         if channel is None:
             channel = ctx.channel
-        utils.write_transformed(ctx.guild, block_channel=channel)
-        data = utils.load_transformed(ctx.guild)['blocked_channels']
+        await utils.write_transformed_async(ctx.guild, block_channel=channel)
+        data = (await utils.load_transformed_async(ctx.guild))['blocked_channels']
         word = "blocked" if str(channel.id) in data else "unblocked"
         await ctx.respond(f"{channel.mention} has been {word}!", ephemeral=True)
 
@@ -37,8 +39,8 @@ class Admin(commands.Cog):
     async def block_user(self,
                          ctx: discord.ApplicationContext,
                          user: discord.Option(discord.User)) -> None:
-        utils.write_transformed(ctx.guild, block_user=user)
-        data = utils.load_transformed(ctx.guild)['blocked_users']
+        await utils.write_transformed_async(ctx.guild, block_user=user)
+        data = (await utils.load_transformed_async(ctx.guild))['blocked_users']
         word = "blocked" if str(user.id) in data else "unblocked"
         await ctx.respond(f"{user.mention} has been {word}!", ephemeral=True)
 
@@ -49,9 +51,7 @@ class Admin(commands.Cog):
                              category: discord.Option(discord.CategoryChannel) = None) -> None:
         if category is None:
             category = ctx.channel.category
-        for channel in category.channels:
-            utils.write_transformed(ctx.guild, block_channel=channel)
-        data = utils.load_transformed(ctx.guild)['blocked_channels']
+        data = await utils.block_server_channels_async(ctx.guild, category.channels)
         word = "blocked" if str(category.channels[0].id) in data else "unblocked"
         await ctx.respond(f"{category.mention} has been {word}!", ephemeral=True)
 
@@ -59,7 +59,7 @@ class Admin(commands.Cog):
     @discord.default_permissions(administrator=True)
     async def list_blocked_channels(self,
                                     ctx: discord.ApplicationContext) -> None:
-        data = utils.load_transformed(ctx.guild)
+        data = await utils.load_transformed_async(ctx.guild)
         blocked_channels = [ctx.guild.get_channel(int(channel)).mention for channel in data['blocked_channels']]
 
         embed = utils.get_embed_base(title="Blocked Channels",
@@ -71,7 +71,7 @@ class Admin(commands.Cog):
     @discord.default_permissions(administrator=True)
     async def list_blocked_users(self,
                                  ctx: discord.ApplicationContext) -> None:
-        data = utils.load_transformed(ctx.guild)
+        data = await utils.load_transformed_async(ctx.guild)
         blocked_users = [ctx.guild.get_member(int(user)).mention for user in data['blocked_users']]
 
         embed = utils.get_embed_base(title="Blocked Users",
@@ -95,7 +95,7 @@ class Admin(commands.Cog):
                     claim.id if claim is not None else None]
         else:
             logs = [all.id, all.id, all.id, all.id]
-        utils.write_transformed(ctx.guild, logs=logs)
+        await utils.write_transformed_async(ctx.guild, logs=logs)
         await ctx.respond("Log channels have been set up!", ephemeral=True)
 
     @admin_command.command(description="Update the bot's settings")
@@ -108,9 +108,9 @@ class Admin(commands.Cog):
                               image_buffer: discord.Option(discord.SlashCommandOptionType.channel,
                                                            description="Channel to send transformed user images to when "
                                                                        "a buffer is necessary.") = None) -> None:
-        utils.write_transformed(ctx.guild,
-                                clear_other_logs=clean_logs,
-                                images=image_buffer.id if image_buffer else None)
+        await utils.write_transformed_async(ctx.guild,
+                                            clear_other_logs=clean_logs,
+                                            images=image_buffer.id if image_buffer else None)
         await ctx.respond("Bot settings have been updated!\n-# We recommend running /admin regen_server_files after "
                           "updating your settings, but BE CAREFUL, since this command REMOVES ALL TRANSFORMED USERS "
                           "DATA IN YOUR SERVER.", ephemeral=True)
@@ -130,7 +130,8 @@ class Admin(commands.Cog):
             await ctx.respond("You haven't verified that you're *actually* sure about doing this! Please try again!")
             return
         for user in ctx.guild.members:
-            utils.remove_all_server_tf(user, ctx.guild)
+            await utils.remove_all_server_tf_async(user, ctx.guild, forget_messages=False)
+        utils.forget_provenance(guild=ctx.guild)
         await ctx.respond("Server TFs have been regenerated!")
 
     @admin_command.command(description="Regenerate a user's tf for this server")
@@ -143,9 +144,29 @@ class Admin(commands.Cog):
         if not (sure and really_sure):
             await ctx.respond("You haven't verified that you're *actually* sure about doing this! Please try again!")
             return
-        utils.remove_all_server_tf(user, ctx.guild)
+        await utils.remove_all_server_tf_async(user, ctx.guild)
         await ctx.respond(f"Server TFs have been regenerated for {user.mention}!")
 
+    @admin_command.command(description="See how responsive the bot is, and what's slowing it down")
+    @discord.default_permissions(administrator=True)
+    async def lag(self,
+                  ctx: discord.ApplicationContext) -> None:
+        stats = loop_watchdog.stats()
+        embed = utils.get_embed_base(title="Event Loop Lag",
+                                     desc=f"Measured {stats['samples']} times, blocked {stats['blocks']} times")
+        embed.add_field(name="Average", value=f"{stats['lag_avg'] * 1000:.1f}ms")
+        embed.add_field(name="p50", value=f"{stats['lag_p50'] * 1000:.1f}ms")
+        embed.add_field(name="p95", value=f"{stats['lag_p95'] * 1000:.1f}ms")
+        embed.add_field(name="p99", value=f"{stats['lag_p99'] * 1000:.1f}ms")
+        embed.add_field(name="Max", value=f"{stats['lag_max'] * 1000:.1f}ms")
+        for site in loop_watchdog.top_sites():
+            stack = "".join(site.stack[-3:])[-900:]  # Embed fields can only be 1024 characters long
+            embed.add_field(name=f"`{site.name}`",
+                            value=f"Blocked {site.count} times, for {site.total:.2f}s in total "
+                                  f"(up to {site.max:.2f}s at once)" + (f"\n```{stack}```" if stack else ""),
+                            inline=False)
+        await ctx.respond(embed=embed, ephemeral=True)
+
 
 def setup(bot: discord.Bot) -> None:
     bot.add_cog(Admin(bot))
@@ -3,6 +3,8 @@ from discord.ext import commands
 
 import utils
 
+NOT_TRANSFORMED: str = "You're not transformed in this server, so there's nothing to block things on!"
+
 
 class Block(commands.Cog):
     def __init__(self, bot):
@@ -21,21 +23,22 @@ class Block(commands.Cog):
                                                    "Blocks all channels on this server" +
                                                    "(does not unvblock any channels)") = False) -> None:
         if all_channels:
-            blocked_channels = utils.load_tf(ctx.user, ctx.guild)['blocked_channels']
-            for channel in ctx.guild.text_channels:
-                if channel.id not in blocked_channels:
-                    utils.write_tf(ctx.author, ctx.guild, block_channel=channel)
+            if await utils.block_channels_async(ctx.author, ctx.guild, ctx.guild.text_channels, mode="add") is None:
+                await ctx.respond(NOT_TRANSFORMED, ephemeral=True)
+                return
             await ctx.respond("Blocked all channels on this server!")
             return
         if invert:
-            for channel in ctx.guild.text_channels:
-               utils.write_tf(ctx.author, ctx.guild, block_channel=channel)
+            if await utils.block_channels_async(ctx.author, ctx.guild, ctx.guild.text_channels, mode="toggle") is None:
+                await ctx.respond(NOT_TRANSFORMED, ephemeral=True)
+                return
             await ctx.respond("Inverted your blocked channels!")
             return
         if channel is None:
             channel = ctx.channel
-        utils.write_tf(ctx.author, ctx.guild, block_channel=channel)
-        word = "yourself" if str(channel.id) in utils.load_tf(ctx.user, ctx.guild)['blocked_channels'] else "transformed"
+        await utils.write_tf_async(ctx.author, ctx.guild, block_channel=channel)
+        blocked_channels = (await utils.load_tf_async(ctx.user, ctx.guild))['blocked_channels']
+        word = "yourself" if str(channel.id) in blocked_channels else "transformed"
         channel_word = "this channel" if channel == ctx.channel else channel.mention
         await ctx.respond(f"You will now be {word} in {channel_word}! (Use this same command to revert this)")
 
@@ -50,21 +53,21 @@ class Block(commands.Cog):
                                                 "Blocks all users on this server" +
                                                 "(does not unvblock any users)") = False) -> None:
         if all_users:
-            blocked_users = utils.load_tf(ctx.user, ctx.guild)['blocked_users']
-            for member in ctx.guild.members:
-                if member.id not in blocked_users:
-                    utils.write_tf(ctx.author, ctx.guild, block_user=member)
+            if await utils.block_users_async(ctx.author, ctx.guild, ctx.guild.members, mode="add") is None:
+                await ctx.respond(NOT_TRANSFORMED, ephemeral=True)
+                return
             await ctx.respond("Blocked all users on this server!")
             return
         if invert:
-            for member in ctx.guild.members:
-               utils.write_tf(ctx.author, ctx.guild, block_user=member)
+            if await utils.block_users_async(ctx.author, ctx.guild, ctx.guild.members, mode="toggle") is None:
+                await ctx.respond(NOT_TRANSFORMED, ephemeral=True)
+                return
             await ctx.respond("Inverted your blocked users!")
             return
         if user is None:
             await ctx.respond("You must specify a user to (un)block!", ephemeral=True)
-        utils.write_tf(ctx.author, ctx.guild, block_user=user)
-        word = "unblocked" if user.id in utils.load_tf(ctx.user, ctx.guild)['blocked_users'] else "blocked"
+        await utils.write_tf_async(ctx.author, ctx.guild, block_user=user)
+        word = "unblocked" if user.id in (await utils.load_tf_async(ctx.user, ctx.guild))['blocked_users'] else "blocked"
         await ctx.respond(f"{user.mention} has been {word} from interacting with you! (Use this same command to revert this)")
 
     @block_command.command(description="Set a channel category where you just wanna be yourself")
@@ -73,9 +76,11 @@ class Block(commands.Cog):
                        category: discord.CategoryChannel = None) -> None:
         if category is None:
             category = ctx.channel.category
-        for channel in category.channels:
-            utils.write_tf(ctx.author, ctx.guild, block_channel=channel)
-        word = "yourself" if str(category.channels[0].id) in utils.load_tf(ctx.user, ctx.guild)['blocked_channels'] else "transformed"
+        blocked_channels = await utils.block_channels_async(ctx.author, ctx.guild, category.channels)
+        if blocked_channels is None:
+            await ctx.respond(NOT_TRANSFORMED, ephemeral=True)
+            return
+        word = "yourself" if str(category.channels[0].id) in blocked_channels else "transformed"
         category_word = "this channel" if category == ctx.channel.category else category.mention
         await ctx.respond(f"You will now be {word} in {category_word}! (Use this same command to revert this)")
 
@@ -17,21 +17,22 @@ class Clear(commands.Cog):
         valid, data, user = await utils.extract_tf_data(ctx, user)
         if not valid:
             return
-        utils.write_tf(user,
-                       ctx.guild,
-                       claim_user=None,
-                       eternal=False,
-                       prefix="",
-                       suffix="",
-                       big=False,
-                       small=False,
-                       hush=False,
-                       backwards=False,
-                       censor="",
-                       sprinkle="",
-                       muffle="",
-                       alt_muffle="",
-                       bio="")
+        await utils.write_tf_async(user,
+                                   ctx.guild,
+                                   claim_user=None,
+                                   eternal=False,
+                                   prefix="",
+                                   suffix="",
+                                   big=False,
+                                   small=False,
+                                   hush=False,
+                                   backwards=False,
+                                   censor="",
+                                   sprinkle="",
+                                   muffle="",
+                                   alt_muffle="",
+                                   bio="")
+        utils.forget_provenance(user, ctx.guild)  # Which proxied messages are theirs is part of their data too
         await ctx.respond(f"{user.mention} has been cleared of all settings!")
 
     @clear_command.command(description="Clear the prefix for the transformed messages")
@@ -54,7 +55,7 @@ class Clear(commands.Cog):
                     await ctx.respond(f"{user.mention} doesn't have that prefix set!")
                     return
             prefix = "$/-" + prefix
-        utils.write_tf(user, ctx.guild, prefix=prefix)
+        await utils.write_tf_async(user, ctx.guild, prefix=prefix)
         await ctx.respond(f"Prefix for {user.mention} has been cleared!")
 
     @clear_command.command(description="Clear the suffix for the transformed messages")
@@ -77,7 +78,7 @@ class Clear(commands.Cog):
                     await ctx.respond(f"{user.mention} doesn't have that suffix set!")
                     return
             suffix = "$/-" + suffix
-        utils.write_tf(user, ctx.guild, suffix=suffix)
+        await utils.write_tf_async(user, ctx.guild, suffix=suffix)
         await ctx.respond(f"Suffix for {user.mention} has been cleared!")
 
     @clear_command.command(description="Clear the big text setting for the transformed messages")
@@ -90,7 +91,7 @@ class Clear(commands.Cog):
         if not data['big']:
             await ctx.respond(f"{user.mention} doesn't have big text set!")
             return
-        utils.write_tf(user, ctx.guild, big=False)
+        await utils.write_tf_async(user, ctx.guild, big=False)
         await ctx.respond(f"{user.mention} will no longer speak in big text!")
 
     @clear_command.command(description="Clear the small text setting for the transformed messages")
@@ -103,7 +104,7 @@ class Clear(commands.Cog):
         if not data['small']:
             await ctx.respond(f"{user.mention} doesn't have small text set!")
             return
-        utils.write_tf(user, ctx.guild, small=False)
+        await utils.write_tf_async(user, ctx.guild, small=False)
         await ctx.respond(f"{user.mention} will no longer speak in small text!")
 
     @clear_command.command(description="Clear hush setting")
@@ -116,7 +117,7 @@ class Clear(commands.Cog):
         if not data['hush']:
             await ctx.respond(f"{user.mention} doesn't have hush text set!")
             return
-        utils.write_tf(user, ctx.guild, hush=False)
+        await utils.write_tf_async(user, ctx.guild, hush=False)
         await ctx.respond(f"{user.mention} will no longer hush!")
 
     @clear_command.command(description="Clear backwards setting")
@@ -129,7 +130,7 @@ class Clear(commands.Cog):
         if not data['backwards']:
             await ctx.respond(f"{user.mention} doesn't have backwards text set!")
             return
-        utils.write_tf(user, ctx.guild, backwards=False)
+        await utils.write_tf_async(user, ctx.guild, backwards=False)
         await ctx.respond(f"{user.mention} will no longer speak backwards!")
 
     @clear_command.command(description="Clear censor setting")
@@ -149,7 +150,7 @@ class Clear(commands.Cog):
                 await ctx.respond(f"{user.mention} is not censored with the word \"{censor}\"!")
                 return
             censor = "$/-" + censor
-        utils.write_tf(user, ctx.guild, censor=censor)
+        await utils.write_tf_async(user, ctx.guild, censor=censor)
         await ctx.respond(f"{user.mention} will no longer have a censor set!")
 
     @clear_command.command(description="Clear sprinkle setting")
@@ -170,7 +171,7 @@ class Clear(commands.Cog):
                 await ctx.respond(f"{user.mention} doesn't have that sprinkle set!")
                 return
             sprinkle = "$/-" + sprinkle
-        utils.write_tf(user, ctx.guild, sprinkle=sprinkle)
+        await utils.write_tf_async(user, ctx.guild, sprinkle=sprinkle)
         await ctx.respond(f"{user.mention} will no longer have a sprinkle set!")
 
     @clear_command.command(description="Clear muffle settings")
@@ -190,15 +191,15 @@ class Clear(commands.Cog):
             if not muffle in data['muffle']:
                 if muffle in data['alt_muffle']:
                     muffle = "$/-" + muffle
-                    utils.write_tf(user, ctx.guild, alt_muffle=muffle)
+                    await utils.write_tf_async(user, ctx.guild, alt_muffle=muffle)
                     await ctx.respond(f"{user.mention} will no longer have a muffle set!")
                     return
                 await ctx.respond(f"{user.mention} doesn't have that muffle set!")
                 return
             muffle = "$/-" + muffle
-        utils.write_tf(user, ctx.guild, muffle=muffle)
+        await utils.write_tf_async(user, ctx.guild, muffle=muffle)
         if muffle == "":
-            utils.write_tf(user, ctx.guild, alt_muffle="")
+            await utils.write_tf_async(user, ctx.guild, alt_muffle="")
         await ctx.respond(f"{user.mention} will no longer have a muffle set!")
 
     @clear_command.command(description="Clear eternal setting")
@@ -211,7 +212,7 @@ class Clear(commands.Cog):
         if not data['eternal']:
             await ctx.respond(f"{user.mention} isn't eternally transformed!")
             return
-        utils.write_tf(user, ctx.guild, eternal=False)
+        await utils.write_tf_async(user, ctx.guild, eternal=False)
         await ctx.respond(f"{user.mention} is no longer eternally transformed!")
 
     @clear_command.command(description="Clear a user's biography")
@@ -224,7 +225,7 @@ class Clear(commands.Cog):
         if data['bio'] in ["", None]:
             await ctx.respond(f"{user.mention} doesn't have a biography set!")
             return
-        utils.write_tf(user, ctx.guild, bio="")
+        await utils.write_tf_async(user, ctx.guild, bio="")
         await ctx.respond(f"{user.mention}'s biography has been cleared!")
 
 
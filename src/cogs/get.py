@@ -244,7 +244,7 @@ class Get(commands.Cog):
     @get_command.command(description="Get a list of transformed users")
     async def transformed(self,
                           ctx: discord.ApplicationContext) -> None:
-        tfee_data = utils.load_transformed(ctx.guild)['transformed_users']
+        tfee_data = (await utils.load_transformed_async(ctx.guild))['transformed_users']
         if tfee_data == {}:
             await ctx.respond("No one is transformed in this server, at the moment!")
             return
@@ -252,7 +252,7 @@ class Get(commands.Cog):
         users: int = 0
         desc: str = ""
         for tfee in tfee_data:
-            transformed_data = utils.load_tf(int(tfee), ctx.guild)
+            transformed_data = await utils.load_tf_async(int(tfee), ctx.guild)
             if transformed_data == {}:
                 continue
             into = transformed_data['into']
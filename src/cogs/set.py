@@ -25,7 +25,7 @@ class Set(commands.Cog):
         if not valid:
             return
         prefix += (" " * whitespace)
-        utils.write_tf(user, ctx.guild, prefix=prefix, chance=chance)
+        await utils.write_tf_async(user, ctx.guild, prefix=prefix, chance=chance)
         await ctx.respond(f"Prefix for {user.mention} set to \"{prefix.strip()}\"!")
 
     @set_command.command(description="Set a suffix for the transformed messages")
@@ -43,7 +43,7 @@ class Set(commands.Cog):
         if not valid:
             return
         suffix = (" " * whitespace) + suffix
-        utils.write_tf(user, ctx.guild, suffix=suffix, chance=chance)
+        await utils.write_tf_async(user, ctx.guild, suffix=suffix, chance=chance)
         await ctx.respond(f"Suffix for {user.mention} set to \"{suffix.strip()}\"!")
 
     @set_command.command(description="Set the transformed user to speak in big text")
@@ -56,7 +56,7 @@ class Set(commands.Cog):
         if data['big']:
             await ctx.respond(f"{user.mention} is already speaking big!")
             return
-        utils.write_tf(user, ctx.guild, big=True)
+        await utils.write_tf_async(user, ctx.guild, big=True)
         await ctx.respond(f"{user.mention} will now speak in big text!")
 
     @set_command.command(description="Set the transformed user to speak in small text")
@@ -69,7 +69,7 @@ class Set(commands.Cog):
         if data['small']:
             await ctx.respond(f"{user.mention} is already speaking small!")
             return
-        utils.write_tf(user, ctx.guild, small=True)
+        await utils.write_tf_async(user, ctx.guild, small=True)
         await ctx.respond(f"{user.mention} will now speak in small text!")
 
     @set_command.command(description="Set the transformed user to hush")
@@ -82,7 +82,7 @@ class Set(commands.Cog):
         if data['hush']:
             await ctx.respond(f"{user.mention} is already hushed!")
             return
-        utils.write_tf(user, ctx.guild, hush=True)
+        await utils.write_tf_async(user, ctx.guild, hush=True)
         await ctx.respond(f"{user.mention} will now hush!")
 
     @set_command.command(description="Set the transformed user to speak backwards")
@@ -95,7 +95,7 @@ class Set(commands.Cog):
         if data['backwards']:
             await ctx.respond(f"{user.mention} is already speaking backwards!")
             return
-        utils.write_tf(user, ctx.guild, backwards=True)
+        await utils.write_tf_async(user, ctx.guild, backwards=True)
         await ctx.respond(f"{user.mention} will now speak backwards!")
 
     @set_command.command(description="Set the transformed user to be eternally transformed")
@@ -111,10 +111,10 @@ class Set(commands.Cog):
         if data['eternal']:
             await ctx.respond(f"{user.mention} is already eternally transformed!")
             return
-        utils.write_tf(user, ctx.guild, eternal=True)
+        await utils.write_tf_async(user, ctx.guild, eternal=True)
         await ctx.respond(f"{user.mention} is now eternally transformed!")
 
-        transformed_data = utils.load_transformed(ctx.guild)
+        transformed_data = await utils.load_transformed_async(ctx.guild)
         if transformed_data['logs'][3]:
             embed = utils.get_embed_base(title="User Eternally Transformed", color=discord.Color.gold())
             embed.add_field(name="User", value=user.mention)
@@ -133,7 +133,7 @@ class Set(commands.Cog):
         valid, data, user = await utils.extract_tf_data(ctx, user)
         if not valid:
             return
-        utils.write_tf(user, ctx.guild, censor=censor, censor_replacement=replacement)
+        await utils.write_tf_async(user, ctx.guild, censor=censor, censor_replacement=replacement)
         await ctx.respond(f"{user.mention} will now have the word \"{censor}\" censored to \"{replacement}\"!")
 
     @set_command.command(description="Set the transformed user to have specific words sprinkled in their messages")
@@ -147,7 +147,7 @@ class Set(commands.Cog):
         valid, data, user = await utils.extract_tf_data(ctx, user)
         if not valid:
             return
-        utils.write_tf(user, ctx.guild, sprinkle=sprinkle, chance=chance)
+        await utils.write_tf_async(user, ctx.guild, sprinkle=sprinkle, chance=chance)
         await ctx.respond(f"{user.mention} will now have the word \"{sprinkle}\" sprinkled in their messages!")
 
     @set_command.command(description="Set the transformed user to have their words/messages randomly replaced with a "
@@ -165,10 +165,10 @@ class Set(commands.Cog):
         if not valid:
             return
         if alt:
-            utils.write_tf(user, ctx.guild, alt_muffle=muffle, chance=chance)
+            await utils.write_tf_async(user, ctx.guild, alt_muffle=muffle, chance=chance)
             await ctx.respond(f"{user.mention} will now have their messages muffled with \"{muffle}\"!")
             return
-        utils.write_tf(user, ctx.guild, muffle=muffle, chance=chance)
+        await utils.write_tf_async(user, ctx.guild, muffle=muffle, chance=chance)
         await ctx.respond(f"{user.mention} will now have their words muffled with \"{muffle}\"!")
 
     @set_command.command(description="Set the transformed user to stutter on random words, with a certain chance")
@@ -180,7 +180,7 @@ class Set(commands.Cog):
         valid, data, user = await utils.extract_tf_data(ctx, user)
         if not valid:
             return
-        utils.write_tf(user, ctx.guild, stutter=chance)
+        await utils.write_tf_async(user, ctx.guild, stutter=chance)
         await ctx.respond(f"{user.mention} will now stutter when talking!")
 
     @set_command.command(description="Set a biography for the transformed user")
@@ -192,7 +192,7 @@ class Set(commands.Cog):
         valid, data, user = await utils.extract_tf_data(ctx, user)
         if not valid:
             return
-        utils.write_tf(user, ctx.guild, bio=biography)
+        await utils.write_tf_async(user, ctx.guild, bio=biography)
         await ctx.respond(f"{user.mention}'s biography has been set!")
 
     @set_command.command(description="Set the nickname for the transformed user to their transformed name")
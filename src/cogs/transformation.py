@@ -26,14 +26,14 @@ async def transform_function(ctx: discord.ApplicationContext,
             return False
 
     if image_url:
-        image_url = utils.check_url(image_url)
+        image_url = await utils.check_url_async(image_url)
         if image_url == "":
             await ctx.respond("Invalid Image URL! Please provide a valid image URL!")
             return False
 
     if copy is not None:
-        old_data = utils.load_tf(user, ctx.guild)
-        new_data = utils.load_tf(copy, ctx.guild)
+        old_data = await utils.load_tf_async(user, ctx.guild)
+        new_data = await utils.load_tf_async(copy, ctx.guild)
         if new_data == {}:
             return await transform_function(ctx, user, copy.display_name, copy.avatar.url)
         new_data['blocked_channels'] = old_data['blocked_channels'] if 'blocked_channels' in old_data else []
@@ -47,8 +47,8 @@ async def transform_function(ctx: discord.ApplicationContext,
         new_data['transformed_by'] = ctx.author.id
         new_data['claim'] = 0
         new_data['eternal'] = False
-        utils.write_tf(user, ctx.guild, new_data=new_data)
-        utils.write_transformed(ctx.guild, user)
+        await utils.write_tf_async(user, ctx.guild, new_data=new_data)
+        await utils.write_transformed_async(ctx.guild, user)
         return True
 
     if not into:
@@ -58,14 +58,14 @@ async def transform_function(ctx: discord.ApplicationContext,
         # Defaults to their avatar, or, if they lack one, to the default Discord avatar
         image_url = user.avatar.url if user.avatar is not None else "https://cdn.discordapp.com/embed/avatars/1.png"
 
-    utils.write_tf(user,
-                   ctx.guild,
-                   transformed_by=ctx.author,
-                   into=into.strip(),
-                   image_url=image_url)
-    utils.write_transformed(ctx.guild, user)
+    await utils.write_tf_async(user,
+                               ctx.guild,
+                               transformed_by=ctx.author,
+                               into=into.strip(),
+                               image_url=image_url)
+    await utils.write_transformed_async(ctx.guild, user)
 
-    transformed_data = utils.load_transformed(ctx.guild)
+    transformed_data = await utils.load_transformed_async(ctx.guild)
     if transformed_data['logs'][2]:
         embed = discord.Embed(title="Transformed User", color=discord.Color.green())
         embed.add_field(name="User", value=user.mention)
@@ -109,16 +109,16 @@ class Transformation(commands.Cog):
             await ctx.respond("You can't transform that user at all! They've been very naughty...", ephemeral=True)
             return
 
-        data = utils.load_tf(user, ctx.guild)
+        data = await utils.load_tf_async(user, ctx.guild)
         if data != {} and str(ctx.channel.id) in data['blocked_channels']: # Blocked channels (user)
             await ctx.respond(f"You can't transform {user.mention} in this channel!"
                               "They have blocked the bot here!", ephemeral=True)
             return
 
-        transformed_data = utils.load_transformed(ctx.guild)
+        transformed_data = await utils.load_transformed_async(ctx.guild)
         if transformed_data == {}:
-            utils.write_transformed(ctx.guild)
-            transformed_data = utils.load_transformed(ctx.guild)
+            await utils.write_transformed_async(ctx.guild)
+            transformed_data = await utils.load_transformed_async(ctx.guild)
         if str(ctx.channel.id) in transformed_data['blocked_channels']: # Blocked channels (server)
             await ctx.respond("You can't use the bot, at least on this channel!", ephemeral=True)
             return
@@ -130,7 +130,7 @@ class Transformation(commands.Cog):
             await ctx.respond("That user can't use the bot, at least on this server!", ephemeral=True)
             return
 
-        if utils.is_transformed(user, ctx.guild):
+        if await utils.is_transformed_async(user, ctx.guild):
             if data == {}: # This is to avoid https://github.com/dorythecat/TransforMate/issues/25
                 data['claim'] = 0
             if data['claim'] != 0 and int(data['claim']) != ctx.author.id and data['eternal']:
@@ -170,7 +170,7 @@ class Transformation(commands.Cog):
         file_url = None
         if response.attachments:
             file_url = response.attachments[0].url
-            if utils.is_transformed(ctx.author, ctx.guild):
+            if await utils.is_transformed_async(ctx.author, ctx.guild):
                 # Solution to https://github.com/dorythecat/TransforMate/issues/16
                 image_channel = transformed_data['images']
                 if not image_channel:
@@ -204,26 +204,26 @@ class Transformation(commands.Cog):
         if user is None:
             user = ctx.author
 
-        transformed_data = utils.load_transformed(ctx.guild)
+        transformed_data = await utils.load_transformed_async(ctx.guild)
         if transformed_data == {}:
             await ctx.respond(f"{user.mention} is not transformed at the moment!")
             return
 
-        data = utils.load_tf(user, ctx.guild)
+        data = await utils.load_tf_async(user, ctx.guild)
         channel = None
         if data == {}:
             await ctx.respond(f"{user.mention} is not transformed at the moment, and has no form to go back to! "
                               "(At least on this channel)")
             return
 
-        if not utils.is_transformed(user, ctx.guild):
+        if not await utils.is_transformed_async(user, ctx.guild):
             if data['into'] in ["", None]:
                 await ctx.respond(f"{user.mention} is not transformed at the moment, and has no form to go back to!")
                 return
-            utils.write_transformed(ctx.guild, user, channel)
+            await utils.write_transformed_async(ctx.guild, user, channel)
             await ctx.respond(f"{user.mention} has been turned back to their last form!")
 
-            transformed_data = utils.load_transformed(ctx.guild)
+            transformed_data = await utils.load_transformed_async(ctx.guild)
             if transformed_data['logs'][2]:
                 embed = utils.get_embed_base(title="Transformed User", color=discord.Color.green())
                 embed.add_field(name="User", value=user.mention)
@@ -241,10 +241,10 @@ class Transformation(commands.Cog):
             await ctx.respond("Your master won't allow you to turn back, at least for now...")
             return
 
-        utils.remove_transformed(user, ctx.guild)
+        await utils.remove_transformed_async(user, ctx.guild)
         await ctx.respond(f"{user.mention} has been turned back to normal!")
 
-        transformed_data = utils.load_transformed(ctx.guild)
+        transformed_data = await utils.load_transformed_async(ctx.guild)
         if transformed_data['logs'][2]:
             embed = utils.get_embed_base(title="Transformed User", color=discord.Color.green())
             embed.add_field(name="User", value=user.mention)
@@ -259,11 +259,11 @@ class Transformation(commands.Cog):
         if user == ctx.author:
             await ctx.respond("You can't claim yourself!")
             return
-        if not utils.is_transformed(user, ctx.guild,):
+        if not await utils.is_transformed_async(user, ctx.guild,):
             # TODO: https://github.com/dorythecat/TransforMate/issues/35
             await ctx.respond(f"{user.mention} is not transformed at the moment, you can't claim them!")
             return
-        data = utils.load_tf(user, ctx.guild)
+        data = await utils.load_tf_async(user, ctx.guild)
         if data == {}:
             await ctx.respond("This user isn't transformed in this channel! Please try again in the proper channel!")
             return
@@ -274,10 +274,10 @@ class Transformation(commands.Cog):
             await ctx.respond(f"You can't do that! {user.mention} has been claimed already by "
                               f"{ctx.guild.get_member(int(data['claim'])).mention}!")
             return
-        utils.write_tf(user, ctx.guild, claim_user=ctx.author.id)
+        await utils.write_tf_async(user, ctx.guild, claim_user=ctx.author.id)
         await ctx.respond(f"You have successfully claimed {user.mention} for yourself! Hope you enjoy!")
 
-        transformed_data = utils.load_transformed(ctx.guild)
+        transformed_data = await utils.load_transformed_async(ctx.guild)
         if transformed_data['logs'][3]:
             embed = utils.get_embed_base(title="User Claimed", color=discord.Color.gold())
             embed.add_field(name="User", value=user.mention)
@@ -293,7 +293,7 @@ class Transformation(commands.Cog):
             await ctx.respond("You can't unclaim yourself! Only your master can do that!\n"
                               "||Use \"/safeword\", if you actually want to unclaim yourself.||")
             return
-        data = utils.load_tf(user, ctx.guild)
+        data = await utils.load_tf_async(user, ctx.guild)
         channel = None
         if data == {} or data['claim'] == 0:
             await ctx.respond(f"{user.mention} is currently not claimed by anyone (yet)!")
@@ -302,10 +302,10 @@ class Transformation(commands.Cog):
             await ctx.respond(f"You can't do that! {user.mention} is claimed by "
                               f"{ctx.guild.get_member(int(data['claim'])).mention}, not you!")
             return
-        utils.write_tf(user, ctx.guild, channel, claim_user=0, eternal=False)
+        await utils.write_tf_async(user, ctx.guild, channel, claim_user=0, eternal=False)
         await ctx.respond(f"You have successfully unclaimed {user.mention}! They are now free from your grasp!")
 
-        transformed_data = utils.load_transformed(ctx.guild)
+        transformed_data = await utils.load_transformed_async(ctx.guild)
         if transformed_data['logs'][3]:
             embed = utils.get_embed_base(title="User Unclaimed", color=discord.Color.gold())
             embed.add_field(name="User", value=user.mention)
@@ -316,19 +316,19 @@ class Transformation(commands.Cog):
     @discord.slash_command(description="Safeword command. Use in case of abuse or incommodity, to unclaim yourself.")
     async def safeword(self,
                        ctx: discord.ApplicationContext) -> None:
-        data = utils.load_tf(ctx.author, ctx.guild)
+        data = await utils.load_tf_async(ctx.author, ctx.guild)
         channel = None
         # We have to check if they are claimed OR eternally transformed. If both are false, safeword does nothing.
         # If either are true, we need to keep going, otherwise we can just return.
         if data == {} or data['claim'] == 0:
             await ctx.respond("You can't do that! You are not claimed by anyone! Stop trying to abuse! >:(")
             return
-        utils.write_tf(ctx.author, ctx.guild, channel, claim_user=0, eternal=False)
+        await utils.write_tf_async(ctx.author, ctx.guild, channel, claim_user=0, eternal=False)
         await ctx.respond("You have successfully activated the safeword command.\n"
                           "Please, sort out any issues with your rp partner(s) before you continue using the bot .\n"
                           "Use \"/goback\" to return to your normal self.")
 
-        transformed_data = utils.load_transformed(ctx.guild)
+        transformed_data = await utils.load_transformed_async(ctx.guild)
         if transformed_data['logs'][3]:
             embed = utils.get_embed_base(title="User Safeworded", color=discord.Color.gold())
             embed.add_field(name="User", value=ctx.author.mention)
@@ -355,8 +355,8 @@ class Transformation(commands.Cog):
             await ctx.respond("You can't transform that user at all! They've been very naughty...", ephemeral=True)
             return
 
-        data = utils.load_tf(user, ctx.guild)
-        transformed_data = utils.load_transformed(ctx.guild)
+        data = await utils.load_tf_async(user, ctx.guild)
+        transformed_data = await utils.load_transformed_async(ctx.guild)
 
         if data == {}:
             await ctx.respond(f"{user.mention} is not transformed at the moment!")
@@ -421,8 +421,8 @@ class Transformation(commands.Cog):
             await ctx.respond("You can't transform that user at all! They've been very naughty...", ephemeral=True)
             return
 
-        data = utils.load_tf(user, ctx.guild)
-        transformed_data = utils.load_transformed(ctx.guild)
+        data = await utils.load_tf_async(user, ctx.guild)
+        transformed_data = await utils.load_transformed_async(ctx.guild)
 
         # Blocked channels (user)
         if data != {}:
@@ -448,7 +448,7 @@ class Transformation(commands.Cog):
                     await ctx.respond("That user can't use the bot, at least on this server!", ephemeral=True)
                     return
 
-        if utils.is_transformed(user, ctx.guild):
+        if await utils.is_transformed_async(user, ctx.guild):
             if data == {}: # This is to avoid https://github.com/dorythecat/TransforMate/issues/25
                 data['claim'] = 0
             if data['claim'] != 0 and int(data['claim']) != ctx.author.id and data['eternal']:
@@ -481,13 +481,13 @@ class Transformation(commands.Cog):
         new_data = utils.decode_tsf(tsf_string)
         new_data['transformed_by'] = ctx.author.id
 
-        data = utils.load_tf(user, ctx.guild)
+        data = await utils.load_tf_async(user, ctx.guild)
         new_data['blocked_users'] = data['blocked_users'] if 'blocked_users' in data else []
         new_data['blocked_channels'] = data['blocked_channels'] if 'blocked_channels' in data else []
         new_data['claim'] = data['claim'] if 'claim' in data else 0
         new_data['eternal'] = data['eternal'] if 'eternal' in data else False
-        utils.write_tf(user, ctx.guild, new_data)
-        utils.write_transformed(ctx.guild, user)
+        await utils.write_tf_async(user, ctx.guild, new_data)
+        await utils.write_transformed_async(ctx.guild, user)
 
         if change_nickname:
             try:
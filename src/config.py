@@ -10,11 +10,12 @@ def parse_list(string: str | None) -> list[int]:
     return [int(output[i].strip()) for i in range(len(output))]
 
 
-# Get settings from .env file
-if not load_dotenv():
+required_variables = ["BOT_TOKEN", "WEBHOOK_NAME", "BLOCKED_USERS", "USER_REPORTS_CHANNEL_ID", "CACHE_PATH"]
+
+# Get settings from .env file (unless they've all been set some other way, like by the benchmark scripts)
+if not load_dotenv() and any(os.getenv(var) is None for var in required_variables):
     raise Exception("Either your .env file is empty, or you don't even have a .env file! Aborting")
 
-required_variables = ["BOT_TOKEN", "WEBHOOK_NAME", "BLOCKED_USERS", "USER_REPORTS_CHANNEL_ID", "CACHE_PATH"]
 for var in required_variables:
     if os.getenv(var) is None:
         raise Exception(f"{var} hasn't been provided! Check your .env! Aborting")
@@ -27,4 +28,34 @@ WEBHOOK_NAME: str = os.getenv("WEBHOOK_NAME")  # Name to use for the webhooks
 BLOCKED_USERS: list[int] = parse_list(os.getenv("BLOCKED_USERS"))  # Users that are blocked from using the bot
 USER_REPORTS_CHANNEL_ID: int = int(os.getenv("USER_REPORTS_CHANNEL_ID"))  # Channel to use for the /report command
 CACHE_PATH: str = os.getenv("CACHE_PATH")  # What's the path to the cache folder? (In relationship to the utils.py file)
-MAX_REGEN_USERS: int = int(os.getenv("MAX_REGEN_USERS")) # Maximum number of users in a server allowed for /regen_server_tfs
\ No newline at end of file
+MAX_REGEN_USERS: int = int(os.getenv("MAX_REGEN_USERS")) # Maximum number of users in a server allowed for /regen_server_tfs
+
+# Storage configuration
+STORAGE_BACKEND: str = os.getenv("STORAGE_BACKEND", "json").lower()  # Where to store data, either "json" or "sqlite"
+SQLITE_PATH: str = os.getenv("SQLITE_PATH", f"{CACHE_PATH}/transformate.db")  # Path to the database, if using SQLite
+STORAGE_CHECKSUMS: bool = os.getenv("STORAGE_CHECKSUMS", "false").lower() == "true"  # Keep a checksum of every data file
+
+# Performance configuration
+TMUD_CACHE_SIZE: int = int(os.getenv("TMUD_CACHE_SIZE", 1024))  # How many user data files to keep parsed in memory
+# Seconds between data writes (0 to disable). Everything pending is written when the bot shuts down, but up to this much
+# of the latest changes is lost if the bot is killed outright (with SIGKILL, or a power cut)
+WRITE_BEHIND_INTERVAL: float = float(os.getenv("WRITE_BEHIND_INTERVAL", 5))
+IO_THREADS: int = int(os.getenv("IO_THREADS", 4))  # How many threads to use for disk and network I/O
+URL_CHECK_TIMEOUT: float = float(os.getenv("URL_CHECK_TIMEOUT", 10))  # Seconds to wait when checking an image URL
+URL_CACHE_TTL: float = float(os.getenv("URL_CACHE_TTL", 3600))  # Seconds to remember working image URLs for
+URL_CACHE_FAILURE_TTL: float = float(os.getenv("URL_CACHE_FAILURE_TTL", 300))  # Same, but for broken image URLs
+WEBHOOK_POOL_SIZE: int = int(os.getenv("WEBHOOK_POOL_SIZE", 3))  # Maximum number of webhooks to use per channel
+OUTBOUND_SEND_RATE: float = float(os.getenv("OUTBOUND_SEND_RATE", 5))  # Webhook messages per second, per channel
+OUTBOUND_DELETE_RATE: float = float(os.getenv("OUTBOUND_DELETE_RATE", 5))  # Message deletions per second, per channel
+OUTBOUND_BURST: int = int(os.getenv("OUTBOUND_BURST", 5))  # How many of those can be sent at once, before slowing down
+BATCHED_RANDOM: bool = os.getenv("BATCHED_RANDOM", "false").lower() == "true"  # Draw transformation randomness in batches
+TRANSFORM_SEED: int | None = int(os.getenv("TRANSFORM_SEED")) if os.getenv("TRANSFORM_SEED") else None  # Replayable TFs
+METRICS_PORT: int = int(os.getenv("METRICS_PORT", 0))  # Port to serve Prometheus metrics on, at /metrics (0 to disable)
+METRICS_HOST: str = os.getenv("METRICS_HOST", "127.0.0.1")  # Address to serve the metrics on
+METRICS_FILE: str = os.getenv("METRICS_FILE", "")  # File to dump the metrics to periodically (empty to disable)
+METRICS_INTERVAL: float = float(os.getenv("METRICS_INTERVAL", 15))  # Seconds between metrics dumps
+WATCHDOG_INTERVAL: float = float(os.getenv("WATCHDOG_INTERVAL", 0.5))  # Seconds between loop lag checks (0 to disable)
+WATCHDOG_THRESHOLD: float = float(os.getenv("WATCHDOG_THRESHOLD", 0.25))  # Seconds of lag to consider the loop blocked
+PROVENANCE_PATH: str = os.getenv("PROVENANCE_PATH", f"{CACHE_PATH}/provenance.log")  # Who sent each proxied message
+PROVENANCE_SIZE: int = int(os.getenv("PROVENANCE_SIZE", 50000))  # How many proxied messages to remember in memory
+PROVENANCE_RETENTION: float = float(os.getenv("PROVENANCE_RETENTION", 30)) * 86400  # Days to keep them in the log for
\ No newline at end of file
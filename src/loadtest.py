@@ -0,0 +1,287 @@
+"""
+Offline load test for the whole on_message (and on_reaction_add) path, using stand-in Discord objects that never touch
+the network. Proxied messages are recorded by in-memory webhooks instead of being sent.
+
+Like the benchmarks, it doesn't need a .env file, and keeps its data in a temporary CACHE_PATH. Run it with:
+
+    python src/loadtest.py [--guilds N] [--users N] [--messages N] [--rate N] [--bystanders F] [--output results.json]
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+parser = argparse.ArgumentParser(description="Replay synthetic traffic through TransforMate's message handlers")
+parser.add_argument("--guilds", type=int, default=20, help="How many servers to simulate")
+parser.add_argument("--users", type=int, default=25, help="How many transformed users per server")
+parser.add_argument("--channels", type=int, default=5, help="How many channels per server")
+parser.add_argument("--messages", type=int, default=2000, help="How many events to replay in total")
+parser.add_argument("--rate", type=float, default=500, help="Events per second to replay (0 for as fast as possible)")
+parser.add_argument("--bystanders", type=float, default=0, help="Fraction of messages from non-transformed users")
+parser.add_argument("--reactions", type=float, default=0.05, help="Fraction of events that are ❓ reactions")
+parser.add_argument("--length", type=int, default=200, help="Roughly how many characters each message has")
+parser.add_argument("--profile", default="realistic", help="Which synthetic profile from benchmark.py to use")
+parser.add_argument("--latency", type=float, default=0, help="Simulated Discord latency for each request, in ms")
+parser.add_argument("--cold", action="store_true", help="Drop the TMUD cache before starting, so data is reloaded")
+parser.add_argument("--storage", choices=["json", "sqlite"], default="json", help="Which storage backend to use")
+parser.add_argument("--seed", type=int, default=1234, help="Seed for the synthetic traffic and transformations")
+parser.add_argument("--output", help="Save the results to this JSON file")
+args = parser.parse_args()
+
+os.environ["STORAGE_BACKEND"] = args.storage
+os.environ["TRANSFORM_SEED"] = str(args.seed)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import discord
+
+from benchmark import make_message, make_profiles, percentile  # Also sets up the environment for the bot
+
+import main
+import metrics
+import storage
+import utils
+
+ids = itertools.count(100_000_000_000_000_000)
+
+
+class FakeUser:
+    def __init__(self, name: str, bot: bool = False) -> None:
+        self.id = next(ids)
+        self.name = self.display_name = name
+        self.bot = bot
+        self.mention = f"<@{self.id}>"
+        self.display_avatar = type("Asset", (), {'url': f"https://example.com/{self.id}.png"})()
+        self.dms = 0
+
+    async def send(self, *args, **kwargs) -> None:
+        self.dms += 1
+
+
+class FakeGuild:
+    def __init__(self) -> None:
+        self.id = next(ids)
+        self.name = f"Server {self.id}"
+        self.members: list[FakeUser] = []
+        self.transformed: list[FakeUser] = []
+        self.bystanders: list[FakeUser] = []
+        self.channels: list[FakeChannel] = []
+
+    def get_member(self, user_id: int) -> FakeUser | None:
+        return next((member for member in self.members if member.id == user_id), None)
+
+
+class FakeChannel:
+    type = discord.ChannelType.text
+    parent = None
+
+    def __init__(self, guild: FakeGuild, harness: "Harness") -> None:
+        self.id = next(ids)
+        self.guild = guild
+        self.mention = f"<#{self.id}>"
+        self.harness = harness
+        self.hooks: list[FakeWebhook] = []
+
+    async def webhooks(self) -> list["FakeWebhook"]:
+        await self.harness.request()
+        return list(self.hooks)
+
+    async def create_webhook(self, name: str) -> "FakeWebhook":
+        await self.harness.request()
+        webhook = FakeWebhook(name, self)
+        self.hooks.append(webhook)
+        return webhook
+
+    async def send(self, *args, **kwargs) -> None:
+        await self.harness.request()
+
+
+class FakeWebhook:
+    def __init__(self, name: str, channel: FakeChannel) -> None:
+        self.id = next(ids)
+        self.name = name
+        self.token = "fake"
+        self.channel = channel
+        self.authors: dict[str, FakeUser] = {}
+
+    async def send(self, content: str, username: str, avatar_url: str, **kwargs) -> "FakeMessage":
+        await self.channel.harness.request()
+        if username not in self.authors:
+            self.authors[username] = FakeUser(username, bot=True)
+        message = FakeMessage(self.authors[username], self.channel, content, webhook_id=self.id)
+        self.channel.harness.sent.append(message)
+        return message
+
+
+class FakeMessage:
+    def __init__(self, author: FakeUser, channel: FakeChannel, content: str, webhook_id: int | None = None) -> None:
+        self.id = next(ids)
+        self.author = author
+        self.channel = channel
+        self.guild = channel.guild
+        self.content = content
+        self.webhook_id = webhook_id
+        self.stickers = []
+        self.attachments = []
+        self.embeds = []
+        self.reference = None
+        self.jump_url = f"https://discord.com/channels/{self.guild.id}/{channel.id}/{self.id}"
+        self.done = asyncio.get_running_loop().create_future()
+
+    async def delete(self) -> None:
+        await self.channel.harness.request()
+        if not self.done.done():
+            self.done.set_result(time.perf_counter())
+
+
+class FakeReaction:
+    def __init__(self, message: FakeMessage, emoji: str) -> None:
+        self.message = message
+        self.emoji = emoji
+
+    async def remove(self, user: FakeUser) -> None:
+        await self.message.channel.harness.request()
+
+
+class Harness:
+    def __init__(self) -> None:
+        self.rng = random.Random(args.seed)
+        self.sent: list[FakeMessage] = []
+        self.requests = 0
+
+    async def request(self) -> None:
+        # Every call to "Discord" goes through here, so we can count them and pretend they take some time
+        self.requests += 1
+        if args.latency > 0:
+            await asyncio.sleep(args.latency / 1000)
+
+    def populate(self) -> list[FakeGuild]:
+        """
+        Creates every server, channel and user, and transforms every user in their server.
+
+        :return: The simulated servers.
+        """
+        profile = make_profiles(random.Random(args.seed))[args.profile]
+        guilds = []
+        for _ in range(args.guilds):
+            guild = FakeGuild()
+            guild.channels = [FakeChannel(guild, self) for _ in range(args.channels)]
+            for i in range(args.users):
+                user = FakeUser(f"user{i}")
+                guild.members.append(user)
+                guild.transformed.append(user)
+                guild.bystanders.append(FakeUser(f"bystander{i}"))
+                utils.write_tf(user.id, guild.id, new_data=profile | {'into': f"TF {user.id}", 'transformed_by': user.id})
+                utils.write_transformed(guild.id, user.id)
+            guild.members += guild.bystanders
+            guilds.append(guild)
+        utils.flush()
+        if args.cold:
+            utils.tf_cache.invalidate()
+            utils.plan_cache.invalidate()
+        return guilds
+
+    async def run(self, guilds: list[FakeGuild]) -> dict:
+        """
+        Replays the synthetic traffic, and waits until every proxied message has been sent and deleted.
+
+        :param guilds: The simulated servers.
+
+        :return: The results of the run.
+        """
+        utils.start_write_behind()
+        message_rng = random.Random(args.seed + 1)
+        pending: list[tuple[float, FakeMessage]] = []
+        handler_latencies: list[float] = []
+        bystander_latencies: list[float] = []
+        reaction_latencies: list[float] = []
+        tasks = []
+        io_before = storage.io_counts.copy()
+
+        async def timed(coroutine, latencies: list[float]) -> None:
+            start = time.perf_counter()
+            await coroutine
+            latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for i in range(args.messages):
+            if args.rate > 0:  # Keep to the requested rate, without drifting
+                delay = start + i / args.rate - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            if self.sent and self.rng.random() < args.reactions:
+                reaction = FakeReaction(self.rng.choice(self.sent), self.rng.choice(["❓", "❔"]))
+                user = self.rng.choice(reaction.message.guild.members)
+                tasks.append(asyncio.create_task(timed(main.on_reaction_add(reaction, user), reaction_latencies)))
+                continue
+            guild = self.rng.choice(guilds)
+            bystander = self.rng.random() < args.bystanders
+            message = FakeMessage(self.rng.choice(guild.bystanders if bystander else guild.transformed),
+                                  self.rng.choice(guild.channels), make_message(args.length, message_rng))
+            if bystander:  # These are never proxied, so there's nothing to wait for
+                tasks.append(asyncio.create_task(timed(main.on_message(message), bystander_latencies)))
+            else:
+                pending.append((time.perf_counter(), message))
+                tasks.append(asyncio.create_task(timed(main.on_message(message), handler_latencies)))
+            await asyncio.sleep(0)  # Let the handlers run, like the real event loop would between events
+        await asyncio.gather(*tasks)
+        end_to_end = [await message.done - sent_at for sent_at, message in pending]
+        elapsed = time.perf_counter() - start
+        flushed = await utils.flush_async()
+        io = storage.io_counts - io_before
+
+        def summary(latencies: list[float]) -> dict:
+            latencies = sorted(latency * 1000 for latency in latencies)
+            if not latencies:
+                return {}
+            return {
+                'count': len(latencies),
+                'mean_ms': round(statistics.fmean(latencies), 3),
+                'p50_ms': round(percentile(latencies, 0.5), 3),
+                'p99_ms': round(percentile(latencies, 0.99), 3),
+                'max_ms': round(latencies[-1], 3)
+            }
+
+        return {
+            'events': args.messages,
+            'messages': len(pending),
+            'bystander_messages': len(bystander_latencies),
+            'reactions': len(reaction_latencies),
+            'elapsed_s': round(elapsed, 3),
+            'messages_per_sec': round(len(pending) / elapsed, 1),
+            'end_to_end': summary(end_to_end),
+            'on_message': summary(handler_latencies),
+            'on_message_bystanders': summary(bystander_latencies),
+            'on_reaction_add': summary(reaction_latencies),
+            'discord_requests': self.requests,
+            'storage_io': dict(io),
+            'storage_io_per_message': {name: round(count / max(len(pending), 1), 4) for name, count in io.items()},
+            'flushed_at_end': flushed,
+            'scheduler': utils.outbound_scheduler.stats() | {'guild_depths': {}},
+            'webhook_resolutions': dict(utils.webhook_resolutions),
+            'tmud_cache': utils.tf_cache.stats(),
+            'stages': {f"{handler}/{stage}": {'count': values['count'],
+                                             'mean_ms': round(values['sum'] / values['count'] * 1000, 3),
+                                             'p50_ms': round(values[0.5] * 1000, 3),
+                                             'p99_ms': round(values[0.99] * 1000, 3)}
+                       for (handler, stage), values in metrics.stage_seconds.snapshot().items()}
+        }
+
+
+async def run() -> dict:
+    harness = Harness()
+    guilds = harness.populate()
+    return await harness.run(guilds)
+
+
+if __name__ == "__main__":
+    results = asyncio.run(run())
+    print(json.dumps(results, indent=4))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({'arguments': vars(args), 'results': results}, f, indent=4)
+        print(f"\nSaved results to \"{args.output}\"")
@@ -0,0 +1,161 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+
+import metrics
+from config import WATCHDOG_INTERVAL, WATCHDOG_THRESHOLD
+
+SOURCE_PATH: str = os.path.dirname(os.path.abspath(__file__))
+
+
+class BlockingSite:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.stack: list[str] = []  # The stack of the latest time it blocked, innermost frame last
+
+
+class LoopWatchdog:
+    """
+    Measures how late the event loop wakes up, continuously. A task sleeps for a fixed interval and checks how much
+    longer than that it actually took, while a separate thread checks that the task keeps waking up. If it doesn't,
+    something is blocking the loop, so the thread grabs the stack of the loop's thread, to find out what it is.
+    """
+    def __init__(self, interval: float = WATCHDOG_INTERVAL, threshold: float = WATCHDOG_THRESHOLD) -> None:
+        self.interval = interval
+        self.threshold = threshold
+        self.lag: metrics.Histogram = metrics.Histogram("transformate_event_loop_lag_seconds",
+                                                        "How late the event loop ran a scheduled callback, in seconds.")
+        self.sites: dict[str, BlockingSite] = {}
+        self.blocks = 0
+        self.max_lag = 0.0
+        self.last_beat = 0.0
+        self._pending: tuple[str, list[str]] | None = None  # Where the current block was caught, if it was
+        self._lock = threading.Lock()
+        self._loop_thread: int | None = None
+        self._task: asyncio.Task | None = None
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        """
+        Starts watching the running event loop. Does nothing if it's already being watched.
+
+        :return: This function does not return anything.
+        """
+        if self._task is not None and not self._task.done():
+            return
+        self._loop_thread = threading.get_ident()
+        self.last_beat = time.monotonic()
+        self._task = asyncio.get_running_loop().create_task(self._beat())
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+            self._thread.start()
+
+    async def _beat(self) -> None:
+        while True:
+            before = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(now - before - self.interval, 0.0)
+            with self._lock:
+                self.last_beat = now
+                pending, self._pending = self._pending, None
+            self.lag.observe(lag)
+            self.max_lag = max(self.max_lag, lag)
+            if lag >= self.threshold:
+                self._record(lag, pending)
+
+    def _record(self, lag: float, pending: tuple[str, list[str]] | None) -> None:
+        name, stack = pending or ("unknown", [])  # Too short for the thread to catch it in the act
+        site = self.sites.get(name)
+        if site is None:
+            site = self.sites[name] = BlockingSite(name)
+        site.count += 1
+        site.total += lag
+        site.max = max(site.max, lag)
+        if stack:
+            site.stack = stack
+        self.blocks += 1
+
+    def _watch(self) -> None:
+        while self._task is not None and not self._task.done():
+            time.sleep(max(self.threshold / 2, 0.01))
+            with self._lock:
+                beat = self.last_beat
+                if self._pending is not None or time.monotonic() - beat < self.interval + self.threshold:
+                    continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            stack = traceback.extract_stack(frame)
+            with self._lock:
+                if self.last_beat == beat:  # Only keep it if the loop is still stuck on the same thing
+                    self._pending = (self._site_name(stack), traceback.format_list(stack[-8:]))
+
+    @staticmethod
+    def _site_name(stack: traceback.StackSummary) -> str:
+        """
+        :param stack: The stack of the loop's thread, while it was blocked.
+
+        :return: The name of the function that blocked, like "utils.write_file". That's the innermost function of the
+        bot itself, since the innermost frame is usually deep inside some library.
+        """
+        for frame in reversed(stack):
+            if os.path.dirname(os.path.abspath(frame.filename)).startswith(SOURCE_PATH):
+                return f"{os.path.splitext(os.path.basename(frame.filename))[0]}.{frame.name}"
+        return f"{os.path.splitext(os.path.basename(stack[-1].filename))[0]}.{stack[-1].name}" if stack else "unknown"
+
+    def top_sites(self, count: int = 5) -> list[BlockingSite]:
+        """
+        :param count: How many sites to return, at most.
+
+        :return: The places that blocked the loop for the longest time in total, longest first.
+        """
+        return sorted(self.sites.values(), key=lambda site: site.total, reverse=True)[:count]
+
+    def stats(self) -> dict:
+        """
+        :return: A dictionary with the lag percentiles (in seconds), and how many times the loop was blocked.
+        """
+        values = self.lag.snapshot().get((), {'count': 0, 'sum': 0.0, 0.5: 0.0, 0.95: 0.0, 0.99: 0.0})
+        return {
+            'samples': values['count'],
+            'lag_avg': values['sum'] / values['count'] if values['count'] else 0.0,
+            'lag_p50': values[0.5],
+            'lag_p95': values[0.95],
+            'lag_p99': values[0.99],
+            'lag_max': self.max_lag,
+            'blocks': self.blocks
+        }
+
+    def collect_metrics(self) -> list[str]:
+        """
+        :return: The lag, and the time spent blocked at each site, in the Prometheus text format.
+        """
+        lines = self.lag.render()
+        lines += metrics.gauge("transformate_event_loop_blocks_total", "Times the event loop was blocked, by site.",
+                               {site.name: site.count for site in self.sites.values()}, label="site", kind="counter")
+        lines += metrics.gauge("transformate_event_loop_blocked_seconds_total",
+                               "Time the event loop spent blocked, by site, in seconds.",
+                               {site.name: round(site.total, 6) for site in self.sites.values()}, label="site",
+                               kind="counter")
+        return lines
+
+
+loop_watchdog: LoopWatchdog = LoopWatchdog()
+metrics.collectors.append(loop_watchdog.collect_metrics)
+
+
+def start() -> None:
+    """
+    Starts watching the running event loop, unless WATCHDOG_INTERVAL is 0.
+
+    :return: This function does not return anything.
+    """
+    if WATCHDOG_INTERVAL > 0:
+        loop_watchdog.start()
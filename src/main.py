@@ -7,13 +7,25 @@ os.chdir(sep.join(os.path.dirname(os.path.abspath(__file__)).split(sep)[:-1]))
 
 from pathlib import Path
 
+import loop_watchdog
+import metrics
 import utils
 from config import *
 
 intents = discord.Intents.default()
 intents.message_content  = True
 
-bot = discord.Bot(intents=intents)
+class TransforMate(discord.Bot):
+    async def close(self) -> None:
+        # Write any pending data changes before disconnecting, while the event loop's still around. The atexit flush
+        # is only a fallback, since it doesn't run if the loop is torn down on a hard error.
+        try:
+            await utils.flush_async()
+        except Exception as e:
+            print(f"Error flushing data on shutdown:\n{str(type(e))}: {e}")
+        await super().close()
+
+bot = TransforMate(intents=intents)
 
 @bot.event
 async def on_ready() -> None:
@@ -25,6 +37,18 @@ async def on_ready() -> None:
     # Generate the cache/people dirs so we don't have to worry about them further down the line
     Path(f"{CACHE_PATH}/people").mkdir(parents=True, exist_ok=True)
 
+    # Move any data that was corrupted (by a crash, say) out of the way, then load the server data (which tells us
+    # who's transformed where, and who sent the latest proxied messages) before any messages come in, and start writing
+    # data changes periodically
+    await utils.scan_storage()
+    await utils.load_transformed_async()
+    await utils.load_provenance()
+    utils.start_write_behind()
+
+    # Keep an eye on the event loop, and serve (or dump) the metrics, if enabled
+    loop_watchdog.start()
+    await metrics.start()
+
 
 @bot.event
 async def on_guild_join(guild: discord.Guild) -> None:
@@ -42,17 +66,18 @@ async def on_guild_remove(guild: discord.Guild) -> None:
     await guild.owner.send("We're sorry to see you go! If you have any feedback on why you decided to "
                            "remove the bot from your server, please, feel free to let us know, so we "
                            "can improve!\n\n [Official Discord Server](https://discord.gg/uGjWk2SRf6)")
-    for member in guild.members:
-        utils.remove_all_server_tf(member, guild)
-    utils.remove_server_from_transformed(guild)
+    for member in guild.members:  # Their messages are forgotten alongside the rest of the server's
+        await utils.remove_all_server_tf_async(member, guild, forget_messages=False)
+    await utils.remove_server_from_transformed_async(guild)
 
 # We use on_raw_member_remove instead of on_member_remove because only the first will ALWAYS trigger
 # See https://docs.pycord.dev/en/stable/api/events.html#discord.on_member_remove
 @bot.event
 async def on_raw_member_remove(payload: discord.RawMemberRemoveEvent) -> None:
-    utils.remove_all_server_tf(payload.user, bot.get_guild(payload.guild_id))
+    await utils.remove_all_server_tf_async(payload.user, bot.get_guild(payload.guild_id))
 
 @bot.event
+@metrics.timed("on_message")
 async def on_message(message: discord.Message) -> None:
     # Check if the message is sent by the bot, we don't want an endless loop that ends on an error/crash, do we?
     if message.author == bot.user:
@@ -97,14 +122,21 @@ async def on_message(message: discord.Message) -> None:
             await message.author.send("Thank you for your report! It has been sent to the developers, for review.")
         return
 
+    # Most messages come from users who aren't transformed, so we turn them away before doing anything else
+    if not message.author.bot and not utils.maybe_transformed(message.author.id, message.guild.id):
+        return
+
+    # Everything we need to know about the user and the server, all at once
+    with metrics.timer("on_message", "resolve_context"):
+        context = await utils.resolve_proxy_context_async(message.author.id, message.guild.id, message.channel.id)
+
     # Check if the message was sent by a bot
     # We use this to delete logs made by other bots, if this setting is enabled
-    transformed_data = utils.load_transformed(message.guild)
-    if message.author.bot and transformed_data != {} and transformed_data['clear_other_logs']:
+    if message.author.bot and context.clear_other_logs:
         if message.author.id == 1273264155482390570:  # Dyno bot
             if message.embeds and "Deleted" in message.embeds[0].description:
-                if utils.is_transformed(discord.utils.get(bot.get_all_members(), name=message.embeds[0].author.name),
-                                        message.guild):
+                deleted_author = discord.utils.get(bot.get_all_members(), name=message.embeds[0].author.name)
+                if await utils.is_transformed_async(deleted_author, message.guild):
                     await message.delete()
         return
 
@@ -113,22 +145,16 @@ async def on_message(message: discord.Message) -> None:
         return
 
     # Check if user is transformed
-    if not utils.is_transformed(message.author, message.guild):
+    if not context.transformed:
         return
 
     # Check if user is using OOC mode
     if message.content.startswith("(") or message.content.startswith("\\"):
         return
 
-    data = utils.load_tf(message.author, message.guild)
-    if data == {}: # User isn't transformed
-        return
-
     # Handle blocked channels
     # Not necessary to check for blocked users, since they shouldn't be able to use the bot anyway
-    if 'blocked_channels' not in data:
-        data['blocked_channels'] = []
-    if str(message.channel.id) in data['blocked_channels'] + utils.load_transformed(message.guild)['blocked_channels']:
+    if context.blocked:
         return
 
     # If the message contains stickers, we just don't process it
@@ -136,22 +162,21 @@ async def on_message(message: discord.Message) -> None:
         await message.author.send("Sorry, but we don't support sending stickers, for the moment! :(")
         return
 
-    name = data['into']
-    image_url = data['image_url']
+    name = context.name
+    image_url = context.avatar_url
 
     is_thread = message.channel.type in [discord.ChannelType.private_thread, discord.ChannelType.public_thread]
     channel = message.channel.parent if is_thread else message.channel
 
-    webhook = await utils.get_webhook_by_name(channel, WEBHOOK_NAME)
-
     content: str = ""
     if message.reference:  # Check if the message is a reply
         mention = f"***{message.reference.resolved.author.mention}***"
         if message.reference.resolved.webhook_id and not message.reference.resolved.author == bot.user:
-            tfee, _ = utils.check_message(message.reference.resolved)
+            with metrics.timer("on_message", "check_message"):
+                matches = await utils.check_message(message.reference.resolved)
             mention = f'***"{message.reference.resolved.author.display_name}"***'
-            if tfee is not None:
-                mention = f"***<@{tfee}>***"
+            if len(matches) == 1:  # If more than one user has that name, we can't know who to mention
+                mention = f"***<@{matches[0][0]}>***"
         content += (f"***Replying to {mention} on "
                     f"{message.reference.resolved.jump_url}:***\n")
         # TODO: Make this an option for server owners
@@ -179,17 +204,16 @@ async def on_message(message: discord.Message) -> None:
         '''
 
     if message.content:
-        tfed_content = utils.transform_text(data, message.content)
+        # The compiled plan is reused until the user's data changes
+        with metrics.timer("on_message", "transform_text"):
+            tfed_content = utils.transform_text(context.plan, message.content)
         content += tfed_content
 
         # Check if censors, muffles, alt muffles, or sprinkles are active in data, and if the message is different from
         # the original, to send it to the author of the transformation
-        if (data['censor'] != {} or
-            data['muffle'] != {} or
-            data['alt_muffle'] != {} or
-            data['sprinkle'] != {}) and tfed_content != message.content:
+        if context.notify_id is not None and tfed_content != message.content:
             # Send the original message to transformed_by if claim is None, otherwise to claim
-            transformed_by = bot.get_user(int(data['transformed_by'] if data['claim'] is None else data['claim']))
+            transformed_by = bot.get_user(context.notify_id)
 
             # Check if the message is from the user who transformed this user
             if transformed_by not in [None, message.author]:
@@ -203,31 +227,52 @@ async def on_message(message: discord.Message) -> None:
 
     # The message needs to either have content or attachments (or both) to be sent,
     # so we don't need to worry about sending empty messages and triggering 400 errors
-    await webhook.send(content,
-                       username=name,
-                       avatar_url=image_url,
-                       files=[await attachment.to_file() for attachment in message.attachments],
-                       thread=message.channel if is_thread else discord.utils.MISSING)
-    await message.delete()
+    # Both the message and the deletion of the original are queued, so we don't hold up other messages when
+    # Discord makes us slow down
+    with metrics.timer("on_message", "attachments"):
+        files = [await attachment.to_file() for attachment in message.attachments]
+    utils.queue_proxy_message(message,
+                              channel,
+                              WEBHOOK_NAME,
+                              content,
+                              username=name,
+                              avatar_url=image_url,
+                              files=files,
+                              thread=message.channel if is_thread else discord.utils.MISSING,
+                              author_id=message.author.id,
+                              profile=context.profile)
 
 
 @bot.event
+@metrics.timed("on_reaction_add")
 async def on_reaction_add(reaction: discord.Reaction, user: discord.User) -> None:
     if reaction.message.author == bot.user or not reaction.message.author.bot or \
             str(reaction.emoji) not in ["❓", "❔", "✏️", "📝", "❌", "🔒", "🔓", "🔐"]:
         return
 
-    tfee, data = utils.check_message(reaction.message)
-    if tfee is None:
+    with metrics.timer("on_reaction_add", "check_message"):
+        matches = await utils.check_message(reaction.message)
+    if not matches:
         return
-    await reaction.remove(user) # Remove the reaction from the message
+    with metrics.timer("on_reaction_add", "remove_reaction"):
+        await reaction.remove(user) # Remove the reaction from the message
 
     # Message related reactions
     if str(reaction.emoji) in ["❓", "❔"]:
+        if len(matches) > 1:
+            await user.send(f"\"{reaction.message.author.name}\" could be any of these users, since all of them are "
+                            f"transformed into it:\n" +
+                            "\n".join(f"- <@!{tfee}> (Transformed by <@!{data['transformed_by']}>)"
+                                      for tfee, data in matches))
+            return
+        tfee, data = matches[0]
         await user.send(f"\"{reaction.message.author.name}\" is, in fact, <@!{tfee}>!\n"
                         f"(Transformed by <@!{data['transformed_by']}>)")
         return
 
+    # If the user is one of the users with this name, it's most likely their own message
+    tfee, data = next(((tfee, data) for tfee, data in matches if tfee == user.id), matches[0])
+
     if str(reaction.emoji) in ["✏️", "📝"]:
         if user.id != tfee:
             return
@@ -242,22 +287,26 @@ async def on_reaction_add(reaction: discord.Reaction, user: discord.User) -> Non
                                                       discord.ChannelType.public_thread]
         channel = reaction.message.channel.parent if is_thread else reaction.message.channel
 
-        webhook = await utils.get_webhook_by_name(channel, WEBHOOK_NAME)
-
         attachments = []
-        for attachment in response.attachments:
-            attachment_file = await attachment.to_file()
-            attachments.append(attachment_file)
-
-        await webhook.send(response.content,
-                           username=reaction.message.author.name,
-                           avatar_url=reaction.message.author.display_avatar.url,
-                           files=attachments,
-                           thread=reaction.message.channel if is_thread else discord.utils.MISSING)
-        await reaction.message.delete()
+        with metrics.timer("on_reaction_add", "attachments"):
+            for attachment in response.attachments:
+                attachment_file = await attachment.to_file()
+                attachments.append(attachment_file)
+
+        with metrics.timer("on_reaction_add", "edit"):
+            await utils.queue_proxy_message(reaction.message,
+                                            channel,
+                                            WEBHOOK_NAME,
+                                            response.content,
+                                            username=reaction.message.author.name,
+                                            avatar_url=reaction.message.author.display_avatar.url,
+                                            files=attachments,
+                                            thread=reaction.message.channel if is_thread else discord.utils.MISSING,
+                                            author_id=user.id,
+                                            profile=data)
         await user.send("Message edited successfully!")
 
-        transformed_data = utils.load_transformed(reaction.message.guild)
+        transformed_data = await utils.load_transformed_async(reaction.message.guild)
         if transformed_data['logs'][0]:
             embed = utils.get_embed_base(title="Message Edited")
             embed.add_field(name="User", value=user.mention)
@@ -269,10 +318,11 @@ async def on_reaction_add(reaction: discord.Reaction, user: discord.User) -> Non
 
     if str(reaction.emoji) == "❌":
         if user.id == tfee:
-            await reaction.message.delete()
+            with metrics.timer("on_reaction_add", "message_delete"):
+                await reaction.message.delete()
             await user.send("Message deleted successfully!")
 
-            transformed_data = utils.load_transformed(reaction.message.guild)
+            transformed_data = await utils.load_transformed_async(reaction.message.guild)
             if transformed_data['logs'][1]:
                 embed = utils.get_embed_base(title="Message Deleted", color=discord.Color.red())
                 embed.add_field(name="User", value=user.mention)
@@ -282,13 +332,18 @@ async def on_reaction_add(reaction: discord.Reaction, user: discord.User) -> Non
         return
 
     # Claim related reactions
+    if len(matches) > 1:
+        await user.send(f"More than one user is transformed into \"{reaction.message.author.name}\", so we can't tell "
+                        f"which one you're trying to claim!")
+        return
     data_claim = data['claim']
-    transformed_data = utils.load_transformed(reaction.message.guild)
+    with metrics.timer("on_reaction_add", "load_transformed"):
+        transformed_data = await utils.load_transformed_async(reaction.message.guild)
     if str(reaction.emoji) == "🔒":
         if data_claim not in ["", 0]:
             await user.send(f"\"{reaction.message.author.name}\" is already claimed by {bot.get_user(data_claim).mention}!")
             return
-        utils.write_tf(bot.get_user(tfee), reaction.message.guild, claim_user=user.id)
+        await utils.write_tf_async(bot.get_user(tfee), reaction.message.guild, claim_user=user.id)
         await user.send(f"Successfully claimed \"{reaction.message.author.name}\" for yourself!")
         await reaction.message.channel.send(f"{user.mention} has claimed \"{reaction.message.author.name}\"!")
 
@@ -308,7 +363,7 @@ async def on_reaction_add(reaction: discord.Reaction, user: discord.User) -> Non
         if data_claim != user.name:
             await user.send(f"\"{reaction.message.author.name}\" is claimed by {data_claim}! You can't unclaim them!")
             return
-        utils.write_tf(bot.get_user(tfee), reaction.message.guild, claim_user=0, eternal=False)
+        await utils.write_tf_async(bot.get_user(tfee), reaction.message.guild, claim_user=0, eternal=False)
         await user.send(f"Successfully unclaimed \"{reaction.message.author.name}\"!")
         await reaction.message.channel.send(f"{user.mention} has unclaimed \"{reaction.message.author.name}\"!")
 
@@ -328,12 +383,12 @@ async def on_reaction_add(reaction: discord.Reaction, user: discord.User) -> Non
                                 f"You can't free them!")
                 return
             # Clear the eternal transformation
-            utils.write_tf(bot.get_user(tfee), reaction.message.guild, eternal=False)
+            await utils.write_tf_async(bot.get_user(tfee), reaction.message.guild, eternal=False)
             await user.send(f"Successfully un-eternally transformed \"{reaction.message.author.name}\"!")
             await reaction.message.channel.send(f"{user.mention} has un-eternally transformed"
                                                 f"\"{reaction.message.author.name}\"!")
             return
-        utils.write_tf(bot.get_user(tfee), reaction.message.guild, eternal=True, claim_user=user.id)
+        await utils.write_tf_async(bot.get_user(tfee), reaction.message.guild, eternal=True, claim_user=user.id)
         await user.send(f"Successfully eternally transformed \"{reaction.message.author.name}\"!")
         await reaction.message.channel.send(f"{user.mention} has eternally transformed"
                                             f"\"{reaction.message.author.name}\"!")
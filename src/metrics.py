@@ -0,0 +1,196 @@
+import asyncio
+import functools
+import os
+import time
+
+from collections import deque
+from typing import Callable
+
+from aiohttp import web
+
+from config import METRICS_HOST, METRICS_PORT, METRICS_FILE, METRICS_INTERVAL
+
+QUANTILES: tuple[float, ...] = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    """
+    Keeps track of how long something takes: how many times it happened, the total time, and the p50, p95 and p99 of
+    the most recent samples. Every combination of label values is tracked separately.
+    """
+    def __init__(self, name: str, description: str, labels: tuple[str, ...] = (), window: int = 1024) -> None:
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.window = window
+        self.series: dict[tuple[str, ...], list] = {}  # Label values -> [count, sum, recent samples]
+
+    def observe(self, value: float, *label_values: str) -> None:
+        series = self.series.get(label_values)
+        if series is None:
+            series = self.series[label_values] = [0, 0.0, deque(maxlen=self.window)]
+        series[0] += 1
+        series[1] += value
+        series[2].append(value)
+
+    def snapshot(self) -> dict[tuple[str, ...], dict]:
+        """
+        :return: For every combination of label values, the count, sum and quantiles of the samples.
+        """
+        result = {}
+        for label_values, (count, total, samples) in list(self.series.items()):
+            samples = sorted(samples)
+            result[label_values] = {'count': count, 'sum': total} | {
+                q: samples[min(len(samples) - 1, int(len(samples) * q))] if samples else 0.0 for q in QUANTILES
+            }
+        return result
+
+    def render(self) -> list[str]:
+        # Exported as a Prometheus summary, since we keep quantiles instead of buckets
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} summary"]
+        for label_values, values in self.snapshot().items():
+            labels = ",".join(f'{label}="{value}"' for label, value in zip(self.labels, label_values))
+            for q in QUANTILES:
+                lines.append(f'{self.name}{{{labels}{"," if labels else ""}quantile="{q}"}} {values[q]:.6f}')
+            labels = f"{{{labels}}}" if labels else ""
+            lines.append(f"{self.name}_sum{labels} {values['sum']:.6f}")
+            lines.append(f"{self.name}_count{labels} {values['count']}")
+        return lines
+
+
+class Timer:
+    """
+    Context manager that times whatever runs inside it, and records it in a histogram. Works around awaits too.
+    """
+    def __init__(self, histogram: Histogram, *label_values: str) -> None:
+        self.histogram = histogram
+        self.label_values = label_values
+        self.start = 0.0
+
+    def __enter__(self) -> "Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.histogram.observe(time.perf_counter() - self.start, *self.label_values)
+
+
+# How long each stage of handling a message (or reaction) takes, like loading data, transforming the text, or sending
+# the proxied message
+stage_seconds: Histogram = Histogram("transformate_stage_seconds",
+                                     "Time spent in each stage of the proxy pipeline, in seconds.",
+                                     ("handler", "stage"))
+
+# Functions that return extra lines to export, for stats that are kept somewhere else (caches, queues...)
+collectors: list[Callable[[], list[str]]] = []
+
+
+def timer(handler: str, stage: str) -> Timer:
+    """
+    Times a stage of a handler. Use it as `with metrics.timer("on_message", "load_tf"): ...`.
+
+    :param handler: The handler the stage belongs to.
+    :param stage: The name of the stage.
+
+    :return: The timer, to be used as a context manager.
+    """
+    return Timer(stage_seconds, handler, stage)
+
+
+def timed(handler: str):
+    """
+    Decorator that times a whole coroutine function, as the "total" stage of a handler.
+
+    :param handler: The name of the handler.
+
+    :return: The decorator.
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        async def wrapper(*args, **kwargs):
+            with timer(handler, "total"):
+                return await function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def gauge(name: str,
+          description: str,
+          values: dict[str, float] | float,
+          label: str = "",
+          kind: str = "gauge") -> list[str]:
+    """
+    Formats a gauge (or counter) in the Prometheus text format, for collectors.
+
+    :param name: The name of the metric.
+    :param description: What the metric means.
+    :param values: The value of the metric, or a dictionary of values keyed by the value of `label`.
+    :param label: The name of the label the values are keyed by.
+    :param kind: The Prometheus type of the metric, either "gauge" or "counter".
+
+    :return: The lines to export.
+    """
+    lines = [f"# HELP {name} {description}", f"# TYPE {name} {kind}"]
+    if isinstance(values, dict):
+        lines += [f'{name}{{{label}="{key}"}} {value}' for key, value in values.items()]
+    else:
+        lines.append(f"{name} {values}")
+    return lines
+
+
+def render() -> str:
+    """
+    :return: All metrics, in the Prometheus text format.
+    """
+    lines = stage_seconds.render()
+    for collector in collectors:
+        lines += collector()
+    return "\n".join(lines) + "\n"
+
+
+def dump(path: str = METRICS_FILE) -> None:
+    """
+    Writes all metrics to a file, in the Prometheus text format (which node_exporter's textfile collector can read).
+
+    :param path: The file to write the metrics to.
+
+    :return: This function does not return anything.
+    """
+    with open(f"{path}.tmp", "w") as f:
+        f.write(render())
+    os.replace(f"{path}.tmp", path)  # So nobody ever reads a half-written file
+
+
+async def _handle_metrics(request: web.Request) -> web.Response:
+    return web.Response(text=render(), content_type="text/plain", charset="utf-8")
+
+
+async def _dump_loop() -> None:
+    while True:
+        await asyncio.sleep(METRICS_INTERVAL)
+        try:
+            dump()
+        except OSError as e:
+            print(f"Error writing metrics:\n{str(type(e))}: {e}")
+
+
+_runner: web.AppRunner | None = None
+_dump_task: asyncio.Task | None = None
+
+
+async def start() -> None:
+    """
+    Starts serving the metrics on http://METRICS_HOST:METRICS_PORT/metrics, and dumping them to METRICS_FILE every
+    METRICS_INTERVAL seconds, for whichever of those is enabled. Does nothing if they're already running.
+
+    :return: This function does not return anything.
+    """
+    global _runner, _dump_task
+    if METRICS_PORT > 0 and _runner is None:
+        app = web.Application()
+        app.router.add_get("/metrics", _handle_metrics)
+        _runner = web.AppRunner(app)
+        await _runner.setup()
+        await web.TCPSite(_runner, METRICS_HOST, METRICS_PORT).start()
+    if METRICS_FILE and (_dump_task is None or _dump_task.done()):
+        _dump_task = asyncio.get_running_loop().create_task(_dump_loop())
@@ -0,0 +1,208 @@
+import json
+import os
+import time
+
+from collections import OrderedDict
+from typing import NamedTuple
+
+from config import PROVENANCE_PATH, PROVENANCE_SIZE, PROVENANCE_RETENTION
+
+# The parts of a user's TMUD data that are kept alongside every message they send
+SNAPSHOT_FIELDS: tuple[str, ...] = ('into', 'image_url', 'transformed_by', 'claim', 'eternal')
+
+
+class Provenance(NamedTuple):
+    """
+    Where a proxied message came from: who sent it, through which webhook, and as what.
+    """
+    message_id: int
+    webhook_id: int | None
+    channel_id: int
+    guild_id: int
+    author_id: int
+    sent_at: float
+    profile: dict  # The SNAPSHOT_FIELDS of the author's TMUD data for the server, when the message was sent
+
+
+class ProvenanceStore:
+    """
+    Remembers who sent the most recent proxied messages, so reactions and replies can find out exactly who's behind a
+    message, instead of guessing from its author's name.
+
+    Records are kept in memory, up to `capacity` of them, and appended to a log file, so they survive restarts. Records
+    older than `retention` seconds are dropped from the log whenever it's compacted, and so are the ones of users and
+    servers whose data is removed (see forget()).
+    """
+    def __init__(self,
+                 path: str = PROVENANCE_PATH,
+                 capacity: int = PROVENANCE_SIZE,
+                 retention: float = PROVENANCE_RETENTION) -> None:
+        self.path = path
+        self.capacity = capacity
+        self.retention = retention
+        self.records: OrderedDict[int, Provenance] = OrderedDict()
+        # Guild ID -> author ID -> IDs of their messages in `records`, so forgetting someone doesn't go through them all
+        self.index: dict[int, dict[int, set[int]]] = {}
+        self.pending: list[Provenance] = []  # Records that haven't been appended to the log yet
+        self.appended = 0  # Records appended since the log was last compacted
+        # (Guild ID, author ID) of records to drop from the log -> when the rule was last added, so compacting only
+        # removes the rules it actually applied
+        self.forgotten: dict[tuple[int | None, int | None], int] = {}
+        self.forget_count = 0
+        self.loaded = False
+
+    def add(self, record: Provenance) -> None:
+        """
+        Remembers a record, forgetting the oldest one if there are too many. It's appended to the log later on, alongside
+        any other pending records.
+
+        :param record: The record to remember.
+
+        :return: This function does not return anything.
+        """
+        self._unindex(self.records.get(record.message_id))
+        self.records[record.message_id] = record
+        self.records.move_to_end(record.message_id)
+        self.index.setdefault(record.guild_id, {}).setdefault(record.author_id, set()).add(record.message_id)
+        while len(self.records) > self.capacity:
+            self._unindex(self.records.popitem(last=False)[1])
+        self.pending.append(record)
+
+    def _unindex(self, record: Provenance | None) -> None:
+        authors = self.index.get(record.guild_id) if record is not None else None
+        if authors is None or record.author_id not in authors:
+            return
+        authors[record.author_id].discard(record.message_id)
+        if not authors[record.author_id]:
+            del authors[record.author_id]
+            if not authors:
+                del self.index[record.guild_id]
+
+    def get(self, message_id: int) -> Provenance | None:
+        """
+        :param message_id: The ID of a proxied message.
+
+        :return: The record of the message, or None if it's unknown (or too old to be remembered).
+        """
+        return self.records.get(message_id)
+
+    def forget(self, guild_id: int | None = None, author_id: int | None = None) -> None:
+        """
+        Forgets the records of a server, of a user, or of a user in a server. They're dropped from memory right away,
+        and from the log the next time it's written to.
+
+        :param guild_id: The ID of the server whose records will be forgotten, or None for all servers.
+        :param author_id: The ID of the user whose records will be forgotten, or None for all users.
+
+        :return: This function does not return anything.
+        """
+        for guild in [guild_id] if guild_id is not None else list(self.index):
+            authors = self.index.get(guild, {})
+            for author in [author_id] if author_id is not None else list(authors):
+                for message_id in authors.pop(author, ()):
+                    del self.records[message_id]
+            if not authors:
+                self.index.pop(guild, None)
+        rule = {(guild_id, author_id): 0}
+        if self.pending:
+            self.pending = [record for record in self.pending if not self._is_forgotten(record, rule)]
+
+        # A rule that covers this one already drops the same records from the log, and this one covers any narrower
+        # ones, so there's only ever one rule per server or user that's being forgotten
+        self.forget_count += 1
+        for wider in [(None, None), (guild_id, None), (None, author_id)]:
+            if wider in self.forgotten:
+                self.forgotten[wider] = self.forget_count
+                return
+        if guild_id is None or author_id is None:
+            for guild, author in list(self.forgotten):
+                if (guild_id is None or guild == guild_id) and (author_id is None or author == author_id):
+                    self.forgotten.pop((guild, author), None)
+        self.forgotten[(guild_id, author_id)] = self.forget_count
+
+    @staticmethod
+    def _is_forgotten(record: Provenance, forgotten: dict[tuple[int | None, int | None], int]) -> bool:
+        return ((record.guild_id, record.author_id) in forgotten or (record.guild_id, None) in forgotten or
+                (None, record.author_id) in forgotten or (None, None) in forgotten)
+
+    def take_pending(self) -> list[Provenance]:
+        """
+        :return: The records that haven't been appended to the log yet. They won't be returned again.
+        """
+        pending, self.pending = self.pending, []
+        return pending
+
+    def append(self, records: list[Provenance]) -> None:
+        """
+        Appends records to the log, compacting it first if it's grown a lot since the last time, or if some records have
+        to be forgotten. Blocking, so it's run on the I/O threads.
+
+        :param records: The records to append.
+
+        :return: This function does not return anything.
+        """
+        if self.forgotten:  # Forgotten since they were taken
+            records = [record for record in records if not self._is_forgotten(record, dict(self.forgotten))]
+        if self.appended >= self.capacity or self.forgotten:
+            self.compact()
+        if not records:
+            return
+        with open(self.path, "a") as f:
+            f.write("".join(json.dumps(record._asdict()) + "\n" for record in records))
+        self.appended += len(records)
+
+    def compact(self) -> list[Provenance]:
+        """
+        Rewrites the log without the records that are past the retention period, that have been forgotten, or that can't
+        be read. Blocking, so it's run on the I/O threads.
+
+        :return: The records that were kept, oldest first.
+        """
+        cutoff = time.time() - self.retention
+        forgotten = dict(self.forgotten)  # More can be added in the meantime, which will be dropped the next time
+        records = []
+        try:
+            with open(self.path, "r") as f:
+                for line in f:
+                    try:
+                        record = Provenance(**json.loads(line))
+                    except (ValueError, TypeError):  # A line that was cut short by a crash, most likely
+                        continue
+                    if record.sent_at >= cutoff and not self._is_forgotten(record, forgotten):
+                        records.append(record)
+        except FileNotFoundError:
+            self._drop_rules(forgotten)
+            return records
+        with open(f"{self.path}.tmp", "w") as f:
+            f.write("".join(json.dumps(record._asdict()) + "\n" for record in records))
+        os.replace(f"{self.path}.tmp", self.path)
+        self.appended = 0
+        self._drop_rules(forgotten)
+        return records
+
+    def _drop_rules(self, applied: dict[tuple[int | None, int | None], int]) -> None:
+        # Rules added again while they were being applied may have missed some records, so those are kept
+        for rule, count in applied.items():
+            if self.forgotten.get(rule) == count:
+                del self.forgotten[rule]
+
+    def load(self, records: list[Provenance]) -> None:
+        """
+        Remembers the records read from the log, keeping any that were added in the meantime.
+
+        :param records: The records returned by compact().
+
+        :return: This function does not return anything.
+        """
+        # Anything forgotten while the log was being read is still in there
+        forgotten = dict(self.forgotten)
+        records = [record for record in records if not self._is_forgotten(record, forgotten)]
+        current, self.records = self.records, OrderedDict((record.message_id, record)
+                                                          for record in records[-self.capacity:])
+        self.records.update(current)
+        while len(self.records) > self.capacity:
+            self.records.popitem(last=False)
+        self.index = {}
+        for record in self.records.values():
+            self.index.setdefault(record.guild_id, {}).setdefault(record.author_id, set()).add(record.message_id)
+        self.loaded = True
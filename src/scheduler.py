@@ -0,0 +1,239 @@
+import asyncio
+import time
+
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Hashable
+
+import discord
+
+from config import OUTBOUND_SEND_RATE, OUTBOUND_DELETE_RATE, OUTBOUND_BURST
+
+
+class TokenBucket:
+    """
+    Classic token bucket. It holds up to `capacity` tokens, and gets `rate` new ones every second.
+    """
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: float | None = None) -> float:
+        """
+        :param now: The current time, as returned by time.monotonic().
+
+        :return: How many seconds to wait until a token is available, 0 if there's one right now.
+        """
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        self._refill(time.monotonic())
+        self.tokens -= 1
+
+    def block(self, seconds: float) -> None:
+        """
+        Empties the bucket and stops giving out tokens for a while, for when Discord tells us we went too fast anyways.
+
+        :param seconds: How long to stop giving out tokens for.
+
+        :return: This function does not return anything.
+        """
+        self.tokens = 0
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+class Job:
+    def __init__(self,
+                 route: tuple,
+                 function: Callable[[], Awaitable],
+                 after: asyncio.Future | None) -> None:
+        self.route = route
+        self.function = function
+        self.after = after
+        self.future = asyncio.get_running_loop().create_future()
+        self.queued_at = time.monotonic()
+        self.retried = False
+
+
+class OutboundScheduler:
+    """
+    Sends things to Discord in the background, without going over the rate limits.
+
+    - Every route (a kind of request, in a specific channel) has its own token bucket, so a busy channel doesn't slow
+      down the rest, and we wait on our side instead of having Discord answer with a 429.
+    - Every server gets its turn in order, so a burst of messages in one server doesn't delay every other server.
+    - Jobs with the same ordering key (a channel and an author) always run one after another, in the order they were
+      submitted, so a user's messages never arrive out of order.
+    """
+    def __init__(self,
+                 send_rate: float = OUTBOUND_SEND_RATE,
+                 delete_rate: float = OUTBOUND_DELETE_RATE,
+                 burst: int = OUTBOUND_BURST,
+                 wait_samples: int = 1024) -> None:
+        self.rates = {'send': send_rate, 'delete': delete_rate}
+        self.burst = max(burst, 1)
+        self.buckets: dict[tuple, TokenBucket] = {}
+        # Server ID -> ordering key -> jobs waiting in that lane. Lanes with a job currently running are in `busy`.
+        self.queues: OrderedDict[int, OrderedDict[Hashable, deque[Job]]] = OrderedDict()
+        self.busy: set[Hashable] = set()
+        self.depth = 0
+        self.running = 0
+        self.waits: deque[float] = deque(maxlen=wait_samples)
+        self.total_jobs = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.failures = 0
+        self._wakeup: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+
+    def bucket(self, route: tuple) -> TokenBucket:
+        bucket = self.buckets.get(route)
+        if bucket is None:
+            bucket = self.buckets[route] = TokenBucket(self.rates.get(route[0], OUTBOUND_SEND_RATE), self.burst)
+        return bucket
+
+    def submit(self,
+               guild_id: int,
+               key: Hashable,
+               route: tuple,
+               function: Callable[[], Awaitable],
+               after: asyncio.Future | None = None) -> asyncio.Future:
+        """
+        Queues a request to Discord.
+
+        :param guild_id: The ID of the server the request is for, so servers can take turns.
+        :param key: The ordering key. Jobs with the same key run one at a time, in order. Usually a channel and author.
+        :param route: The route the request counts against, like ("send", channel_id) or ("delete", channel_id).
+        :param function: Function that makes the request when called, returning an awaitable.
+        :param after: The future of a previous job with the same key. If that job failed, this one is skipped, and its
+        future is cancelled.
+
+        :return: A future with the result of the request. Errors are printed out, so it doesn't need to be awaited.
+        """
+        job = Job(route, function, after)
+        job.future.add_done_callback(self._report)
+        self.queues.setdefault(guild_id, OrderedDict()).setdefault(key, deque()).append(job)
+        self.depth += 1
+        self._start()
+        self._wakeup.set()
+        return job.future
+
+    def _start(self) -> None:
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._dispatch())
+
+    @staticmethod
+    def _report(future: asyncio.Future) -> None:
+        if not future.cancelled() and future.exception() is not None:
+            e = future.exception()
+            print(f"Error sending to Discord:\n{str(type(e))}: {e}")
+
+    def _next_job(self) -> tuple[int | None, Hashable | None, float]:
+        """
+        Finds the next job that can run right now, giving every server a turn in order.
+
+        :return: The server ID and ordering key of the job, or None for both, alongside how long to wait until some
+        job might be able to run.
+        """
+        now = time.monotonic()
+        wait = float('inf')
+        for guild_id, lanes in self.queues.items():
+            for key, lane in lanes.items():
+                if key in self.busy:
+                    continue
+                delay = self.bucket(lane[0].route).delay(now)
+                if delay <= 0:
+                    return guild_id, key, 0.0
+                wait = min(wait, delay)
+        return None, None, wait
+
+    async def _dispatch(self) -> None:
+        while True:
+            guild_id, key, wait = self._next_job()
+            if guild_id is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), None if wait == float('inf') else wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            lanes = self.queues[guild_id]
+            job = lanes[key].popleft()
+            # Send this lane (and server) to the back of the line, so every other one goes before it gets another turn
+            if lanes[key]:
+                lanes.move_to_end(key)
+            else:
+                del lanes[key]
+            del self.queues[guild_id]
+            if lanes:
+                self.queues[guild_id] = lanes
+            self.depth -= 1
+            self.bucket(job.route).take()
+            self.busy.add(key)
+            self.running += 1
+            asyncio.get_running_loop().create_task(self._run(guild_id, key, job))
+
+    async def _run(self, guild_id: int, key: Hashable, job: Job) -> None:
+        wait = time.monotonic() - job.queued_at
+        self.waits.append(wait)
+        self.total_jobs += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        requeue = False
+        try:
+            if job.after is not None and (job.after.cancelled() or job.after.exception() is not None):
+                job.future.cancel()  # The job this one depended on failed, so there's nothing to do
+            else:
+                job.future.set_result(await job.function())
+        except discord.HTTPException as e:
+            if e.status == 429 and not job.retried:  # Discord still thinks we went too fast, so try again later
+                try:
+                    retry_after = float(e.response.headers.get('Retry-After', 1))
+                except (AttributeError, TypeError, ValueError):
+                    retry_after = 1.0
+                self.bucket(job.route).block(retry_after)
+                job.retried = requeue = True
+            else:
+                self.failures += 1
+                job.future.set_exception(e)
+        except Exception as e:
+            self.failures += 1
+            job.future.set_exception(e)
+        finally:
+            if requeue:  # Back to the front of its lane, so it keeps its place in line
+                self.queues.setdefault(guild_id, OrderedDict()).setdefault(key, deque()).appendleft(job)
+                self.queues[guild_id].move_to_end(key, last=False)
+                self.depth += 1
+            self.busy.discard(key)
+            self.running -= 1
+            self._wakeup.set()
+
+    def stats(self) -> dict:
+        """
+        :return: A dictionary with how many jobs are queued (in total and per server), how many are running, and how
+        long jobs have waited in the queue, in seconds.
+        """
+        waits = sorted(self.waits)
+        return {
+            'depth': self.depth,
+            'running': self.running,
+            'guild_depths': {guild_id: sum(len(lane) for lane in lanes.values())
+                             for guild_id, lanes in self.queues.items()},
+            'jobs': self.total_jobs,
+            'failures': self.failures,
+            'wait_avg': self.total_wait / self.total_jobs if self.total_jobs else 0.0,
+            'wait_p50': waits[len(waits) // 2] if waits else 0.0,
+            'wait_p95': waits[int(len(waits) * 0.95)] if waits else 0.0,
+            'wait_max': self.max_wait,
+        }
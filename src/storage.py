@@ -0,0 +1,818 @@
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from collections import Counter
+from pathlib import Path
+
+from config import CACHE_PATH, STORAGE_BACKEND, SQLITE_PATH, STORAGE_CHECKSUMS
+
+# The order in which the fields of a server's TMUD data are laid out, so loaded data looks like freshly written data
+TMUD_MODIFIERS: list[str] = ['prefix', 'suffix', 'censor', 'sprinkle', 'muffle', 'alt_muffle']
+TMUD_BLOCKS: list[str] = ['blocked_channels', 'blocked_users']
+
+# The fields that backends which split the data up (like SQLite) know about. Any others are still kept, just as they are
+TMUD_FIELDS: list[str] = ['transformed_by', 'into', 'image_url', 'claim', 'eternal', 'big', 'small', 'hush', 'backwards',
+                          'stutter', 'bio'] + TMUD_MODIFIERS + TMUD_BLOCKS
+SERVER_FIELDS: list[str] = ['logs', 'clear_other_logs', 'transformed_users', 'images'] + TMUD_BLOCKS
+
+# DATA VERSIONS
+# REMEMBER TO REGENERATE (OR UPDATE) ALL TRANSFORMATION DATA IF YOU CHANGE THE VERSION
+# VERSION 16: Removed "proxy_prefix" and "proxy_suffix" fields, removed "active" and "contents" subfields from modifiers, and removed per-channel data
+# VERSION 15: Added individual chances to all modifiers - ADDENDUM 1: Made the "transformed_by" and "claim" fields be integers now
+# VERSION 14: Added "stutter" field
+# VERSION 13: Made "claim" field be an integer, instead of a string
+# VERSION 12: Added compatibility for multiple characters, when in tupper-like mode (Added "index" field)
+# VERSION 11: Added "proxy_prefix" and "proxy_suffix" fields
+# VERSION 10: Added "alt_muffle" field
+# VERSION 9: Added "blocked_users" field
+# VERSION 8: Added "upside_down" and "backwards" fields
+# VERSION 7: Added "bio" field
+# VERSION 6: Added "blocked_channels" field
+# VERSION 5: Fixing the fields to accept multiple values as well as a percentage chance for each field.
+# VERSION 4: Reworked to work with per-channel data. - DROPPED SUPPORT FOR TRANSLATING PREVIOUS VERSIONS
+# VERSION 3: Added "big", "small", and "hush" fields, and changed "eternal" from bool to int
+# VERSION 2: Added guild-specific data
+# VERSION 1: Base version
+CURRENT_TMUD_VERSION = 16
+
+# VERSION 10: Removed per-channel data
+# VERSION 9: Removed "affixes" field
+# VERSION 8: Added "images" field
+# VERSION 7: Added compatibility with the new multi-character mode for TFee Data v12
+# VERSION 6: Added "affixes" field
+# VERSION 5: Added "logs" and "clear_other_logs" fields
+# VERSION 4: Each user now stores the channels they're transformed on
+# VERSION 3: Added "blocked_users" field
+# VERSION 2: Added "blocked_channels" and "transformed_users" fields
+# VERSION 1: Base version
+CURRENT_TRANSFORMED_DATA_VERSION = 10
+
+
+# How many times each storage function has been called, so benchmarks and metrics can tell how much I/O is going on
+io_counts: Counter = Counter()
+
+
+def _counted(function):
+    # Counts every call to a function in io_counts
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        io_counts[function.__name__] += 1
+        return function(*args, **kwargs)
+    return wrapper
+
+
+# FILE UTILS
+class CorruptFileError(ValueError):
+    """
+    Raised when a file can't be read back: it isn't valid JSON, or it doesn't match its checksum.
+    """
+    def __init__(self, filename: str, reason: str) -> None:
+        super().__init__(f"{filename}: {reason}")
+        self.filename = filename
+        self.reason = reason
+
+
+# Directories that had files replaced in them since they were last synced, so they can be synced once per batch of
+# writes, instead of once per file
+_unsynced_directories: set[str] = set()
+
+# The latest checksum written for each file, so writing it again doesn't have to read its sidecar file
+_checksums: dict[str, str] = {}
+
+
+def _replace(filename: str, contents: bytes) -> None:
+    # Writes the contents to a temporary file, makes sure they're on disk, and only then swaps it with the real file,
+    # so a crash (or a full disk) at any point leaves either the old file or the new one, never half of one
+    try:
+        with open(f"{filename}.tmp", "wb") as f:
+            f.write(contents)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(f"{filename}.tmp", filename)
+    except OSError:
+        try:
+            os.remove(f"{filename}.tmp")
+        except OSError:
+            pass
+        raise
+    _unsynced_directories.add(os.path.dirname(filename) or ".")
+
+
+def _read_checksums(filename: str) -> list[str]:
+    # The checksums a file is allowed to have, as stored in its sidecar file (newest first), or [] if there's none
+    try:
+        with open(f"{filename}.sha256") as f:
+            return f.read().split()
+    except FileNotFoundError:
+        return []
+
+
+def _previous_checksum(filename: str) -> str:
+    if filename in _checksums:
+        return _checksums[filename]
+    checksums = _read_checksums(filename)
+    if checksums:
+        return checksums[0]
+    try:  # The file was written before checksums were turned on
+        with open(filename, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except FileNotFoundError:
+        return ""
+
+
+@_counted
+def load_file(filename: str, guild_id: int | None = None) -> dict:
+    """
+    Loads a JSON file from disk. If `guild_id` is specified, returns only the data for that guild.
+
+    :param filename: The path to the JSON file to load.
+    :param guild_id: The ID of the guild to load data for. If not specified, returns the entire file.
+
+    :return: A dictionary containing the data from the JSON file, or the data for the specified guild.
+
+    :raises CorruptFileError: If the file isn't valid JSON, or, with STORAGE_CHECKSUMS on, doesn't match its checksum.
+    """
+    try:
+        with open(filename, "rb") as f:
+            contents = f.read()
+    except FileNotFoundError:  # Nothing has been written yet
+        return {}
+    except OSError as e:
+        print(f"Error loading file:\n{str(type(e))}: {e}")
+        return {}
+    if STORAGE_CHECKSUMS:
+        checksums = _read_checksums(filename)
+        checksum = hashlib.sha256(contents).hexdigest()
+        if checksums and checksum not in checksums:
+            raise CorruptFileError(filename, "checksum mismatch")
+        _checksums[filename] = checksum  # Which may not be the newest one, if the last write was cut short
+    if contents.strip() == b"":
+        return {}
+    try:
+        data = json.loads(contents)
+    except ValueError as e:  # Also covers contents that aren't valid UTF-8
+        raise CorruptFileError(filename, str(e)) from e
+    if guild_id is None:
+        return data
+    if str(guild_id) in data:
+        return data[str(guild_id)]
+    return {}
+
+
+@_counted
+def write_file(filename: str, data: dict) -> None:
+    """
+    Writes a dictionary to a JSON file on disk, atomically. With STORAGE_CHECKSUMS on, its checksum is written to a
+    sidecar file (`<filename>.sha256`) right before it, alongside the checksum of the data it replaces, so a crash in
+    between still leaves a file that matches one of them.
+
+    The directory isn't synced, so the rename itself may still be lost in a crash. Call sync_directories() once done
+    writing a batch of files.
+
+    :param filename: The path to the JSON file to write.
+    :param data: The dictionary to write to the JSON file.
+
+    :return: This function does not return anything.
+
+    :raises OSError: If the file couldn't be written. The old file is left as it was.
+    """
+    contents = json.dumps(data).encode()
+    if STORAGE_CHECKSUMS:
+        checksum = hashlib.sha256(contents).hexdigest()
+        previous = _previous_checksum(filename)
+        _replace(f"{filename}.sha256", f"{checksum} {previous}".strip().encode())
+        _checksums[filename] = checksum
+    _replace(filename, contents)
+
+
+def remove_file(filename: str) -> None:
+    """
+    Removes a file from disk, alongside its checksum, if it has one.
+
+    :param filename: The path to the file to remove.
+
+    :return: This function does not return anything.
+
+    :raises FileNotFoundError: If the file doesn't exist.
+    """
+    os.remove(filename)
+    _checksums.pop(filename, None)
+    try:
+        os.remove(f"{filename}.sha256")
+    except FileNotFoundError:
+        pass
+    _unsynced_directories.add(os.path.dirname(filename) or ".")
+
+
+def sync_directories() -> None:
+    """
+    Syncs every directory that had files written to or removed from it since the last time, so those changes survive a
+    crash too. Done once per batch of writes, since syncing is slow.
+
+    :return: This function does not return anything.
+    """
+    while _unsynced_directories:
+        directory = _unsynced_directories.pop()
+        try:
+            fd = os.open(directory, os.O_RDONLY)
+        except OSError:  # Directories can't be opened on some systems (like Windows), nor do they need to be synced
+            continue
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+
+def quarantine_file(filename: str, quarantine_path: str) -> str:
+    """
+    Moves a corrupt file (and its checksum, if it has one) out of the way, into the quarantine directory, so it can be
+    looked at later, instead of being overwritten.
+
+    :param filename: The path to the corrupt file.
+    :param quarantine_path: The directory to move it into.
+
+    :return: The path the file was moved to.
+    """
+    Path(quarantine_path).mkdir(parents=True, exist_ok=True)
+    # Keep the name of the directory it was in, since user and server files can have the same name
+    target = (f"{quarantine_path}/{os.path.basename(os.path.dirname(filename))}-{os.path.basename(filename)}"
+              f".{int(time.time())}")
+    os.replace(filename, target)
+    _checksums.pop(filename, None)
+    if os.path.exists(f"{filename}.sha256"):
+        os.replace(f"{filename}.sha256", f"{target}.sha256")
+    _unsynced_directories.update([os.path.dirname(filename) or ".", quarantine_path])
+    return target
+
+
+# DATA MIGRATIONS
+def migrate_tmud(data: dict) -> bool:
+    """
+    Brings a user's TMUD data up to the current version, in place.
+
+    :param data: The full TMUD data of the user, as loaded from the storage.
+
+    :return: Whether the data had to be migrated from an older version.
+    """
+    migrated = False
+    if data == {} or data['version'] != CURRENT_TMUD_VERSION:
+        if data != {}:
+            migrated = True
+            for server in data:
+                if server == 'version' or 'all' not in data[server]:
+                    continue
+                # Only the data for all channels is kept, alongside the blocks, which used to live next to it
+                profile = data[server]['all']
+                for kind in TMUD_BLOCKS:
+                    profile[kind] = data[server].get(kind, profile.get(kind, []))
+                profile.pop('proxy_prefix', None)
+                profile.pop('proxy_suffix', None)
+                for modifier in TMUD_MODIFIERS:
+                    if isinstance(profile.get(modifier), dict) and 'contents' in profile[modifier]:
+                        profile[modifier] = profile[modifier]['contents']
+                data[server] = profile
+        data['version'] = CURRENT_TMUD_VERSION
+    return migrated
+
+
+def migrate_server_data(data: dict) -> bool:
+    """
+    Brings the server data up to the current version, in place.
+
+    :param data: The server data of every server, as loaded from the storage.
+
+    :return: Whether the data had to be migrated from an older version (or set up from nothing).
+    """
+    migrated = False
+    if data == {} or ('version' in data and int(data['version']) != CURRENT_TRANSFORMED_DATA_VERSION):
+        migrated = True
+        if 'version' in data and int(data['version']) == 7:
+            for server in data:
+                if server == 'version':
+                    continue
+                data[server]['images'] = None
+            data['version'] = 8
+        if 'version' in data and int(data['version']) == 8:
+            for server in data:
+                if server == 'version':
+                    continue
+                del data[server]['affixes']
+            data['version'] = 9
+        if 'version' in data and int(data['version']) == 9:
+            for server in data:
+                if server == 'version':
+                    continue
+                for user in list(data[server]['transformed_users']):
+                    if data[server]['transformed_users'][user] in [[], None]:
+                        del data[server]['transformed_users'][user]
+                        continue
+                    del data[server]['transformed_users'][user]
+                    data[server]['transformed_users'][user] = True
+        data['version'] = 10
+    return migrated
+
+
+# STORAGE BACKENDS
+# Every backend stores the same two kinds of documents: TMUD data (one per user, keyed by guild ID, plus a "version"
+# field), and the server data (keyed by guild ID, plus a "version" field). Writes always receive the full document,
+# alongside the guild that changed, if only one did, so backends that can update a single server's data do so.
+def _locked(function):
+    # Makes a method hold its object's lock while running
+    @functools.wraps(function)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return function(self, *args, **kwargs)
+    return wrapper
+
+
+class JSONStorage:
+    """
+    Stores every user's TMUD data as a JSON file in the `people` directory, and every server's data as a JSON file in
+    the `guilds` directory. Each server file is laid out like the old, single `transformed.json` file, but holding only
+    that one server, so changing a server's data only rewrites that server's file.
+
+    Files that can't be read back are moved into the `quarantine` directory, so a single broken file only affects its
+    own user or server.
+    """
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.quarantine_path = f'{path}/quarantine'
+        self.migrate_transformed()
+
+    def _load(self, filename: str) -> dict:
+        try:
+            return load_file(filename)
+        except CorruptFileError as e:
+            self._quarantine(e)
+            return {}
+
+    def _quarantine(self, error: CorruptFileError) -> None:
+        try:
+            target = quarantine_file(error.filename, self.quarantine_path)
+        except OSError as e:
+            print(f"Error quarantining file:\n{str(type(e))}: {e}")
+            return
+        print(f"Quarantined corrupt file {error.filename} ({error.reason}) as {target}")
+
+    @_counted
+    def load_user(self, user_id: str) -> dict:
+        return self._load(f'{self.path}/people/{user_id}.json')
+
+    @_counted
+    def write_user(self, user_id: str, data: dict, guild_id: str | None = None) -> None:
+        write_file(f'{self.path}/people/{user_id}.json', data)
+
+    @_counted
+    def remove_user(self, user_id: str) -> None:
+        try:
+            remove_file(f'{self.path}/people/{user_id}.json')
+        except FileNotFoundError:  # Their data was never written
+            pass
+
+    def list_users(self) -> list[str]:
+        try:
+            return [file[:-5] for file in os.listdir(f'{self.path}/people') if file.endswith(".json")]
+        except OSError:
+            return []
+
+    def list_guilds(self) -> list[str]:
+        try:
+            return [file[:-5] for file in os.listdir(f'{self.path}/guilds') if file.endswith(".json")]
+        except OSError:
+            return []
+
+    @_counted
+    def load_transformed(self) -> dict:
+        # Put all server files together, as if they were still a single file. The oldest version wins, so any
+        # server that still has to be updated gets updated.
+        data = {}
+        for guild_id in self.list_guilds():
+            shard = self._load(f'{self.path}/guilds/{guild_id}.json')
+            if guild_id not in shard:
+                continue
+            if 'version' in shard and ('version' not in data or int(shard['version']) < int(data['version'])):
+                data['version'] = shard['version']
+            data[guild_id] = shard[guild_id]
+        return data
+
+    @_counted
+    def write_transformed(self, data: dict, guild_id: str | None = None) -> None:
+        guilds = [guild_id] if guild_id is not None else [guild for guild in data if guild != 'version']
+        for guild in guilds:
+            if guild not in data:
+                self._remove_guild(guild)
+                continue
+            shard = {guild: data[guild]}
+            if 'version' in data:
+                shard = {'version': data['version']} | shard
+            write_file(f'{self.path}/guilds/{guild}.json', shard)
+        if guild_id is None:
+            for guild in self.list_guilds():
+                if guild not in data:
+                    self._remove_guild(guild)
+
+    def _remove_guild(self, guild_id: str) -> None:
+        try:
+            remove_file(f'{self.path}/guilds/{guild_id}.json')
+        except FileNotFoundError:
+            pass
+
+    def migrate_transformed(self) -> None:
+        """
+        Splits the old, single `transformed.json` file into one file per server, if it's still around. The old file is
+        kept as `transformed.json.bak`, just in case.
+
+        :return: This function does not return anything.
+        """
+        Path(f'{self.path}/people').mkdir(parents=True, exist_ok=True)
+        Path(f'{self.path}/guilds').mkdir(parents=True, exist_ok=True)
+        if not os.path.exists(f'{self.path}/transformed.json'):
+            return
+        try:
+            data = load_file(f'{self.path}/transformed.json')
+        except CorruptFileError as e:
+            self._quarantine(e)
+            return
+        self.write_transformed(data)
+        self.sync()
+        os.replace(f'{self.path}/transformed.json', f'{self.path}/transformed.json.bak')
+        print(f"Split transformed.json into {len(data) - ('version' in data)} server files")
+
+    def sync(self) -> None:
+        """
+        Makes sure every file written or removed so far survives a crash. Called once after every batch of writes.
+
+        :return: This function does not return anything.
+        """
+        sync_directories()
+
+    def scan(self) -> list[str]:
+        """
+        Checks that every user and server file can be read back, quarantining the ones that can't, and removes any
+        temporary files left behind by a crash. Files are never parsed: with STORAGE_CHECKSUMS on, they're checked
+        against their checksums, and, without it, only their first and last few bytes are checked, so this stays fast
+        even with lots of users. Must not run alongside any writes, or it could remove a file that's being written.
+
+        :return: The paths of the files that were quarantined.
+        """
+        quarantined = []
+        for directory in [f'{self.path}/people', f'{self.path}/guilds']:
+            try:
+                files = os.listdir(directory)
+            except OSError:
+                continue
+            for file in files:
+                filename = f'{directory}/{file}'
+                if file.endswith(".tmp"):
+                    try:
+                        os.remove(filename)
+                    except OSError as e:
+                        print(f"Error removing file:\n{str(type(e))}: {e}")
+                    continue
+                if not file.endswith(".json"):
+                    continue
+                try:
+                    self._verify(filename)
+                except CorruptFileError as e:
+                    self._quarantine(e)
+                    quarantined.append(filename)
+        self.sync()
+        return quarantined
+
+    @staticmethod
+    def _verify(filename: str) -> None:
+        # Raises CorruptFileError if the file can't be read back
+        if STORAGE_CHECKSUMS:
+            checksums = _read_checksums(filename)
+            if checksums:
+                try:
+                    with open(filename, "rb") as f:
+                        checksum = hashlib.sha256(f.read()).hexdigest()
+                except OSError:
+                    return
+                if checksum not in checksums:
+                    raise CorruptFileError(filename, "checksum mismatch")
+                _checksums[filename] = checksum
+                return
+        # Without a checksum, only check that the file looks like a whole JSON object, which catches files that were
+        # cut short, without reading (let alone parsing) all of them. Anything else is caught when the file is loaded.
+        try:
+            with open(filename, "rb") as f:
+                size = f.seek(0, os.SEEK_END)
+                f.seek(0)
+                head = f.read(16).lstrip()
+                f.seek(max(size - 16, 0))
+                tail = f.read().rstrip()
+        except OSError:
+            return
+        if (head or tail) and not (head.startswith(b"{") and tail.endswith(b"}")):
+            raise CorruptFileError(filename, "incomplete JSON")
+
+
+class SQLiteStorage:
+    """
+    Stores all data in a SQLite database, with one row per user and server profile, so every change to a single
+    server's data only touches the rows for that server.
+    """
+    SCHEMA: str = """
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value
+        );
+        CREATE TABLE IF NOT EXISTS users (
+            user_id TEXT PRIMARY KEY,
+            version INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS profiles (
+            user_id TEXT NOT NULL,
+            guild_id TEXT NOT NULL,
+            transformed_by,
+            into_name TEXT,
+            image_url TEXT,
+            claim,
+            eternal INTEGER,
+            big INTEGER,
+            small INTEGER,
+            hush INTEGER,
+            backwards INTEGER,
+            stutter,
+            bio TEXT,
+            extra TEXT,
+            PRIMARY KEY (user_id, guild_id)
+        );
+        CREATE TABLE IF NOT EXISTS modifiers (
+            user_id TEXT NOT NULL,
+            guild_id TEXT NOT NULL,
+            modifier TEXT NOT NULL,
+            content TEXT NOT NULL,
+            value,
+            PRIMARY KEY (user_id, guild_id, modifier, content)
+        );
+        CREATE TABLE IF NOT EXISTS user_blocks (
+            user_id TEXT NOT NULL,
+            guild_id TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            target TEXT NOT NULL,
+            PRIMARY KEY (user_id, guild_id, kind, target)
+        );
+        CREATE TABLE IF NOT EXISTS guilds (
+            guild_id TEXT PRIMARY KEY,
+            edit_logs INTEGER,
+            delete_logs INTEGER,
+            transform_logs INTEGER,
+            claim_logs INTEGER,
+            clear_other_logs INTEGER,
+            images INTEGER,
+            extra TEXT
+        );
+        CREATE TABLE IF NOT EXISTS guild_blocks (
+            guild_id TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            target TEXT NOT NULL,
+            PRIMARY KEY (guild_id, kind, target)
+        );
+        CREATE TABLE IF NOT EXISTS transformed_users (
+            guild_id TEXT NOT NULL,
+            user_id TEXT NOT NULL,
+            active INTEGER NOT NULL,
+            PRIMARY KEY (guild_id, user_id)
+        );
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        # The database is used from the I/O threads, so we make sure only one of them uses it at once
+        self.lock = threading.RLock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(self.SCHEMA)
+        # Databases created before fields the schema doesn't know about were kept don't have a column for them
+        for table in ['profiles', 'guilds']:
+            if 'extra' not in [row[1] for row in self.db.execute(f"PRAGMA table_info({table})")]:
+                self.db.execute(f"ALTER TABLE {table} ADD COLUMN extra TEXT")
+
+    def sync(self) -> None:
+        # Every write is already its own transaction, which SQLite makes crash-safe on its own
+        pass
+
+    @_locked
+    def scan(self) -> list[str]:
+        """
+        Checks the database for corruption. It can't be fixed from here, so any problems are only reported.
+
+        :return: The problems found, if any.
+        """
+        problems = [row[0] for row in self.db.execute("PRAGMA quick_check").fetchall()]
+        if problems == ["ok"]:
+            return []
+        for problem in problems:
+            print(f"Database problem found: {problem}")
+        return problems
+
+    # TMUD data
+    @_locked
+    @_counted
+    def load_user(self, user_id: str) -> dict:
+        row = self.db.execute("SELECT version FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        if row is None:
+            return {}
+        data = {'version': row[0]}
+        for row in self.db.execute("SELECT guild_id, transformed_by, into_name, image_url, claim, eternal, big, small, "
+                                   "hush, backwards, stutter, bio, extra FROM profiles WHERE user_id = ? "
+                                   "ORDER BY rowid", (user_id,)):
+            data[row[0]] = {
+                'blocked_channels': [],
+                'blocked_users': [],
+                'transformed_by': row[1],
+                'into': row[2],
+                'image_url': row[3],
+                'claim': row[4],
+                'eternal': bool(row[5]),
+                'prefix': {},
+                'suffix': {},
+                'big': bool(row[6]),
+                'small': bool(row[7]),
+                'hush': bool(row[8]),
+                'backwards': bool(row[9]),
+                'censor': {},
+                'sprinkle': {},
+                'muffle': {},
+                'alt_muffle': {},
+                'stutter': row[10],
+                'bio': row[11]
+            }
+            if row[12] is not None:
+                data[row[0]].update(json.loads(row[12]))
+        for guild_id, modifier, content, value in self.db.execute(
+                "SELECT guild_id, modifier, content, value FROM modifiers WHERE user_id = ? ORDER BY rowid",
+                (user_id,)):
+            if guild_id in data:
+                data[guild_id][modifier][content] = value
+        for guild_id, kind, target in self.db.execute(
+                "SELECT guild_id, kind, target FROM user_blocks WHERE user_id = ? ORDER BY rowid", (user_id,)):
+            if guild_id in data:
+                data[guild_id][kind].append(target)
+        return data
+
+    @_locked
+    @_counted
+    def write_user(self, user_id: str, data: dict, guild_id: str | None = None) -> None:
+        with self.db:
+            self.db.execute("INSERT INTO users (user_id, version) VALUES (?, ?) "
+                            "ON CONFLICT (user_id) DO UPDATE SET version = excluded.version",
+                            (user_id, data.get('version', 0)))
+            guilds = [guild_id] if guild_id is not None else [guild for guild in data if guild != 'version']
+            if guild_id is None:
+                self._delete_user_rows("user_id = ?", (user_id,))
+            else:
+                self._delete_user_rows("user_id = ? AND guild_id = ?", (user_id, guild_id))
+            for guild in guilds:
+                if guild in data:
+                    self._insert_profile(user_id, guild, data[guild])
+
+    @_locked
+    @_counted
+    def remove_user(self, user_id: str) -> None:
+        with self.db:
+            self.db.execute("DELETE FROM users WHERE user_id = ?", (user_id,))
+            self._delete_user_rows("user_id = ?", (user_id,))
+
+    @_locked
+    def list_users(self) -> list[str]:
+        return [row[0] for row in self.db.execute("SELECT user_id FROM users")]
+
+    def _delete_user_rows(self, where: str, params: tuple) -> None:
+        for table in ['profiles', 'modifiers', 'user_blocks']:
+            self.db.execute(f"DELETE FROM {table} WHERE {where}", params)
+
+    def _insert_profile(self, user_id: str, guild_id: str, profile: dict) -> None:
+        self.db.execute("INSERT INTO profiles (user_id, guild_id, transformed_by, into_name, image_url, claim, eternal, "
+                        "big, small, hush, backwards, stutter, bio, extra) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (user_id, guild_id, profile.get('transformed_by'), profile.get('into'),
+                         profile.get('image_url'), profile.get('claim', 0), profile.get('eternal', False),
+                         profile.get('big', False), profile.get('small', False), profile.get('hush', False),
+                         profile.get('backwards', False), profile.get('stutter', 0), profile.get('bio'),
+                         self._extra(profile, TMUD_FIELDS)))
+        self.db.executemany("INSERT OR REPLACE INTO modifiers (user_id, guild_id, modifier, content, value) "
+                            "VALUES (?, ?, ?, ?, ?)",
+                            [(user_id, guild_id, modifier, content, value)
+                             for modifier in TMUD_MODIFIERS
+                             for content, value in (profile.get(modifier) or {}).items()])
+        self.db.executemany("INSERT OR IGNORE INTO user_blocks (user_id, guild_id, kind, target) VALUES (?, ?, ?, ?)",
+                            [(user_id, guild_id, kind, str(target))
+                             for kind in TMUD_BLOCKS
+                             for target in profile.get(kind, [])])
+
+    @staticmethod
+    def _extra(data: dict, fields: list[str]) -> str | None:
+        # The fields that don't have a column of their own, as JSON, or None if there aren't any
+        extra = {field: value for field, value in data.items() if field not in fields}
+        return json.dumps(extra) if extra else None
+
+    # Server data
+    @_locked
+    @_counted
+    def load_transformed(self) -> dict:
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'transformed_version'").fetchone()
+        data = {} if row is None else {'version': row[0]}
+        for row in self.db.execute("SELECT guild_id, edit_logs, delete_logs, transform_logs, claim_logs, "
+                                   "clear_other_logs, images, extra FROM guilds ORDER BY rowid"):
+            data[row[0]] = {
+                'blocked_users': [],
+                'blocked_channels': [],
+                'logs': list(row[1:5]),
+                'clear_other_logs': bool(row[5]),
+                'transformed_users': {},
+                'images': row[6]
+            }
+            if row[7] is not None:
+                data[row[0]].update(json.loads(row[7]))
+        for guild_id, kind, target in self.db.execute("SELECT guild_id, kind, target FROM guild_blocks ORDER BY rowid"):
+            if guild_id in data:
+                data[guild_id][kind].append(target)
+        for guild_id, user_id, active in self.db.execute(
+                "SELECT guild_id, user_id, active FROM transformed_users ORDER BY rowid"):
+            if guild_id in data:
+                data[guild_id]['transformed_users'][user_id] = bool(active)
+        return data
+
+    @_locked
+    @_counted
+    def write_transformed(self, data: dict, guild_id: str | None = None) -> None:
+        with self.db:
+            if 'version' in data:
+                self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('transformed_version', ?)",
+                                (data['version'],))
+            if guild_id is None:
+                self._delete_guild_rows("1 = 1", ())
+                guilds = [guild for guild in data if guild != 'version']
+            else:
+                self._delete_guild_rows("guild_id = ?", (guild_id,))
+                guilds = [guild_id] if guild_id in data else []
+            for guild in guilds:
+                self._insert_guild(guild, data[guild])
+
+    def _delete_guild_rows(self, where: str, params: tuple) -> None:
+        for table in ['guilds', 'guild_blocks', 'transformed_users']:
+            self.db.execute(f"DELETE FROM {table} WHERE {where}", params)
+
+    def _insert_guild(self, guild_id: str, guild_data: dict) -> None:
+        logs = (guild_data.get('logs') or [None, None, None, None]) + [None, None, None, None]
+        self.db.execute("INSERT INTO guilds (guild_id, edit_logs, delete_logs, transform_logs, claim_logs, "
+                        "clear_other_logs, images, extra) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (guild_id, *logs[:4], guild_data.get('clear_other_logs', False), guild_data.get('images'),
+                         self._extra(guild_data, SERVER_FIELDS)))
+        self.db.executemany("INSERT OR IGNORE INTO guild_blocks (guild_id, kind, target) VALUES (?, ?, ?)",
+                            [(guild_id, kind, str(target))
+                             for kind in TMUD_BLOCKS
+                             for target in guild_data.get(kind, [])])
+        self.db.executemany("INSERT INTO transformed_users (guild_id, user_id, active) VALUES (?, ?, ?)",
+                            [(guild_id, user_id, bool(active))
+                             for user_id, active in guild_data.get('transformed_users', {}).items()])
+
+
+def open_storage() -> JSONStorage | SQLiteStorage:
+    """
+    Opens the storage backend selected in the configuration.
+
+    :return: The storage backend to use.
+    """
+    if STORAGE_BACKEND == "sqlite":
+        return SQLiteStorage(SQLITE_PATH)
+    return JSONStorage(CACHE_PATH)
+
+
+def import_json_cache(source: JSONStorage, target: SQLiteStorage) -> int:
+    """
+    Copies all data from a JSON cache directory into a SQLite database, overwriting any data already there. Data from
+    older versions is brought up to date first.
+
+    :param source: The JSON storage to read the data from.
+    :param target: The SQLite storage to write the data to.
+
+    :return: The number of users whose data was imported.
+    """
+    users = source.list_users()
+    for user_id in users:
+        data = source.load_user(user_id)
+        if data != {}:
+            migrate_tmud(data)  # So older data fits in the tables
+            target.write_user(user_id, data)
+    data = source.load_transformed()
+    migrate_server_data(data)
+    target.write_transformed(data)
+    return len(users)
+
+
+if __name__ == "__main__":
+    # Running this file directly imports the JSON data in CACHE_PATH into the SQLite database at SQLITE_PATH
+    imported = import_json_cache(JSONStorage(CACHE_PATH), SQLiteStorage(SQLITE_PATH))
+    print(f"Imported {imported} users from \"{CACHE_PATH}\" into \"{SQLITE_PATH}\"")
@@ -1,48 +1,506 @@
-import json
+import aiohttp
+import asyncio
+import atexit
+import copy
+import functools
 import os
 import random
 import re
-import requests
+import time
 
-from types import NoneType
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
+from typing import NamedTuple
+from urllib.parse import urlsplit, urlunsplit
 
 import discord
 
-from config import CACHE_PATH
+try:
+    import numpy  # Optional, only used to draw random numbers faster
+except ImportError:
+    numpy = None
+
+from config import (IO_THREADS, TMUD_CACHE_SIZE, WRITE_BEHIND_INTERVAL, URL_CHECK_TIMEOUT, URL_CACHE_TTL,
+                    URL_CACHE_FAILURE_TTL, WEBHOOK_POOL_SIZE, BATCHED_RANDOM, TRANSFORM_SEED)
+import metrics
+from provenance import SNAPSHOT_FIELDS, Provenance, ProvenanceStore
+from scheduler import OutboundScheduler
+from storage import io_counts, migrate_server_data, migrate_tmud, open_storage
 
 URL_REGEX: str = r'([\S:/]?(www\.)?[\S\d@:%._+~#=]+\.[\S\d]+\b([\S\d@:%_+.~#?&=]*))*'
 
-# DATA VERSIONS
-# REMEMBER TO REGENERATE (OR UPDATE) ALL TRANSFORMATION DATA IF YOU CHANGE THE VERSION
-# VERSION 16: Removed "proxy_prefix" and "proxy_suffix" fields, removed "active" and "contents" subfields from modifiers, and removed per-channel data
-# VERSION 15: Added individual chances to all modifiers - ADDENDUM 1: Made the "transformed_by" and "claim" fields be integers now
-# VERSION 14: Added "stutter" field
-# VERSION 13: Made "claim" field be an integer, instead of a string
-# VERSION 12: Added compatibility for multiple characters, when in tupper-like mode (Added "index" field)
-# VERSION 11: Added "proxy_prefix" and "proxy_suffix" fields
-# VERSION 10: Added "alt_muffle" field
-# VERSION 9: Added "blocked_users" field
-# VERSION 8: Added "upside_down" and "backwards" fields
-# VERSION 7: Added "bio" field
-# VERSION 6: Added "blocked_channels" field
-# VERSION 5: Fixing the fields to accept multiple values as well as a percentage chance for each field.
-# VERSION 4: Reworked to work with per-channel data. - DROPPED SUPPORT FOR TRANSLATING PREVIOUS VERSIONS
-# VERSION 3: Added "big", "small", and "hush" fields, and changed "eternal" from bool to int
-# VERSION 2: Added guild-specific data
-# VERSION 1: Base version
-CURRENT_TMUD_VERSION = 16
-
-# VERSION 10: Removed per-channel data
-# VERSION 9: Removed "affixes" field
-# VERSION 8: Added "images" field
-# VERSION 7: Added compatibility with the new multi-character mode for TFee Data v12
-# VERSION 6: Added "affixes" field
-# VERSION 5: Added "logs" and "clear_other_logs" fields
-# VERSION 4: Each user now stores the channels they're transformed on
-# VERSION 3: Added "blocked_users" field
-# VERSION 2: Added "blocked_channels" and "transformed_users" fields
-# VERSION 1: Base version
-CURRENT_TRANSFORMED_DATA_VERSION = 10
+
+# CACHE UTILS
+class LRUCache:
+    """
+    A size-bounded, least-recently-used cache, used to keep parsed data files in memory.
+    """
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict = OrderedDict()
+        self._pinned: set = set()
+
+    def __contains__(self, key) -> bool:
+        return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key, default=None):
+        """
+        Gets a value from the cache, marking it as the most recently used one.
+
+        :param key: The key to look up.
+        :param default: What to return if the key isn't cached.
+
+        :return: The cached value, or `default` if it isn't cached.
+        """
+        if key not in self._data:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self._data.move_to_end(key)
+        return self._data[key]
+
+    def put(self, key, value) -> None:
+        """
+        Stores a value in the cache, evicting the least recently used entries if it's over capacity.
+
+        :param key: The key to store the value under.
+        :param value: The value to store.
+
+        :return: This function does not return anything.
+        """
+        if self.capacity <= 0 and key not in self._pinned:
+            return
+        self._data[key] = value
+        self._data.move_to_end(key)
+        self._evict()
+
+    def peek(self, key, default=None):
+        """
+        Gets a value from the cache, without marking it as used, nor counting it as a hit or a miss.
+
+        :param key: The key to look up.
+        :param default: What to return if the key isn't cached.
+
+        :return: The cached value, or `default` if it isn't cached.
+        """
+        return self._data.get(key, default)
+
+    def pin(self, key) -> None:
+        """
+        Prevents a key from being evicted (or invalidated) until it's unpinned.
+
+        :param key: The key to pin.
+
+        :return: This function does not return anything.
+        """
+        self._pinned.add(key)
+
+    def unpin(self, key) -> None:
+        """
+        Allows a pinned key to be evicted again.
+
+        :param key: The key to unpin.
+
+        :return: This function does not return anything.
+        """
+        self._pinned.discard(key)
+        self._evict()
+
+    def invalidate(self, key=None) -> None:
+        """
+        Drops a key from the cache, or the entire cache if no key is given.
+
+        :param key: The key to drop. If not specified, the cache is cleared.
+
+        :return: This function does not return anything.
+        """
+        if key is None:
+            for k in [k for k in self._data if k not in self._pinned]:
+                del self._data[k]
+            return
+        if key not in self._pinned:
+            self._data.pop(key, None)
+
+    def _evict(self) -> None:
+        # Pinned entries can't be evicted, so the cache may go over capacity while they're around
+        while len(self._data) > self.capacity:
+            old_key = next((k for k in self._data if k not in self._pinned), None)
+            if old_key is None:
+                break
+            del self._data[old_key]
+
+    def stats(self) -> dict:
+        """
+        :return: A dictionary with the current size, capacity, hits and misses of the cache.
+        """
+        return {
+            'size': len(self._data),
+            'capacity': self.capacity,
+            'pinned': len(self._pinned),
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+
+class NameIndex:
+    """
+    Which users of a server are transformed into which names, so a proxied message can be traced back to whoever sent
+    it without loading the data of every transformed user in the server.
+    """
+    def __init__(self) -> None:
+        self.names: dict[str, dict[str, None]] = {}  # Name -> IDs of the users with that name, in insertion order
+        self.user_names: dict[str, str] = {}  # User ID -> Name
+        self.pending: set[str] = set()  # IDs of the users whose name still has to be looked up
+
+    def set(self, user_id: str, name: str | None) -> None:
+        """
+        Updates the name of a user.
+
+        :param user_id: The ID of the user.
+        :param name: The name the user is transformed into, or None if they aren't transformed anymore.
+
+        :return: This function does not return anything.
+        """
+        self.pending.discard(user_id)
+        old_name = self.user_names.pop(user_id, None)
+        if old_name is not None:
+            users = self.names[old_name]
+            users.pop(user_id, None)
+            if not users:
+                del self.names[old_name]
+        if name is not None:
+            self.user_names[user_id] = name
+            self.names.setdefault(name, {})[user_id] = None
+
+    def get(self, name: str) -> list[str]:
+        """
+        :param name: The name to look up.
+
+        :return: The IDs of the users transformed into that name.
+        """
+        return list(self.names.get(name, ()))
+
+
+# Where all TMUD and server data is stored. See storage.py
+storage = open_storage()
+
+# Parsed TMUD files, keyed by user ID. Kept up to date by every function that writes or removes TMUD data.
+tf_cache: LRUCache = LRUCache(TMUD_CACHE_SIZE)
+
+# Parsed server data file, keyed by guild ID. Loaded once, and kept up to date by every function that writes or
+# removes server data, so reading server settings never has to touch the disk.
+_transformed_cache: dict | None = None
+
+# How many times each user's TMUD data has changed, so anything worked out from it knows when to be worked out again
+tf_revisions: dict[str, int] = {}
+
+# Compiled transformation plans, keyed by user and server ID, alongside the revision of the data they were compiled from
+plan_cache: LRUCache = LRUCache(TMUD_CACHE_SIZE)
+
+# IDs of the users currently transformed in each server, keyed by server ID, so messages from everyone else can be
+# turned away right away. Built when the server data is loaded, and kept up to date by every function that changes who's
+# transformed. None until then.
+active_users: dict[int, set[int]] | None = None
+
+# How many times each server's data has changed, plus how many times all of it has, like tf_revisions
+transformed_revisions: dict[str, int] = {}
+_transformed_generation: int = 0
+
+# Blocked channels and users for each user and server, as sets, alongside the revisions of the data they were worked out
+# from, so messages don't have to go through the lists every time
+block_cache: LRUCache = LRUCache(TMUD_CACHE_SIZE)
+
+# Everything on_message needs to know about each user and server, alongside the revisions it was worked out from
+context_cache: LRUCache = LRUCache(TMUD_CACHE_SIZE)
+
+# Transformed users of each server, keyed by the name they're transformed into, keyed by server ID. Built the first time
+# a server's proxied messages are looked up, and kept up to date by every function that writes or removes TMUD data.
+name_indexes: dict[str, NameIndex] = {}
+
+# WRITE-BEHIND UTILS
+# Instead of writing every change to the storage right away, changed data is marked as dirty, and written every
+# WRITE_BEHIND_INTERVAL seconds, so many changes to the same user or server end up being a single write.
+# Dirty users are pinned on the TMUD cache, so they can't be evicted before they're written.
+REMOVED = object()  # Marks users whose data has to be removed, instead of written
+_dirty_users: dict[str, set[str] | None | object] = {}  # User ID -> Changed servers (None if all of them changed)
+_dirty_transformed: set[str] | None = set()  # Changed servers (None if all of them changed)
+_write_behind_task: asyncio.Task | None = None
+_flush_lock: asyncio.Lock = asyncio.Lock()
+_storage_scanned: bool = False
+
+# Threads where all blocking I/O is run, so it doesn't block the event loop
+_io_executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=IO_THREADS, thread_name_prefix="io")
+
+
+def _store_user(user_id: str, data: dict, guild_id: str | None = None) -> None:
+    """
+    Updates the cached TMUD data of a user, and writes it to the storage, either right away or on the next flush.
+
+    :param user_id: The ID of the user whose data changed.
+    :param data: The full, updated TMUD data of the user.
+    :param guild_id: The ID of the only server whose data changed. If not specified, all the data is written.
+
+    :return: This function does not return anything.
+    """
+    tf_cache.pin(user_id)
+    tf_cache.put(user_id, data)
+    _bump_revision(user_id, guild_id)
+    _index_user(user_id, data, guild_id)
+    changed = _dirty_users.get(user_id, set())
+    if guild_id is None or changed is None or changed is REMOVED:
+        _dirty_users[user_id] = None
+    else:
+        _dirty_users[user_id] = changed | {guild_id}
+    _request_flush()
+
+
+def _bump_revision(user_id: str, guild_id: str | None = None) -> None:
+    # Anything compiled from the old data is now out of date
+    tf_revisions[user_id] = tf_revisions.get(user_id, 0) + 1
+    if guild_id is not None:
+        plan_cache.invalidate((user_id, guild_id))
+
+
+def _index_user(user_id: str, data: dict, guild_id: str | None = None) -> None:
+    # Servers whose index hasn't been built yet will read the new data when they're built
+    for index_guild_id in [guild_id] if guild_id is not None else list(name_indexes):
+        index = name_indexes.get(index_guild_id)
+        if index is not None:
+            index.set(user_id, data.get(index_guild_id, {}).get('into'))
+
+
+def _remove_user(user_id: str) -> None:
+    """
+    Removes all TMUD data of a user, both from the cache and from the storage, either right away or on the next flush.
+
+    :param user_id: The ID of the user whose data will be removed.
+
+    :return: This function does not return anything.
+    """
+    tf_cache.pin(user_id)
+    tf_cache.put(user_id, {})
+    _bump_revision(user_id)
+    _index_user(user_id, {})
+    _dirty_users[user_id] = REMOVED
+    _request_flush()
+
+
+def _store_transformed(guild_id: str | None = None) -> None:
+    """
+    Writes the cached server data to the storage, either right away or on the next flush.
+
+    :param guild_id: The ID of the only server whose data changed. If not specified, all the data is written.
+
+    :return: This function does not return anything.
+    """
+    global _dirty_transformed, _transformed_generation
+    if guild_id is None:
+        _transformed_generation += 1
+    else:
+        transformed_revisions[guild_id] = transformed_revisions.get(guild_id, 0) + 1
+    if guild_id is None or _dirty_transformed is None:
+        _dirty_transformed = None
+    else:
+        _dirty_transformed.add(guild_id)
+    _request_flush()
+
+
+def _request_flush() -> None:
+    """
+    Writes all pending changes right away, if write-behind is disabled. When called from inside the event loop, the
+    writing is done on the I/O threads, so the loop isn't blocked.
+
+    :return: This function does not return anything.
+    """
+    if WRITE_BEHIND_INTERVAL > 0:
+        return
+    try:
+        asyncio.get_running_loop().create_task(flush_async())
+    except RuntimeError:  # No running loop
+        flush()
+
+
+def _collect_pending() -> list[tuple]:
+    """
+    Takes all pending changes, turning them into a list of storage operations that can be safely run on another thread.
+
+    :return: A list of tuples, each containing a storage function and its arguments.
+    """
+    global _dirty_transformed
+    operations = []
+    for user_id, changed in _dirty_users.items():
+        if changed is REMOVED:
+            operations.append((storage.remove_user, user_id))
+            continue
+        # Cached TMUD data is never modified in place, only replaced, so it's safe to hand it to another thread
+        operations.append((storage.write_user,
+                           user_id,
+                           tf_cache.peek(user_id, {}),
+                           next(iter(changed)) if changed is not None and len(changed) == 1 else None))
+    _dirty_users.clear()
+
+    # Server data, however, is modified in place, so we copy whatever we have to write
+    data = _get_transformed() if _dirty_transformed is None or _dirty_transformed else {}
+    if _dirty_transformed is None:
+        operations.append((storage.write_transformed, copy.deepcopy(data)))
+    else:
+        for guild_id in _dirty_transformed:
+            guild_data = {guild_id: copy.deepcopy(data[guild_id])} if guild_id in data else {}
+            if 'version' in data:
+                guild_data['version'] = data['version']
+            operations.append((storage.write_transformed, guild_data, guild_id))
+    _dirty_transformed = set()
+
+    # So are the records of who sent each proxied message
+    records = provenance_store.take_pending()
+    if records or provenance_store.forgotten:
+        operations.append((provenance_store.append, records))
+    return operations
+
+
+def _write_pending(operations: list[tuple]) -> list[tuple]:
+    """
+    Runs a list of storage operations, as returned by _collect_pending(). An operation failing doesn't stop the rest.
+
+    :param operations: The storage operations to run.
+
+    :return: The operations that failed.
+    """
+    failed = []
+    for operation in operations:
+        function, *args = operation
+        try:
+            function(*args)
+        except Exception as e:
+            print(f"Error writing data:\n{str(type(e))}: {e}")
+            failed.append(operation)
+    if operations:
+        storage.sync()  # Once for the whole batch, instead of once per file
+    return failed
+
+
+def _finish_pending(operations: list[tuple], failed: list[tuple]) -> int:
+    """
+    Unpins all users whose data has been written, unless they've been changed again in the meantime. Whatever failed to
+    be written is marked as pending again, so it's retried on the next flush.
+
+    :param operations: The storage operations that were run.
+    :param failed: The operations that failed, as returned by _write_pending().
+
+    :return: The number of users and servers that were written.
+    """
+    global _dirty_transformed
+    for function, *args in failed:
+        if function == storage.write_user:
+            # Anything that changed in the meantime is written alongside it, so the whole file has to be written
+            if _dirty_users.get(args[0]) is not REMOVED:
+                _dirty_users[args[0]] = None
+        elif function == storage.remove_user:
+            _dirty_users.setdefault(args[0], REMOVED)
+        elif function == storage.write_transformed:
+            if len(args) == 1 or _dirty_transformed is None:
+                _dirty_transformed = None
+            else:
+                _dirty_transformed.add(args[1])
+        elif function == provenance_store.append:
+            provenance_store.pending[:0] = args[0]
+    for function, *args in operations:
+        if function in [storage.write_user, storage.remove_user] and args[0] not in _dirty_users:
+            tf_cache.unpin(args[0])
+    return len([function for function, *_ in operations if function != provenance_store.append]) - \
+        len([function for function, *_ in failed if function != provenance_store.append])
+
+
+def flush() -> int:
+    """
+    Writes all pending changes to the storage. Call this whenever some data has to be durable right away.
+
+    :return: The number of users and servers that were written.
+    """
+    operations = _collect_pending()
+    return _finish_pending(operations, _write_pending(operations))
+
+
+async def flush_async() -> int:
+    """
+    Same as flush(), but the writing is done on the I/O threads, so the event loop isn't blocked.
+
+    :return: The number of users and servers that were written.
+    """
+    # Flushes can't overlap, or an older write could end up overwriting a newer one
+    async with _flush_lock:
+        operations = _collect_pending()
+        return _finish_pending(operations, await run_io(_write_pending, operations))
+
+
+async def scan_storage() -> list[str]:
+    """
+    Checks that all stored data can be read back, on the I/O threads, quarantining whatever can't be. Users whose data
+    is still cached get it written back right away, since the cached copy is fine. Only done once, since on_ready()
+    runs again every time the bot reconnects to Discord, and the data can't break while the bot's running.
+
+    :return: The files (or, for SQLite, the problems) that were found, or [] if the storage was already scanned.
+    """
+    global _storage_scanned
+    if _storage_scanned:
+        return []
+    _storage_scanned = True
+    async with _flush_lock:  # So nothing is written while the files are being checked
+        found = await run_io(storage.scan)
+    for path in found:
+        if os.path.basename(os.path.dirname(path)) != "people":
+            continue
+        user_id = os.path.basename(path).removesuffix(".json")
+        data = tf_cache.peek(user_id)
+        if data is not None:
+            _store_user(user_id, data)
+    return found
+
+
+async def write_behind_loop() -> None:
+    """
+    Flushes all pending changes every WRITE_BEHIND_INTERVAL seconds, forever.
+
+    :return: This function never returns.
+    """
+    while True:
+        await asyncio.sleep(WRITE_BEHIND_INTERVAL)
+        await flush_async()
+
+
+def start_write_behind() -> None:
+    """
+    Starts flushing pending changes periodically, if that's not already happening. Must be called with a running loop.
+
+    :return: This function does not return anything.
+    """
+    global _write_behind_task
+    if WRITE_BEHIND_INTERVAL <= 0 or (_write_behind_task is not None and not _write_behind_task.done()):
+        return
+    _write_behind_task = asyncio.get_running_loop().create_task(write_behind_loop())
+
+
+async def run_io(function, *args, **kwargs):
+    """
+    Runs a blocking function (such as disk or network I/O) on the I/O threads, so the event loop isn't blocked.
+
+    :param function: The function to run.
+    :param args: The positional arguments to pass to the function.
+    :param kwargs: The keyword arguments to pass to the function.
+
+    :return: Whatever the function returns.
+    """
+    return await asyncio.get_running_loop().run_in_executor(_io_executor, functools.partial(function, *args, **kwargs))
+
+
+# Make sure nothing pending is lost when shutting down
+atexit.register(flush)
 
 
 # USER TRANSFORMATION DATA UTILS
@@ -55,8 +513,43 @@ def load_tf(user: discord.User | discord.Member | int, guild: discord.Guild | in
 
     :return: A TMUD-compliant dictionary containing the user's TMUD data.
     """
-    return load_file(f'{CACHE_PATH}/people/{str(user if type(user) is int else user.id)}.json',
-                     guild if type(guild) in [int, NoneType] else guild.id)
+    return _copy_tf(_get_tf(str(user if type(user) is int else user.id)), guild)
+
+
+def _get_tf(user_id: str) -> dict:
+    """
+    Gets the cached TMUD data of a user, loading it from the storage if it isn't cached.
+
+    :param user_id: The ID of the user whose data is to be loaded.
+
+    :return: The live, cached TMUD data. It must NOT be modified, use write_tf() for that.
+    """
+    data = tf_cache.get(user_id)
+    if data is None:
+        data = storage.load_user(user_id)
+        tf_cache.put(user_id, data)
+    return data
+
+
+async def load_tf_async(user: discord.User | discord.Member | int,
+                        guild: discord.Guild | int | None = None) -> dict:
+    """
+    Same as load_tf(), but, if the data isn't cached, it's loaded on the I/O threads, so the event loop isn't blocked.
+    """
+    user_id = str(user if type(user) is int else user.id)
+    data = tf_cache.get(user_id)
+    if data is None:
+        data = await run_io(storage.load_user, user_id)
+        data = tf_cache.peek(user_id, data)  # The data might've been written while we were loading it
+        tf_cache.put(user_id, data)
+    return _copy_tf(data, guild)
+
+
+def _copy_tf(data: dict, guild: discord.Guild | int | None = None) -> dict:
+    # We hand out copies, so callers can't accidentally modify the cached data
+    if guild is None:
+        return copy.deepcopy(data)
+    return copy.deepcopy(data.get(str(guild if type(guild) is int else guild.id), {}))
 
 
 def write_tf(user: discord.User | discord.Member | int,
@@ -124,31 +617,14 @@ def write_tf(user: discord.User | discord.Member | int,
     data = load_tf(user)
     user_id = str(user if type(user) is int else user.id)
     guild_id = str(guild if type(guild) is int else guild.id)
-    if data == {} or data['version'] != CURRENT_TMUD_VERSION:
-        if data != {}:
-            for server in data:
-                if server == 'version':
-                    continue
-                for channel in data[server]:
-                    if channel in ['blocked_channels', 'blocked_users', 'all']:
-                        continue
-                    del data[server][channel]
-                data[server] = data[server]['all']
-                del data[server]['all']
-                del data[server]['proxy_prefix']
-                del data[server]['proxy_suffix']
-                for modifier in ['prefix', 'suffix', 'censor', 'sprinkle', 'muffle']:
-                    del data[server][modifier]['active']
-                    data[server][modifier] = data[server][modifier]['contents']
-                    del data[server]['contents']
-        data['version'] = CURRENT_TMUD_VERSION
+    migrated = migrate_tmud(data)
     if load_transformed(guild) == {}:
         write_transformed(guild)
     if new_data is not None:
         new_data['blocked_users'] = [] if 'blocked_users' not in new_data else new_data['blocked_users']
         new_data['blocked_channels'] = [] if 'blocked_channels' not in new_data else new_data['blocked_channels']
         data[guild_id] = new_data
-        write_file(f'{CACHE_PATH}/people/{str(user_id)}.json', data)
+        _store_user(user_id, data, None if migrated else guild_id)
         write_transformed(guild, user, block_user, block_channel)
         return
     if into not in ["", None]:
@@ -260,7 +736,87 @@ def write_tf(user: discord.User | discord.Member | int,
 
         if bio is not None:
             data[guild_id]['bio'] = None if bio == "" else bio
-    write_file(f'{CACHE_PATH}/people/{user_id}.json', data)
+    _store_user(user_id, data, None if migrated else guild_id)
+
+
+def _apply_block_mode(blocked: list[str], ids: list[str], mode: str) -> list[str]:
+    """
+    Works out a new list of blocked channels or users, from the current one.
+
+    :param blocked: The IDs that are currently blocked.
+    :param ids: The IDs to block or unblock.
+    :param mode: "add" to block all of them, "remove" to unblock all of them, or "toggle" to unblock the ones that are
+    blocked, and block the rest.
+
+    :return: The new list of blocked IDs. Already blocked IDs keep their order, and newly blocked ones go at the end.
+    """
+    ids = list(dict.fromkeys(ids))  # Without duplicates, so a toggle doesn't undo itself
+    current = set(blocked)
+    if mode == "add":
+        return blocked + [i for i in ids if i not in current]
+    if mode == "remove":
+        removed = set(ids)
+        return [i for i in blocked if i not in removed]
+    if mode == "toggle":
+        removed = current.intersection(ids)
+        return [i for i in blocked if i not in removed] + [i for i in ids if i not in current]
+    raise ValueError(f"Unknown block mode \"{mode}\", it must be \"add\", \"remove\" or \"toggle\"")
+
+
+def _block_tf(user: discord.User | discord.Member | int,
+              guild: discord.Guild | int,
+              field: str,
+              ids: list[str],
+              mode: str) -> list[str] | None:
+    data = load_tf(user)
+    user_id = str(user if type(user) is int else user.id)
+    guild_id = str(guild if type(guild) is int else guild.id)
+    migrated = migrate_tmud(data)
+    if guild_id not in data:  # There's nothing to block things on
+        return None
+    data[guild_id][field] = _apply_block_mode(data[guild_id].get(field, []), ids, mode)
+    _store_user(user_id, data, None if migrated else guild_id)
+    return list(data[guild_id][field])
+
+
+def block_channels(user: discord.User | discord.Member | int,
+                   guild: discord.Guild | int,
+                   channels: list[discord.abc.GuildChannel | int],
+                   mode: str = "toggle") -> list[str] | None:
+    """
+    Blocks or unblocks many channels for a user at once, writing their data only once. Same as calling write_tf() with
+    `block_channel` for each channel, when the mode is "toggle".
+
+    :param user: A Discord User or Member object, representing the user whose blocked channels will be changed.
+    :param guild: A Discord Guild object, representing the server the channels are in.
+    :param channels: The Discord channels (or their IDs) to block or unblock.
+    :param mode: "add" to block all of them, "remove" to unblock all of them, or "toggle" to flip each one.
+
+    :return: The IDs of the channels the user has blocked afterwards, or None if the user has no data in the server, in
+    which case nothing is changed.
+    """
+    return _block_tf(user, guild, 'blocked_channels',
+                     [str(channel if type(channel) is int else channel.id) for channel in channels], mode)
+
+
+def block_users(user: discord.User | discord.Member | int,
+                guild: discord.Guild | int,
+                users: list[discord.User | discord.Member | int],
+                mode: str = "toggle") -> list[str] | None:
+    """
+    Blocks or unblocks many users for a user at once, writing their data only once. Same as calling write_tf() with
+    `block_user` for each user, when the mode is "toggle".
+
+    :param user: A Discord User or Member object, representing the user whose blocked users will be changed.
+    :param guild: A Discord Guild object, representing the server the users are in.
+    :param users: The Discord users (or their IDs) to block or unblock.
+    :param mode: "add" to block all of them, "remove" to unblock all of them, or "toggle" to flip each one.
+
+    :return: The IDs of the users the user has blocked afterwards, or None if the user has no data in the server, in
+    which case nothing is changed.
+    """
+    return _block_tf(user, guild, 'blocked_users',
+                     [str(blocked if type(blocked) is int else blocked.id) for blocked in users], mode)
 
 
 def remove_tf(user: discord.User | discord.Member | int,
@@ -279,17 +835,21 @@ def remove_tf(user: discord.User | discord.Member | int,
     if data == {} or not guild_id in data:
         return
     del data[guild_id]
-    write_file(f'{CACHE_PATH}/people/{str(user if type(user) is int else user.id)}.json', data)
+    user_id = str(user if type(user) is int else user.id)
+    _store_user(user_id, data, guild_id)
     remove_transformed(user, guild)
 
 
 def remove_all_server_tf(user: discord.User | discord.Member | int,
-                         guild: discord.Guild | int) -> None:
+                         guild: discord.Guild | int,
+                         forget_messages: bool = True) -> None:
     """
     Removes all transformation data for a user in a server, including blocked channels and users.
 
     :param user: A Discord user or member object, representing the user whose data will be removed.
     :param guild: A Discord guild object, representing the server from which the data will be removed.
+    :param forget_messages: Whether to forget who sent the user's proxied messages in the server. Turn it off when the
+    whole server's messages are forgotten right after, with forget_provenance(guild=guild).
 
     :return: This function does not return anything.
     """
@@ -298,8 +858,11 @@ def remove_all_server_tf(user: discord.User | discord.Member | int,
     if data == {} or not guild_id in data:
         return
     del data[guild_id]
-    write_file(f'{CACHE_PATH}/people/{str(user if type(user) is int else user.id)}.json', data)
+    user_id = str(user if type(user) is int else user.id)
+    _store_user(user_id, data, guild_id)
     remove_transformed(user, guild)
+    if forget_messages:
+        forget_provenance(user, guild)
 
 
 def remove_all_tf(user: discord.User | discord.Member | int) -> None:
@@ -310,10 +873,9 @@ def remove_all_tf(user: discord.User | discord.Member | int) -> None:
 
     :return: This function does not return anything.
     """
-    try:
-        os.remove(f'{CACHE_PATH}/people/{str(user if type(user) is int else user.id)}.json')
-    except OSError as e:
-        print(f"Error removing file:\n{str(type(e))}: {e}")
+    user_id = str(user if type(user) is int else user.id)
+    _remove_user(user_id)
+    forget_provenance(user)
 
 
 # TRANSFORMED DATA UTILS
@@ -325,8 +887,79 @@ def load_transformed(guild: discord.Guild | int | None = None) -> dict:
 
     :return: A dictionary containing the transformation data for a server, or, optionally, the entire server data file.
     """
-    return load_file(f'{CACHE_PATH}/transformed.json',
-                     guild if type(guild) in [int, NoneType] else guild.id)
+    data = _get_transformed()
+    if guild is None:
+        return copy.deepcopy(data)
+    # This one is shared with the cache, so it must NOT be modified. Use write_transformed() for that.
+    return data.get(str(guild if type(guild) is int else guild.id), {})
+
+
+def _get_transformed() -> dict:
+    """
+    Gets the in-memory copy of the server data file, loading it from disk the first time it's needed.
+
+    :return: The live, cached server data. Any changes made to it must be written back to the storage.
+    """
+    global _transformed_cache
+    if _transformed_cache is None:
+        _transformed_cache = storage.load_transformed()
+        _build_active_users()
+    return _transformed_cache
+
+
+def _build_active_users() -> None:
+    global active_users
+    active_users = {int(guild_id): {int(user_id) for user_id, active in data['transformed_users'].items() if active}
+                    for guild_id, data in _transformed_cache.items()
+                    if guild_id != 'version' and 'transformed_users' in data}
+
+
+def _set_active(guild_id: str, user_id: str, active: bool) -> None:
+    if active_users is None:  # It'll be built with the right data when it's needed
+        return
+    if active:
+        active_users.setdefault(int(guild_id), set()).add(int(user_id))
+    elif int(guild_id) in active_users:
+        active_users[int(guild_id)].discard(int(user_id))
+
+
+def maybe_transformed(user_id: int, guild_id: int) -> bool:
+    """
+    Quickly checks if a user could be transformed in a server, without touching any data files.
+
+    :param user_id: The ID of the user to check.
+    :param guild_id: The ID of the server to check.
+
+    :return: False if the user is definitely not transformed in the server, True if they are, or if the server data
+    hasn't been loaded yet, and we can't know.
+    """
+    return active_users is None or user_id in active_users.get(guild_id, ())
+
+
+def _prepare_transformed(guild_id: str) -> bool:
+    """
+    Updates the cached server data to the latest version, if needed, and sets up the data for a server, if it doesn't
+    have any yet. Nothing is written, so whoever calls this has to store the data afterwards.
+
+    :param guild_id: The ID of the server whose data must exist.
+
+    :return: Whether the server data was updated, in which case all of it has to be written, and not just the server's.
+    """
+    data = _get_transformed()
+    migrated = migrate_server_data(data)
+    if migrated:
+        _build_active_users()
+
+    if guild_id not in data:
+        data[guild_id] = {
+            'blocked_users': [],
+            'blocked_channels': [],
+            'logs': [None, None, None, None],
+            'clear_other_logs': False,
+            'transformed_users': {},
+            'images': None
+        }
+    return migrated
 
 
 def write_transformed(guild: discord.Guild | int,
@@ -350,47 +983,17 @@ def write_transformed(guild: discord.Guild | int,
 
     :return: The updated transformation data for the server.
     """
-    data = load_transformed()
-    if data == {} or ('version' in data and int(data['version']) != CURRENT_TRANSFORMED_DATA_VERSION):
-        if 'version' in data and int(data['version']) == 7:
-            for server in data:
-                if server == 'version':
-                    continue
-                data[server]['images'] = None
-            data['version'] = 8
-        if 'version' in data and int(data['version']) == 8:
-            for server in data:
-                if server == 'version':
-                    continue
-                del data[server]['affixes']
-            data['version'] = 9
-        if 'version' in data and int(data['version']) == 9:
-            for server in data:
-                if server == 'version':
-                    continue
-                for user in data[server]['transformed_users']:
-                    if data[server]['transformed_users'][user] in [[], None]:
-                        del data[server]['transformed_users'][user]
-                        continue
-                    del data[server]['transformed_users'][user]
-                    data[server]['transformed_users'][user] = True
-        data['version'] = 10
-
     guild_id = str(guild if type(guild) is int else guild.id)
-    if guild_id not in data:
-        data[guild_id] = {
-            'blocked_users': [],
-            'blocked_channels': [],
-            'logs': [None, None, None, None],
-            'clear_other_logs': False,
-            'transformed_users': {},
-            'images': None
-        }
+    migrated = _prepare_transformed(guild_id)
+    data = _get_transformed()
 
     if user is not None:
         user_id = str(user if type(user) is int else user.id)
         if user_id not in data[guild_id]['transformed_users'] or not data[guild_id]['transformed_users'][user_id]:
             data[guild_id]['transformed_users'][user_id] = True
+            _set_active(guild_id, user_id, True)
+        if guild_id in name_indexes and user_id not in name_indexes[guild_id].user_names:
+            name_indexes[guild_id].pending.add(user_id)
 
     if block_channel is not None:
         block_channel = str(block_channel if type(block_channel) is int else block_channel.id)
@@ -415,10 +1018,53 @@ def write_transformed(guild: discord.Guild | int,
     if images is not None:
         data[guild_id]['images'] = images if type(images) is int else images.id
 
-    write_file(f'{CACHE_PATH}/transformed.json', data)
+    _store_transformed(None if migrated else guild_id)
     return data[guild_id]
 
 
+def _block_transformed(guild: discord.Guild | int, field: str, ids: list[str], mode: str) -> list[str]:
+    guild_id = str(guild if type(guild) is int else guild.id)
+    migrated = _prepare_transformed(guild_id)
+    data = _get_transformed()[guild_id]
+    data[field] = _apply_block_mode(data[field], ids, mode)
+    _store_transformed(None if migrated else guild_id)
+    return list(data[field])
+
+
+def block_server_channels(guild: discord.Guild | int,
+                          channels: list[discord.abc.GuildChannel | int],
+                          mode: str = "toggle") -> list[str]:
+    """
+    Blocks or unblocks many channels for a whole server at once, writing its data only once. Same as calling
+    write_transformed() with `block_channel` for each channel, when the mode is "toggle".
+
+    :param guild: A Discord guild object, representing the server the channels are in.
+    :param channels: The Discord channels (or their IDs) to block or unblock.
+    :param mode: "add" to block all of them, "remove" to unblock all of them, or "toggle" to flip each one.
+
+    :return: The IDs of the channels blocked in the server afterwards.
+    """
+    return _block_transformed(guild, 'blocked_channels',
+                              [str(channel if type(channel) is int else channel.id) for channel in channels], mode)
+
+
+def block_server_users(guild: discord.Guild | int,
+                       users: list[discord.User | discord.Member | int],
+                       mode: str = "toggle") -> list[str]:
+    """
+    Blocks or unblocks many users for a whole server at once, writing its data only once. Same as calling
+    write_transformed() with `block_user` for each user, when the mode is "toggle".
+
+    :param guild: A Discord guild object, representing the server the users are in.
+    :param users: The Discord users (or their IDs) to block or unblock.
+    :param mode: "add" to block all of them, "remove" to unblock all of them, or "toggle" to flip each one.
+
+    :return: The IDs of the users blocked in the server afterwards.
+    """
+    return _block_transformed(guild, 'blocked_users',
+                              [str(user if type(user) is int else user.id) for user in users], mode)
+
+
 def is_transformed(user: discord.User | discord.Member | int,
                    guild: discord.Guild | int) -> bool:
     """
@@ -446,13 +1092,16 @@ def remove_transformed(user: discord.User | discord.Member | int,
 
     :return: This function does not return anything.
     """
-    data = load_transformed()
+    data = _get_transformed()
     if not is_transformed(user, guild):
         return
     guild_id = str(guild if type(guild) is int else guild.id)
     user_id = str(user if type(user) is int else user.id)
     data[guild_id]['transformed_users'][user_id] = False
-    write_file(f'{CACHE_PATH}/transformed.json', data)
+    _set_active(guild_id, user_id, False)
+    if guild_id in name_indexes:
+        name_indexes[guild_id].set(user_id, None)
+    _store_transformed(guild_id)
 
 
 def remove_server_from_transformed(guild: discord.Guild | int) -> None:
@@ -463,22 +1112,537 @@ def remove_server_from_transformed(guild: discord.Guild | int) -> None:
 
     :return: This function does not return anything.
     """
-    data = load_transformed()
-    del data[str(guild if type(guild) is int else guild.id)]
-    write_file(f'{CACHE_PATH}/transformed.json', data)
+    data = _get_transformed()
+    guild_id = str(guild if type(guild) is int else guild.id)
+    del data[guild_id]
+    name_indexes.pop(guild_id, None)
+    if active_users is not None:
+        active_users.pop(int(guild_id), None)
+    _store_transformed(guild_id)
+    forget_provenance(guild=guild)
+
+
+class BlockSets(NamedTuple):
+    channels: frozenset[str]  # Channels the user won't be transformed in, both their own and the server's
+    users: frozenset[str]  # Users the user has blocked from interacting with them
+    server_users: frozenset[str]  # Users blocked from using the bot in the server
+
+
+def get_block_sets(user: discord.User | discord.Member | int, guild: discord.Guild | int) -> BlockSets:
+    """
+    Gets the blocked channels and users that apply to a user in a server, as sets. They're only worked out again when
+    the user's or the server's data changes.
+
+    :param user: A Discord user or member object, representing the user to check.
+    :param guild: A Discord guild object, representing the server to check.
+
+    :return: The blocked channels and users, as sets of IDs, in string form.
+    """
+    user_id = str(user if type(user) is int else user.id)
+    guild_id = str(guild if type(guild) is int else guild.id)
+    revision = (tf_revisions.get(user_id, 0), transformed_revisions.get(guild_id, 0), _transformed_generation)
+    cached = block_cache.get((user_id, guild_id))
+    if cached is not None and cached[0] == revision:
+        return cached[1]
+    user_data = _get_tf(user_id).get(guild_id, {})
+    server_data = load_transformed(guild)
+    block_sets = BlockSets(channels=frozenset(user_data.get('blocked_channels', [])) |
+                                    frozenset(server_data.get('blocked_channels', [])),
+                           users=frozenset(user_data.get('blocked_users', [])),
+                           server_users=frozenset(server_data.get('blocked_users', [])))
+    block_cache.put((user_id, guild_id), (revision, block_sets))
+    return block_sets
+
+
+# ASYNC DATA UTILS
+# These make sure all the data they need is cached (loading it on the I/O threads if it isn't) before calling their
+# synchronous counterparts, which then won't have to touch the storage at all.
+async def _ensure_tf_loaded(user: discord.User | discord.Member | int) -> None:
+    user_id = str(user if type(user) is int else user.id)
+    if tf_cache.peek(user_id) is None:
+        await load_tf_async(user)
+
+
+async def _ensure_transformed_loaded() -> None:
+    global _transformed_cache
+    if _transformed_cache is None:
+        data = await run_io(storage.load_transformed)
+        if _transformed_cache is None:
+            _transformed_cache = data
+            _build_active_users()
+
+
+async def write_tf_async(user: discord.User | discord.Member | int,
+                         guild: discord.Guild | int,
+                         *args,
+                         **kwargs) -> None:
+    """
+    Same as write_tf(), but without blocking the event loop.
+    """
+    await _ensure_tf_loaded(user)
+    await _ensure_transformed_loaded()
+    write_tf(user, guild, *args, **kwargs)
+
+
+async def block_channels_async(user: discord.User | discord.Member | int,
+                               guild: discord.Guild | int,
+                               *args,
+                               **kwargs) -> list[str] | None:
+    """
+    Same as block_channels(), but without blocking the event loop.
+    """
+    await _ensure_tf_loaded(user)
+    return block_channels(user, guild, *args, **kwargs)
+
+
+async def block_users_async(user: discord.User | discord.Member | int,
+                            guild: discord.Guild | int,
+                            *args,
+                            **kwargs) -> list[str] | None:
+    """
+    Same as block_users(), but without blocking the event loop.
+    """
+    await _ensure_tf_loaded(user)
+    return block_users(user, guild, *args, **kwargs)
+
+
+async def remove_tf_async(user: discord.User | discord.Member | int,
+                          guild: discord.Guild | int) -> None:
+    """
+    Same as remove_tf(), but without blocking the event loop.
+    """
+    await _ensure_tf_loaded(user)
+    await _ensure_transformed_loaded()
+    remove_tf(user, guild)
+
+
+async def remove_all_server_tf_async(user: discord.User | discord.Member | int,
+                                     guild: discord.Guild | int,
+                                     forget_messages: bool = True) -> None:
+    """
+    Same as remove_all_server_tf(), but without blocking the event loop.
+    """
+    await _ensure_tf_loaded(user)
+    await _ensure_transformed_loaded()
+    remove_all_server_tf(user, guild, forget_messages)
+
+
+async def load_transformed_async(guild: discord.Guild | int | None = None) -> dict:
+    """
+    Same as load_transformed(), but without blocking the event loop.
+    """
+    await _ensure_transformed_loaded()
+    return load_transformed(guild)
+
+
+async def write_transformed_async(guild: discord.Guild | int,
+                                  *args,
+                                  **kwargs) -> dict:
+    """
+    Same as write_transformed(), but without blocking the event loop.
+    """
+    await _ensure_transformed_loaded()
+    return write_transformed(guild, *args, **kwargs)
+
+
+async def block_server_channels_async(guild: discord.Guild | int, *args, **kwargs) -> list[str]:
+    """
+    Same as block_server_channels(), but without blocking the event loop.
+    """
+    await _ensure_transformed_loaded()
+    return block_server_channels(guild, *args, **kwargs)
+
+
+async def block_server_users_async(guild: discord.Guild | int, *args, **kwargs) -> list[str]:
+    """
+    Same as block_server_users(), but without blocking the event loop.
+    """
+    await _ensure_transformed_loaded()
+    return block_server_users(guild, *args, **kwargs)
+
+
+async def get_block_sets_async(user: discord.User | discord.Member | int,
+                               guild: discord.Guild | int) -> BlockSets:
+    """
+    Same as get_block_sets(), but without blocking the event loop.
+    """
+    await _ensure_tf_loaded(user)
+    await _ensure_transformed_loaded()
+    return get_block_sets(user, guild)
+
+
+async def is_transformed_async(user: discord.User | discord.Member | int,
+                               guild: discord.Guild | int) -> bool:
+    """
+    Same as is_transformed(), but without blocking the event loop.
+    """
+    await _ensure_transformed_loaded()
+    return is_transformed(user, guild)
+
+
+async def remove_transformed_async(user: discord.User | discord.Member | int,
+                                   guild: discord.Guild | int) -> None:
+    """
+    Same as remove_transformed(), but without blocking the event loop.
+    """
+    await _ensure_transformed_loaded()
+    remove_transformed(user, guild)
+
+
+async def remove_server_from_transformed_async(guild: discord.Guild | int) -> None:
+    """
+    Same as remove_server_from_transformed(), but without blocking the event loop.
+    """
+    await _ensure_transformed_loaded()
+    remove_server_from_transformed(guild)
 
 
 # TEXT UTILS
+# Translation tables for small text, built only once
+SMALL_TEXT_TABLE: dict = str.maketrans("abcdefghijklmnopqrstuvwxyz.,0123456789+-=()˄˅",
+                                       "ᵃᵇᶜᵈᵉᶠᵍʰⁱʲᵏˡᵐⁿᵒᵖᵠʳˢᵗᵘᵛʷˣʸᶻ·ʾ⁰¹²³⁴⁵⁶⁷⁸⁹⁺⁻⁼⁽⁾ˆˇ")
+SMALL_DIGITS_TABLE: dict = str.maketrans("⁰¹²³⁴⁵⁶⁷⁸⁹", "0123456789")
+
+
+# Random numbers for transform_text(), drawn in batches. NumPy is optional, but much faster for long messages.
+class BatchRandom:
+    """
+    Draws all the random numbers a transformation needs at once, instead of one by one. Uses NumPy if it's installed,
+    and Python's own random module if it isn't. Both draw from the same distributions, but won't give the same numbers
+    for the same seed.
+    """
+    def __init__(self, seed: int | None = None) -> None:
+        self.seed(seed)
+
+    def seed(self, seed: int | None = None) -> None:
+        self.generator = numpy.random.default_rng(seed) if numpy is not None else random.Random(seed)
+
+    def hits(self, rows: int, chances: list[float], coins: bool = False) -> list[list[tuple[int, bool]]]:
+        """
+        Rolls every modifier once per row (usually a word), in a random order for each row, like shuffling the
+        modifiers and then rolling each one would.
+
+        :param rows: How many rows to roll for.
+        :param chances: The chance of each modifier, from 0 to 100.
+        :param coins: Whether to also flip a coin for every modifier that hits.
+
+        :return: For every row, the modifiers that hit, as (index, coin) tuples, in the order they should be applied.
+        """
+        columns = len(chances)
+        if numpy is not None:
+            rolls = self.generator.random((rows, columns)) * 100 <= numpy.asarray(chances)
+            order = numpy.argsort(self.generator.random((rows, columns)), axis=1)
+            flips = self.generator.random((rows, columns)) < 0.5 if coins else numpy.zeros((rows, columns), dtype=bool)
+            result = [[] for _ in range(rows)]
+            for row in numpy.flatnonzero(rolls.any(axis=1)).tolist():
+                result[row] = [(column, bool(flips[row, column])) for column in order[row].tolist()
+                               if rolls[row, column]]
+            return result
+        result = []
+        for _ in range(rows):
+            order = list(range(columns))
+            self.generator.shuffle(order)
+            result.append([(column, coins and self.generator.random() < 0.5) for column in order
+                           if self.generator.random() * 100 <= chances[column]])
+        return result
+
+    def uniform(self, count: int) -> list[float]:
+        """
+        :param count: How many numbers to draw.
+
+        :return: A list of random numbers, from 0 (included) to 1 (not included).
+        """
+        if numpy is not None:
+            return self.generator.random(count).tolist()
+        return [self.generator.random() for _ in range(count)]
+
+
+# Where transform_text() gets its randomness from, unless it's given something else. If TRANSFORM_SEED is set, both
+# are seeded with it, so the same messages always get transformed the same way.
+transform_random: random.Random = random.Random(TRANSFORM_SEED)
+batch_random: BatchRandom = BatchRandom(TRANSFORM_SEED)
+
+
+def seed_transform_random(seed: int | None = None) -> None:
+    """
+    Reseeds the randomness transform_text() uses by default, so what follows can be replayed exactly.
+
+    :param seed: The seed to use. If None, a random one is used.
+
+    :return: This function does not return anything.
+    """
+    transform_random.seed(seed)
+    batch_random.seed(seed)
+
+
+def _apply_modifiers_batched(plan: "ProfilePlan", words: list[str], rng: BatchRandom) -> list[str]:
+    """
+    Applies muffles, sprinkles, stutters, prefixes and suffixes to a message, like transform_text() does, but drawing
+    every random number for each modifier at once.
+
+    :param plan: The compiled transformation plan.
+    :param words: The words of the message. They're modified in place.
+    :param rng: Where to draw the random numbers from.
+
+    :return: The modified words.
+    """
+    if plan.muffle:
+        # When several muffles hit the same word, the last one applied wins
+        for i, hits in enumerate(rng.hits(len(words), [chance for _, chance in plan.muffle])):
+            if hits and not words[i].startswith("http"):
+                words[i] = plan.muffle[hits[-1][0]][0]
+
+    if plan.sprinkle:
+        for i, hits in enumerate(rng.hits(len(words), [chance for _, chance in plan.sprinkle], coins=True)):
+            for column, coin in hits:
+                sprinkle = plan.sprinkle[column][0]
+                if coin:
+                    words[i] = f"{words[i]} {sprinkle}"
+                words[i] = f"{sprinkle} {words[i]}"
+
+    if plan.stutter > 0:
+        rolls = rng.uniform(2 * len(words))
+        for i in range(len(words)):
+            if words[i].startswith("http") or not words[i].isalnum() or words[i] in "0123456789":
+                continue
+
+            if rolls[2 * i] * 100 <= plan.stutter:
+                length = 1 + int(rolls[2 * i + 1] * (1 + int(len(words[i]) * int(plan.stutter) / 200)))
+                words[i] = f"{words[i][:length]}-{words[i]}"
+
+    if plan.prefix:
+        for column, _ in rng.hits(1, [chance for _, chance in plan.prefix])[0]:
+            words[0] = plan.prefix[column][0] + words[0]
+
+    if plan.suffix:
+        for column, _ in rng.hits(1, [chance for _, chance in plan.suffix])[0]:
+            words[-1] += plan.suffix[column][0]
+
+    return words
+
+
+class ProfilePlan(NamedTuple):
+    """
+    Everything transform_text() needs from a TMUD profile, worked out ahead of time: chances as numbers, modifiers as
+    tuples, and censor patterns already compiled. Build it with compile_profile().
+    """
+    alt_muffle: tuple[tuple[str, str, float], ...]  # (Word, casefolded word, chance)
+    muffle: tuple[tuple[str, float], ...]  # (Word, chance)
+    sprinkle: tuple[tuple[str, float], ...]
+    prefix: tuple[tuple[str, float], ...]
+    suffix: tuple[tuple[str, float], ...]
+    stutter: float
+    censor: MappingProxyType  # The raw censors, for whole-word replacements
+    censor_words: MappingProxyType  # Casefolded censor -> replacements, in the order they were added
+    censor_line_patterns: tuple[tuple[str, re.Pattern, str], ...]  # (Raw pattern, compiled pattern, replacement)
+    censor_word_patterns: tuple[tuple[str, re.Pattern, str], ...]
+    censor_line_filter: re.Pattern | None  # All the patterns above in one, to skip them quickly when none match
+    censor_word_filter: re.Pattern | None
+    censor_error: str | None  # Error message for the first censor pattern that couldn't be compiled
+    big: bool
+    small: bool
+    hush: bool
+    backwards: bool
+
+
+# Things that change meaning (or stop working) when a pattern is put inside a bigger one: backreferences, conditionals,
+# named groups (which can't be repeated) and global flags (which must be at the very start)
+UNCOMBINABLE_REGEX: re.Pattern = re.compile(r"\\[1-9]|\(\?P[=<]|\(\?\(|\(\?[aiLmsux]+\)")
+
+
+def _combine_patterns(patterns: tuple[tuple[str, re.Pattern, str], ...]) -> re.Pattern | None:
+    """
+    Combines several censor patterns into a single alternation, which matches wherever any of them would.
+
+    :param patterns: The compiled censor patterns.
+
+    :return: The combined pattern, or None if there's only one pattern, or they can't be combined safely.
+    """
+    if len(patterns) < 2 or any(UNCOMBINABLE_REGEX.search(regex.pattern) for _, regex, _ in patterns):
+        return None
+    try:
+        return re.compile("|".join(f"(?:{regex.pattern})" for _, regex, _ in patterns))
+    except Exception:
+        return None
+
+
+def compile_profile(data: dict) -> ProfilePlan:
+    """
+    Turns the TMUD data of a user in a server into a plan transform_text() can run against directly.
+
+    :param data: A TMUD-compliant dictionary containing the transformation data, for a single server.
+
+    :return: The compiled plan.
+    """
+    def chances(modifier: dict) -> tuple[tuple[str, float], ...]:
+        return tuple((key, float(chance)) for key, chance in modifier.items())
+
+    censor_error = None
+
+    def patterns(prefix: str) -> tuple[tuple[str, re.Pattern, str], ...]:
+        nonlocal censor_error
+        compiled = []
+        for pattern, replacement in data['censor'].items():
+            if not pattern.startswith(prefix):
+                continue
+            try:
+                compiled.append((pattern, re.compile(pattern[len(prefix):]), replacement))
+            except Exception as e:
+                if censor_error is None:
+                    censor_error = f"```REGEX ERROR with pattern \"{pattern[len(prefix):]}\":\n{e}```"
+        return tuple(compiled)
+
+    censor_words = {}
+    for censor, replacement in data['censor'].items():
+        censor_words.setdefault(censor.casefold(), []).append(replacement)
+    censor_line_patterns = patterns("-/")
+    censor_word_patterns = patterns("/")
+
+    return ProfilePlan(
+        alt_muffle=tuple((word, word.casefold(), chance) for word, chance in chances(data['alt_muffle'])),
+        muffle=chances(data['muffle']),
+        sprinkle=chances(data['sprinkle']),
+        prefix=chances(data['prefix']),
+        suffix=chances(data['suffix']),
+        stutter=float(data['stutter']),
+        censor=MappingProxyType(dict(data['censor'])),
+        censor_words=MappingProxyType({censor: tuple(replacements) for censor, replacements in censor_words.items()}),
+        censor_line_patterns=censor_line_patterns,
+        censor_word_patterns=censor_word_patterns,
+        censor_line_filter=_combine_patterns(censor_line_patterns),
+        censor_word_filter=_combine_patterns(censor_word_patterns),
+        censor_error=censor_error,
+        big=bool(data['big']),
+        small=bool(data['small']),
+        hush=bool(data['hush']),
+        backwards=bool(data['backwards'])
+    )
+
+
+def get_profile_plan(user: discord.User | discord.Member | int, guild: discord.Guild | int) -> ProfilePlan | None:
+    """
+    Gets the compiled plan for a user's transformation in a server, compiling it only if the user's data has changed
+    since the last time.
+
+    :param user: A Discord User or Member object, representing the user whose plan is to be loaded.
+    :param guild: A Discord Guild object, representing the server in which the user is transformed.
+
+    :return: The compiled plan, or None if the user isn't transformed in that server.
+    """
+    user_id = str(user if type(user) is int else user.id)
+    guild_id = str(guild if type(guild) is int else guild.id)
+    revision = tf_revisions.get(user_id, 0)
+    cached = plan_cache.get((user_id, guild_id))
+    if cached is not None and cached[0] == revision:
+        return cached[1]
+    data = tf_cache.peek(user_id)
+    if data is None:
+        data = load_tf(user_id)
+    if data.get(guild_id, {}) == {}:
+        return None
+    plan = compile_profile(data[guild_id])
+    plan_cache.put((user_id, guild_id), (revision, plan))
+    return plan
+
+
+async def get_profile_plan_async(user: discord.User | discord.Member | int,
+                                 guild: discord.Guild | int) -> ProfilePlan | None:
+    """
+    Same as get_profile_plan(), but without blocking the event loop.
+    """
+    await _ensure_tf_loaded(user)
+    return get_profile_plan(user, guild)
+
+
+class ProxyContext(NamedTuple):
+    """
+    Everything needed to decide whether (and how) to proxy a user's message, as of the last change to their data or the
+    server's.
+    """
+    transformed: bool  # Whether the user is transformed in the server
+    blocked: bool  # Whether the user won't be transformed in the channel, either by their choice or the server's
+    name: str | None
+    avatar_url: str | None
+    plan: ProfilePlan | None
+    profile: MappingProxyType  # The parts of the user's data that are remembered alongside each proxied message
+    notify_id: int | None  # Who gets sent the original text of the messages the modifiers change
+    logs: tuple[int | None, ...]
+    clear_other_logs: bool
+
+
+NOT_TRANSFORMED: ProxyContext = ProxyContext(transformed=False, blocked=False, name=None, avatar_url=None, plan=None,
+                                             profile=MappingProxyType({}), notify_id=None, logs=(None, None, None, None),
+                                             clear_other_logs=False)
+
+
+def resolve_proxy_context(author_id: int, guild_id: int, channel_id: int) -> ProxyContext:
+    """
+    Works out everything needed to proxy a user's message in one go. It's only worked out again when the user's or the
+    server's data changes, so, most of the time, it's just a lookup.
+
+    :param author_id: The ID of the user who sent the message.
+    :param guild_id: The ID of the server the message was sent in.
+    :param channel_id: The ID of the channel (or thread) the message was sent in.
+
+    :return: An immutable snapshot of the user's transformation in the server.
+    """
+    user_id, server_id = str(author_id), str(guild_id)
+    revision = (tf_revisions.get(user_id, 0), transformed_revisions.get(server_id, 0), _transformed_generation)
+    cached = context_cache.get((user_id, server_id))
+    if cached is not None and cached[0] == revision:
+        context = cached[1]
+    else:
+        server_data = load_transformed(guild_id)
+        data = _get_tf(user_id).get(server_id, {})
+        context = NOT_TRANSFORMED._replace(logs=tuple(server_data.get('logs', NOT_TRANSFORMED.logs)),
+                                           clear_other_logs=bool(server_data.get('clear_other_logs', False)))
+        if is_transformed(author_id, guild_id) and data != {}:
+            reported = data['censor'] != {} or data['muffle'] != {} or data['alt_muffle'] != {} or data['sprinkle'] != {}
+            notify_id = data['transformed_by'] if data['claim'] is None else data['claim']
+            context = context._replace(transformed=True,
+                                       name=data['into'],
+                                       avatar_url=data['image_url'],
+                                       plan=get_profile_plan(author_id, guild_id),
+                                       profile=MappingProxyType({field: data.get(field) for field in SNAPSHOT_FIELDS}),
+                                       notify_id=int(notify_id) if reported else None)
+        context_cache.put((user_id, server_id), (revision, context))
+    if context.transformed and str(channel_id) in get_block_sets(author_id, guild_id).channels:
+        return context._replace(blocked=True)
+    return context
+
+
+async def resolve_proxy_context_async(author_id: int, guild_id: int, channel_id: int) -> ProxyContext:
+    """
+    Same as resolve_proxy_context(), but without blocking the event loop.
+    """
+    await _ensure_tf_loaded(author_id)
+    await _ensure_transformed_loaded()
+    return resolve_proxy_context(author_id, guild_id, channel_id)
+
+
 # Apply all necessary modifications to the message, based on the user's transformation data
-def transform_text(data: dict, original: str) -> str:
+def transform_text(data: dict | ProfilePlan,
+                   original: str,
+                   batched: bool = BATCHED_RANDOM,
+                   rng: random.Random | BatchRandom | None = None) -> str:
     """
     Transforms a message based on the provided transformation data.
 
-    :param data: A TMUD-compliant dictionary containing the transformation data.
+    :param data: A TMUD-compliant dictionary containing the transformation data, or a plan compiled from one.
     :param original: The original message to be transformed.
+    :param batched: Whether to draw the random numbers for each modifier all at once. Faster for long messages, and
+    just as random, but gives different results for the same seed.
+    :param rng: Where to draw the random numbers from, so the transformation can be replayed exactly. A BatchRandom is
+    always used in batched mode, and a random.Random in sequential mode. If not specified, the default generators are
+    used, which are seeded from TRANSFORM_SEED.
 
     :return: The transformed message.
     """
+    plan = data if isinstance(data, ProfilePlan) else compile_profile(data)
+    if rng is None:
+        rng = batch_random if batched else transform_random
+    batched = isinstance(rng, BatchRandom)
+
     # Remove Apple's curly quotes to avoid issues with regexes
     transformed = original.replace("’", "'").replace("“", "\"").replace("”", "\"")
 
@@ -487,105 +1651,114 @@ def transform_text(data: dict, original: str) -> str:
         (transformed.startswith("_") and transformed.endswith("_"))):
         return transformed
 
-    if data['alt_muffle'] != {}:
+    if plan.alt_muffle:
         # Alternative Muffle will overwrite the entire message with a word from the data array from random chance
         # If we apply this one transformation, that's it. Only this one. That's why it's at the top.
-        for alt_muffle in data['alt_muffle']:
-            if (alt_muffle.casefold() == transformed.casefold() or
-                random.random() * 100 <= float(data['alt_muffle'][alt_muffle])):
+        casefolded = transformed.casefold()
+        rolls = rng.uniform(len(plan.alt_muffle)) if batched else None
+        for i, (alt_muffle, alt_muffle_casefolded, chance) in enumerate(plan.alt_muffle):
+            if alt_muffle_casefolded == casefolded or (rolls[i] if batched else rng.random()) * 100 <= chance:
                 return alt_muffle
 
     words = transformed.split(" ")
-    if data['muffle'] != {}:
-        for i in range(len(words)):
-            if words[i].startswith("http"):
-                continue
-
-            muffles = list(data['muffle'].keys())
-            random.shuffle(muffles)
-            for muffle in muffles:
-                if random.random() * 100 <= float(data['muffle'][muffle]):
-                    words[i] = muffle
+    if batched:
+        words = _apply_modifiers_batched(plan, words, rng)
+    else:
+        if plan.muffle:
+            for i in range(len(words)):
+                if words[i].startswith("http"):
+                    continue
 
-    # Sprinkle will add the sprinkled word to the message between words by random chance
-    # for each word, if the chance is met, add a sprinkled word before it
-    if data['sprinkle'] != {}:
-        sprinkles = list(data['sprinkle'].keys())
-        for i in range(len(words)):
-            random.shuffle(sprinkles)
-            for sprinkle in sprinkles:
-                if random.random() * 100 <= float(data['sprinkle'][sprinkle]):
-                    if random.random() < 0.5:
-                        words[i] = f"{words[i]} {sprinkle}"
-                    words[i] = f"{sprinkle} {words[i]}"
-
-    if data['stutter'] > 0:
-        for i in range(len(words)):
-            if words[i].startswith("http") or not words[i].isalnum() or words[i] in "0123456789":
-                continue
+                muffles = list(plan.muffle)
+                rng.shuffle(muffles)
+                for muffle, chance in muffles:
+                    if rng.random() * 100 <= chance:
+                        words[i] = muffle
+
+        # Sprinkle will add the sprinkled word to the message between words by random chance
+        # for each word, if the chance is met, add a sprinkled word before it
+        if plan.sprinkle:
+            sprinkles = list(plan.sprinkle)
+            for i in range(len(words)):
+                rng.shuffle(sprinkles)
+                for sprinkle, chance in sprinkles:
+                    if rng.random() * 100 <= chance:
+                        if rng.random() < 0.5:
+                            words[i] = f"{words[i]} {sprinkle}"
+                        words[i] = f"{sprinkle} {words[i]}"
+
+        if plan.stutter > 0:
+            for i in range(len(words)):
+                if words[i].startswith("http") or not words[i].isalnum() or words[i] in "0123456789":
+                    continue
 
-            if random.random() * 100 <= float(data['stutter']):
-                words[i] = f"{words[i][:random.randint(1, 1 + int(len(words[i]) * int(data['stutter']) / 200))]}-{words[i]}"
-
-    # Moving these below, so text changes are applied before the prefix and suffix so they aren't affected
-    # by censors or such
-    if data['prefix'] != {}:
-        prefixes = list(data['prefix'].keys())
-        random.shuffle(prefixes)
-        for prefix in prefixes:
-            if random.random() * 100 <= float(data['prefix'][prefix]):
-                words[0] = prefix + words[0]
-
-    if data['suffix'] != {}:
-        suffixes = list(data['suffix'].keys())
-        random.shuffle(suffixes)
-        for suffix in suffixes:
-            if random.random() * 100 <= float(data['suffix'][suffix]):
-                words[-1] += suffix
-
-    if data['censor'] != {}:
-        for pattern in data['censor']:
+                if rng.random() * 100 <= plan.stutter:
+                    length = rng.randint(1, 1 + int(len(words[i]) * int(plan.stutter) / 200))
+                    words[i] = f"{words[i][:length]}-{words[i]}"
+
+        # Moving these below, so text changes are applied before the prefix and suffix so they aren't affected
+        # by censors or such
+        if plan.prefix:
+            prefixes = list(plan.prefix)
+            rng.shuffle(prefixes)
+            for prefix, chance in prefixes:
+                if rng.random() * 100 <= chance:
+                    words[0] = prefix + words[0]
+
+        if plan.suffix:
+            suffixes = list(plan.suffix)
+            rng.shuffle(suffixes)
+            for suffix, chance in suffixes:
+                if rng.random() * 100 <= chance:
+                    words[-1] += suffix
+
+    if plan.censor:
+        if plan.censor_error is not None:
+            return plan.censor_error
+
+        line_patterns = plan.censor_line_patterns
+        if plan.censor_line_filter is not None and not plan.censor_line_filter.search(" ".join(words)):
+            line_patterns = ()  # None of them match, so none of them would change anything
+        for pattern, regex, replacement in line_patterns:
             try:
-                if pattern.startswith("-/") and re.search(pattern[2:], " ".join(words)):
-                    words = re.sub(pattern[2:], data['censor'][pattern], " ".join(words)).split(" ")
+                line = " ".join(words)
+                if regex.search(line):
+                    words = regex.sub(replacement, line).split(" ")
             except Exception as e:
                 return f"```REGEX ERROR with pattern \"{pattern[2:]}\":\n{e}```"
 
         for i in range(len(words)):
             word = ''.join(e for e in words[i] if e.isalnum())  # Remove special characters
 
-            for censor in data['censor']:
-                if word.casefold() == censor.casefold():
-                    words[i] = words[i].replace(word, data['censor'][censor])  # We keep punctuation
+            for replacement in plan.censor_words.get(word.casefold(), ()):
+                words[i] = words[i].replace(word, replacement)  # We keep punctuation
 
-            if words[i] in data['censor']:
-                words[i] = data['censor'][words[i]]  # The entire word should be replaced
+            if words[i] in plan.censor:
+                words[i] = plan.censor[words[i]]  # The entire word should be replaced
 
-            for pattern in data['censor']:
+            if plan.censor_word_filter is not None and not plan.censor_word_filter.search(words[i]):
+                continue  # None of the patterns match, so none of them would change anything
+            for pattern, regex, replacement in plan.censor_word_patterns:
                 try:
-                    if pattern.startswith("/") and re.search(pattern[1:], words[i]):
-                        words[i] = re.sub(pattern[1:], data['censor'][pattern], words[i])
+                    if regex.search(words[i]):
+                        words[i] = regex.sub(replacement, words[i])
                 except Exception as e:
                     return f"```REGEX ERROR with pattern \"{pattern[1:]}\":\n{e}```"
 
-    if data['backwards']:
+    if plan.backwards:
         for match in re.finditer(r"<@!?(\d+)>", " ".join(words)):
             mention = match.group(0)
             words[words.index(mention)] = mention[::-1]
-    transformed = "# " * data['big'] + " ".join(words)[::(1 - 2 * data['backwards'])]
+    transformed = "# " * plan.big + " ".join(words)[::(1 - 2 * plan.backwards)]
 
-    if data['small'] and not data['big']:
+    if plan.small and not plan.big:
         transformed = "\n".join(f"-# {text.strip()}" * (text.strip != "")
-        for text in transformed.lower().translate(
-            str.maketrans("abcdefghijklmnopqrstuvwxyz.,0123456789+-=()˄˅",
-                          "ᵃᵇᶜᵈᵉᶠᵍʰⁱʲᵏˡᵐⁿᵒᵖᵠʳˢᵗᵘᵛʷˣʸᶻ·ʾ⁰¹²³⁴⁵⁶⁷⁸⁹⁺⁻⁼⁽⁾ˆˇ")
-        ).splitlines())
+                                for text in transformed.lower().translate(SMALL_TEXT_TABLE).splitlines())
 
         # Make sure mentions work appropriately
-        transformed = " ".join(w.translate(str.maketrans("⁰¹²³⁴⁵⁶⁷⁸⁹", "0123456789")) if w[:2] == "<@" else w
-                               for w in transformed.split(" "))
+        transformed = " ".join(w.translate(SMALL_DIGITS_TABLE) if w[:2] == "<@" else w for w in transformed.split(" "))
 
-    return f"||{transformed}||" if data['hush'] else transformed
+    return f"||{transformed}||" if plan.hush else transformed
 
 
 # ABSTRACTION FUNCTIONS
@@ -596,10 +1769,10 @@ async def extract_tf_data(ctx: discord.ApplicationContext,
                                                               discord.User | discord.Member | None]:
     if user is None:
         user = ctx.author
-    if not is_transformed(user, ctx.guild):
+    if not await is_transformed_async(user, ctx.guild):
         await ctx.respond(f"You can't do that! {user.mention} is not transformed at the moment!")
         return False, None, None
-    data = load_tf(user, ctx.guild)
+    data = await load_tf_async(user, ctx.guild)
     if not get_command and data['claim'] != 0 and data['claim'] != ctx.author.id:
         await ctx.respond(f"You can't do that! {user.mention} is owned by"
                           f"{ctx.guild.get_member(data['claim']).mention}, and not by you!")
@@ -607,68 +1780,415 @@ async def extract_tf_data(ctx: discord.ApplicationContext,
     return True, data, user
 
 
-# FILE UTILS
-def load_file(filename: str, guild_id: int | None = None) -> dict:
-    """
-    Loads a JSON file from disk. If `guild_id` is specified, returns only the data for that guild.
+# MISCELLANEOUS UTILS
+# How long a webhook is considered "hot" after being rate limited, in seconds, if Discord doesn't say. While every
+# webhook in a pool is hot, the pool will try to create a new one, if it's not full yet.
+WEBHOOK_RATE_LIMIT_COOLDOWN: float = 10
 
-    :param filename: The path to the JSON file to load.
-    :param guild_id: The ID of the guild to load data for. If not specified, returns the entire file.
+# How many messages can be waiting on a single webhook before it's considered hot too. Discord lets each webhook send
+# about five messages every couple of seconds, so any more than that have to wait for the rate limit anyway.
+WEBHOOK_QUEUE_DEPTH: int = 5
 
-    :return: A dictionary containing the data from the JSON file, or the data for the specified guild.
-    """
+# Until when each webhook is rate limited, keyed by webhook ID, as reported by the last send that got rate limited.
+webhook_rate_limits: dict[int, float] = {}
+
+# How every webhook was found, by WebhookPool.get(): "reused" from the pool, "fetched" from Discord (which takes a
+# request), or "created" (which takes another one)
+webhook_resolutions: Counter = Counter()
+
+
+def _retry_after(error: discord.HTTPException) -> float:
+    # How long Discord told us to wait after rate limiting a request, in seconds
     try:
-        with open(filename) as f:
-            contents = f.read().strip()
-    except OSError as e:
-        print(f"Error loading file:\n{str(type(e))}: {e}")
-        return {}
-    if contents == "":
-        return {}
-    data = json.loads(contents)
-    if guild_id is None:
-        return data
-    if str(guild_id) in data:
-        return data[str(guild_id)]
-    return {}
+        return float(error.response.headers["Retry-After"])
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return WEBHOOK_RATE_LIMIT_COOLDOWN
 
 
-def write_file(filename: str, data: dict) -> None:
+class WebhookPool:
+    """
+    The webhooks the bot uses to send messages in a single channel. Up to WEBHOOK_POOL_SIZE webhooks are kept, and
+    each message goes through the one whose rate limit ends the soonest. New webhooks are only created once every
+    webhook in the pool is rate limited, or has too many messages waiting on it, so busy channels don't all queue up
+    behind a single webhook. Messages from the same user are sent one after another, so they never arrive out of order.
+    """
+    def __init__(self, name: str, size: int = WEBHOOK_POOL_SIZE) -> None:
+        self.name = name
+        self.size = max(size, 1)
+        self.webhooks: list[discord.Webhook] = []
+        self.loaded = False
+        self.in_flight: dict[int, int] = {}
+        self.last_used: dict[int, float] = {}
+        self.user_locks: dict[int, asyncio.Lock] = {}
+        self.user_waiters: dict[int, int] = {}  # How many sends are holding (or waiting for) each user's lock
+        self.growing = asyncio.Lock()
+
+    async def load(self, channel: discord.TextChannel) -> None:
+        """
+        Picks up the webhooks with our name that already exist in the channel.
+
+        :param channel: The Discord channel the pool belongs to.
+
+        :return: This function does not return anything.
+        """
+        webhooks = [wh for wh in await channel.webhooks() if wh.name == self.name]
+        # Webhooks created by someone else don't come with a token, so we can't send anything through them
+        self.webhooks = [wh for wh in webhooks if wh.token is not None][:self.size] or webhooks[:1]
+        self.loaded = True
+
+    def is_hot(self, webhook: discord.Webhook) -> bool:
+        return self.in_flight.get(webhook.id, 0) >= WEBHOOK_QUEUE_DEPTH or \
+            webhook_rate_limits.get(webhook.id, 0) > time.monotonic()
+
+    def pick(self) -> discord.Webhook | None:
+        """
+        Picks the webhook whose rate limit ends (or ended) the soonest, preferring the least busy and least recently
+        used ones if there's a tie.
+
+        :return: The webhook to use, or None if the pool is empty.
+        """
+        if not self.webhooks:
+            return None
+        return min(self.webhooks, key=lambda wh: (webhook_rate_limits.get(wh.id, 0),
+                                                  self.in_flight.get(wh.id, 0),
+                                                  self.last_used.get(wh.id, 0)))
+
+    async def get(self, channel: discord.TextChannel) -> discord.Webhook:
+        """
+        Gets the best webhook to send a message through, creating a new one if all of them are busy and there's still
+        room for more.
+
+        :param channel: The Discord channel the pool belongs to.
+
+        :return: The webhook to use.
+        """
+        webhook = self.pick()
+        if webhook is not None and (len(self.webhooks) >= self.size or not self.is_hot(webhook)):
+            webhook_resolutions['reused'] += 1
+            return webhook
+        async with self.growing:
+            resolution = 'reused'
+            if not self.loaded:
+                await self.load(channel)
+                resolution = 'fetched'
+            webhook = self.pick()
+            if webhook is None or (len(self.webhooks) < self.size and self.is_hot(webhook)):
+                try:
+                    webhook = await channel.create_webhook(name=self.name)
+                    self.webhooks.append(webhook)
+                    resolution = 'created'
+                except discord.errors.HTTPException:  # Webhook limit reached
+                    if webhook is None:
+                        webhooks = await channel.webhooks()
+                        if len(webhooks) == 0:
+                            raise
+                        webhook = webhooks[0]
+                        self.webhooks.append(webhook)
+                        resolution = 'fetched'
+                    self.size = len(self.webhooks)  # Don't try to grow this pool again
+        webhook_resolutions[resolution] += 1
+        return webhook
+
+    def remove(self, webhook: discord.Webhook) -> None:
+        """
+        Forgets a webhook that doesn't exist anymore.
+
+        :param webhook: The webhook to forget.
+
+        :return: This function does not return anything.
+        """
+        self.webhooks = [wh for wh in self.webhooks if wh.id != webhook.id]
+        webhook_rate_limits.pop(webhook.id, None)
+        self.in_flight.pop(webhook.id, None)
+        self.last_used.pop(webhook.id, None)
+        if not self.webhooks:
+            self.loaded = False
+
+    def clear(self) -> None:
+        """
+        Forgets all the webhooks in the pool, so they're looked up again next time they're needed.
+
+        :return: This function does not return anything.
+        """
+        for webhook in self.webhooks:
+            webhook_rate_limits.pop(webhook.id, None)
+        self.webhooks = []
+        self.loaded = False
+        self.in_flight.clear()
+        self.last_used.clear()
+
+    async def send(self,
+                   channel: discord.TextChannel,
+                   *args,
+                   author_id: int | None = None,
+                   **kwargs) -> discord.WebhookMessage:
+        """
+        Sends a message through the best webhook in the pool. If that webhook doesn't exist anymore, another one is
+        picked (or created), and the message is sent through it instead. If it's rate limited, the error is raised, and
+        the webhook isn't picked again until the rate limit is over.
+
+        :param channel: The Discord channel the pool belongs to.
+        :param args: The positional arguments to pass to discord.Webhook.send().
+        :param author_id: The ID of the user the message is sent on behalf of. Messages with the same author are sent in
+        order. If None, no ordering is guaranteed.
+        :param kwargs: The keyword arguments to pass to discord.Webhook.send().
+
+        :return: Whatever discord.Webhook.send() returns.
+        """
+        if author_id is None:
+            return await self._send(channel, *args, **kwargs)
+        lock = self.user_locks.setdefault(author_id, asyncio.Lock())
+        self.user_waiters[author_id] = self.user_waiters.get(author_id, 0) + 1
+        try:
+            async with lock:
+                return await self._send(channel, *args, **kwargs)
+        finally:
+            # The lock is only dropped once nobody's waiting for it, or a new send could get ahead of those waiting
+            self.user_waiters[author_id] -= 1
+            if self.user_waiters[author_id] == 0:
+                del self.user_waiters[author_id]
+                del self.user_locks[author_id]
+
+    async def _send(self, channel: discord.TextChannel, *args, retry: bool = True, **kwargs) -> discord.WebhookMessage:
+        with metrics.timer("webhook", "get_webhook"):
+            webhook = await self.get(channel)
+        self.in_flight[webhook.id] = self.in_flight.get(webhook.id, 0) + 1
+        self.last_used[webhook.id] = time.monotonic()
+        try:
+            with metrics.timer("webhook", "send"):
+                return await webhook.send(*args, **kwargs)
+        except discord.NotFound:  # Unknown Webhook, someone must've deleted it
+            if not retry:
+                raise
+            self.remove(webhook)
+            for file in kwargs.get('files') or []:
+                file.reset()
+        except discord.HTTPException as e:
+            if e.status == 429:
+                # This webhook will be stuck for a while, so the next messages go through another one (or a new one, if
+                # the pool can still grow). Retrying this one is up to the outbound scheduler, which backs off the route.
+                webhook_rate_limits[webhook.id] = time.monotonic() + _retry_after(e)
+            raise
+        finally:
+            if webhook.id in self.in_flight:
+                self.in_flight[webhook.id] -= 1
+        return await self._send(channel, *args, retry=False, **kwargs)
+
+
+# Webhook pools we've already set up, keyed by channel ID and webhook name, so we don't have to ask Discord for the
+# webhooks every time a message is sent.
+webhook_cache: LRUCache = LRUCache(8192)
+
+
+def get_webhook_pool(channel: discord.TextChannel, name: str) -> WebhookPool:
     """
-    Writes a dictionary to a JSON file on disk.
+    Gets the webhook pool for a channel, setting up an empty one if it doesn't exist. The webhooks themselves are only
+    looked up (or created) when a message is sent.
 
-    :param filename: The path to the JSON file to write.
-    :param data: The dictionary to write to the JSON file.
+    :param channel: The Discord channel to get the pool for.
+    :param name: The name of the webhooks in the pool.
 
-    :return: This function does not return anything.
+    :return: The webhook pool for the channel.
     """
-    try:
-        with open(filename, "w+") as f:
-            f.write(json.dumps(data))
-    except OSError as e:
-        print(f"Error writing to file:\n{str(type(e))}: {e}")
+    pool = webhook_cache.get((channel.id, name))
+    if pool is None:
+        pool = WebhookPool(name)
+        webhook_cache.put((channel.id, name), pool)
+    return pool
 
 
-# MISCELLANEOUS UTILS
 async def get_webhook_by_name(channel: discord.TextChannel, name: str) -> discord.Webhook:
     """
-    Helper to get (or create, if it doesn't exist) a webhook by name from a list of webhooks.
+    Helper to get (or create, if it doesn't exist) a webhook by name from a list of webhooks. If the channel has more
+    than one, the one whose rate limit ends the soonest is returned.
 
     :param channel: The Discord channel to get the webhook from.
     :param name: The name of the webhook to get.
 
     :return: The Discord webhook with the specified name.
     """
-    webhook = next((wh for wh in await channel.webhooks() if wh.name == name), None)
-    if webhook is None:
-        try:
-            webhook = await channel.create_webhook(name=name)
-        except discord.errors.HTTPException: # Webhook limit reached
-            webhooks = await channel.webhooks()
-            if len(webhooks) == 0:
-                raise
-            webhook = webhooks[0]
-    return webhook
+    return await get_webhook_pool(channel, name).get(channel)
+
+
+def invalidate_webhooks(channels: list[discord.abc.GuildChannel] | discord.abc.GuildChannel, name: str) -> None:
+    """
+    Forgets the webhooks in the pools of some channels, so they're looked up again next time they're needed.
+
+    :param channels: The Discord channel (or channels) whose webhooks will be forgotten.
+    :param name: The name of the webhooks to forget.
+
+    :return: This function does not return anything.
+    """
+    for channel in channels if type(channels) is list else [channels]:
+        pool = webhook_cache.peek((channel.id, name))
+        if pool is not None:  # Keep the pool itself around, since it's keeping track of the order of messages
+            pool.clear()
+
+
+async def send_webhook_message(channel: discord.TextChannel,
+                               name: str,
+                               *args,
+                               author_id: int | None = None,
+                               **kwargs) -> discord.WebhookMessage:
+    """
+    Sends a message through the channel's webhook pool. If the chosen webhook doesn't exist anymore, another one is
+    picked (or created), and the message is sent through it instead.
+
+    :param channel: The Discord channel to send the message to. (The parent channel, for threads)
+    :param name: The name of the webhooks to use.
+    :param args: The positional arguments to pass to discord.Webhook.send().
+    :param author_id: The ID of the user the message is sent on behalf of, so their messages are kept in order.
+    :param kwargs: The keyword arguments to pass to discord.Webhook.send().
+
+    :return: Whatever discord.Webhook.send() returns.
+    """
+    return await get_webhook_pool(channel, name).send(channel, *args, author_id=author_id, **kwargs)
+
+
+# Everything we send to Discord on behalf of transformed users goes through here, so bursts of messages are spread
+# out under the rate limits, instead of blocking whoever's waiting for them.
+outbound_scheduler: OutboundScheduler = OutboundScheduler()
+
+
+# Who sent each proxied message, so it can be traced back to them exactly. See provenance.py
+provenance_store: ProvenanceStore = ProvenanceStore()
+
+
+def record_provenance(message: discord.WebhookMessage,
+                      guild_id: int,
+                      author_id: int,
+                      profile: dict | MappingProxyType) -> None:
+    """
+    Remembers who sent a proxied message. The record is written to the log on the next flush.
+
+    :param message: The message, as returned by discord.Webhook.send(wait=True).
+    :param guild_id: The ID of the server the message was sent in.
+    :param author_id: The ID of the user the message was sent on behalf of.
+    :param profile: The TMUD data of the user, for that server.
+
+    :return: This function does not return anything.
+    """
+    provenance_store.add(Provenance(message_id=message.id,
+                                    webhook_id=message.webhook_id,
+                                    channel_id=message.channel.id,
+                                    guild_id=guild_id,
+                                    author_id=author_id,
+                                    sent_at=time.time(),
+                                    profile={field: profile.get(field) for field in SNAPSHOT_FIELDS}))
+    _request_flush()
+
+
+def forget_provenance(user: discord.User | discord.Member | int | None = None,
+                      guild: discord.Guild | int | None = None) -> None:
+    """
+    Forgets who sent the proxied messages of a user, of a server, or of a user in a server, both in memory and in the
+    log, which is rewritten on the next flush.
+
+    :param user: A Discord user or member object, representing the user whose messages will be forgotten. If not
+    specified, the messages of every user in the server are forgotten.
+    :param guild: A Discord guild object, representing the server whose messages will be forgotten. If not specified,
+    the user's messages in every server are forgotten.
+
+    :return: This function does not return anything.
+    """
+    provenance_store.forget(None if guild is None else guild if type(guild) is int else guild.id,
+                            None if user is None else user if type(user) is int else user.id)
+    _request_flush()
+
+
+def get_provenance(message_id: int) -> Provenance | None:
+    """
+    :param message_id: The ID of a proxied message.
+
+    :return: Who sent the message, or None if it isn't known.
+    """
+    return provenance_store.get(message_id)
+
+
+async def load_provenance() -> None:
+    """
+    Compacts the log of who sent each proxied message, and loads the most recent records from it, on the I/O threads.
+    Does nothing if it was already loaded.
+
+    :return: This function does not return anything.
+    """
+    if provenance_store.loaded:
+        return
+    async with _flush_lock:  # So nothing is appended to the log while it's being compacted
+        provenance_store.load(await run_io(provenance_store.compact))
+
+
+def queue_proxy_message(original: discord.Message,
+                        channel: discord.TextChannel,
+                        name: str,
+                        *args,
+                        author_id: int,
+                        profile: dict | MappingProxyType | None = None,
+                        **kwargs) -> asyncio.Future:
+    """
+    Queues a message to be sent through the channel's webhook pool, and the original message to be deleted after it's
+    been sent. If the message can't be sent, the original message is left alone.
+
+    :param original: The message being replaced.
+    :param channel: The Discord channel to send the message to. (The parent channel, for threads)
+    :param name: The name of the webhooks to use.
+    :param args: The positional arguments to pass to discord.Webhook.send().
+    :param author_id: The ID of the user the message is sent on behalf of, so their messages are kept in order.
+    :param profile: The TMUD data of the user for the server, to remember who sent the message once it's sent.
+    :param kwargs: The keyword arguments to pass to discord.Webhook.send().
+
+    :return: A future that's done once the original message has been deleted.
+    """
+    async def send() -> discord.WebhookMessage:
+        message = await send_webhook_message(channel, name, *args, author_id=author_id, wait=True, **kwargs)
+        record_provenance(message, original.guild.id, author_id, profile or {})
+        return message
+
+    async def delete() -> None:
+        with metrics.timer("outbound", "message_delete"):
+            await original.delete()
+
+    key = (original.channel.id, author_id)
+    sent = outbound_scheduler.submit(original.guild.id, key, ('send', channel.id), send)
+    return outbound_scheduler.submit(original.guild.id, key, ('delete', original.channel.id), delete, after=sent)
+
+
+def collect_metrics() -> list[str]:
+    """
+    :return: The stats of the outbound queue, the caches and the storage, in the Prometheus text format.
+    """
+    scheduler_stats = outbound_scheduler.stats()
+    lines = metrics.gauge("transformate_outbound_queue_depth", "Requests waiting in the outbound queue.",
+                          scheduler_stats['depth'])
+    lines += metrics.gauge("transformate_outbound_running", "Requests to Discord currently running.",
+                           scheduler_stats['running'])
+    lines += metrics.gauge("transformate_outbound_jobs_total", "Requests sent through the outbound queue.",
+                           scheduler_stats['jobs'], kind="counter")
+    lines += metrics.gauge("transformate_outbound_failures_total", "Requests in the outbound queue that failed.",
+                           scheduler_stats['failures'], kind="counter")
+    lines += metrics.gauge("transformate_outbound_wait_seconds", "How long requests waited in the outbound queue.",
+                           {stat: scheduler_stats[f"wait_{stat}"] for stat in ['avg', 'p50', 'p95', 'max']},
+                           label="stat")
+    for cache_name, cache in [('tmud', tf_cache), ('plan', plan_cache)]:
+        cache_stats = cache.stats()
+        lines += metrics.gauge(f"transformate_{cache_name}_cache_size", f"Entries in the {cache_name} cache.",
+                               cache_stats['size'])
+        lines += metrics.gauge(f"transformate_{cache_name}_cache_lookups_total",
+                               f"Lookups in the {cache_name} cache, by result.",
+                               {'hit': cache_stats['hits'], 'miss': cache_stats['misses']}, label="result",
+                               kind="counter")
+    lines += metrics.gauge("transformate_webhook_pools", "Channels with a webhook pool set up.",
+                           webhook_cache.stats()['size'])
+    lines += metrics.gauge("transformate_webhook_resolutions_total",
+                           "Webhooks picked to send a message through, by how they were found.",
+                           {result: webhook_resolutions[result] for result in ['reused', 'fetched', 'created']},
+                           label="result", kind="counter")
+    lines += metrics.gauge("transformate_storage_operations_total", "Storage operations, by kind.", dict(io_counts),
+                           label="operation", kind="counter")
+    return lines
+
+
+metrics.collectors.append(collect_metrics)
 
 
 def get_embed_base(title: str,
@@ -687,17 +2207,54 @@ def get_embed_base(title: str,
     )
 
 
-def check_message(message: discord.Message) -> tuple[int | None, dict | None]:
-    transformed_data = load_transformed(message.guild)['transformed_users']
-    # Currently, we have to check over ALL transformed users
-    for tfee in transformed_data:
-        if transformed_data[tfee] in [[], None]:
+async def get_name_index(guild: discord.Guild | int) -> NameIndex:
+    """
+    Gets the index of the names the users of a server are transformed into, building it (or the parts of it that are
+    missing) first, if needed. The data of the users that aren't cached is loaded on the I/O threads.
+
+    :param guild: A Discord guild object, representing the server whose index will be returned.
+
+    :return: The up-to-date index for the server.
+    """
+    guild_id = str(guild if type(guild) is int else guild.id)
+    index = name_indexes.get(guild_id)
+    if index is None:
+        index = name_indexes[guild_id] = NameIndex()
+        index.pending.update(user_id for user_id, active in
+                             (await load_transformed_async(guild)).get('transformed_users', {}).items() if active)
+
+    async def look_up(user_id: str) -> None:
+        data = await load_tf_async(int(user_id), guild)
+        if user_id in index.pending:  # Otherwise, it was written in the meantime, and the index has the new name
+            index.set(user_id, data.get('into'))
+
+    if index.pending:
+        await asyncio.gather(*[look_up(user_id) for user_id in list(index.pending)])
+    return index
+
+
+async def check_message(message: discord.Message) -> list[tuple[int, dict]]:
+    """
+    Finds out which transformed users could have sent a proxied message. If we remember who sent it, that's the only
+    user returned, otherwise we go by its author's name.
+
+    :param message: The proxied message to check.
+
+    :return: The ID and the server's TMUD data of every transformed user who could've sent it (usually, only one).
+    """
+    record = provenance_store.get(message.id)
+    if record is not None:
+        data = await load_tf_async(record.author_id, message.guild)
+        return [(record.author_id, data)] if data != {} else []
+
+    transformed_users = (await load_transformed_async(message.guild)).get('transformed_users', {})
+    index = await get_name_index(message.guild)
+    matches = []
+    for tfee in index.get(message.author.display_name):
+        if not transformed_users.get(tfee):  # Removed from the server in the meantime
             continue
-        data = load_tf(int(tfee), message.guild)
-        if 'into' in data and data['into'] == message.author.display_name:
-            # TODO: Make it so that this function returns all currently tfed users with this tf name
-            return int(tfee), data
-    return None, None
+        matches.append((int(tfee), await load_tf_async(int(tfee), message.guild)))
+    return matches
 
 # TSF Utilities
 # See https://dorythecat.github.io/TransforMate/commands/transformation/export_tf/#transformation-string-format
@@ -813,29 +2370,116 @@ def decode_tsf(tsf_string: str) -> dict:
     return data
 
 
-def check_url(url: str) -> str:
+class ImageURLValidator:
+    """
+    Asynchronously checks image URLs, sharing a single pool of connections, and remembering the results for a while, so
+    checking the same URL over and over doesn't send any requests. Failures are remembered for less time than
+    successes, and checks of a URL that's already being checked wait for that check to finish, instead of sending their
+    own requests.
+    """
+    def __init__(self,
+                 timeout: float = URL_CHECK_TIMEOUT,
+                 ttl: float = URL_CACHE_TTL,
+                 failure_ttl: float = URL_CACHE_FAILURE_TTL,
+                 capacity: int = 4096) -> None:
+        self.timeout = timeout
+        self.ttl = ttl
+        self.failure_ttl = failure_ttl
+        self.cache: LRUCache = LRUCache(capacity)  # Normalized URL -> (Expiry time, Result)
+        self._pending: dict[str, asyncio.Task] = {}
+        self._session: aiohttp.ClientSession | None = None
+
+    @staticmethod
+    def normalize(url: str) -> str:
+        """
+        Normalizes a URL, so different ways of writing the same URL share a cache entry.
+
+        :param url: The URL to normalize.
+
+        :return: The normalized URL, with a scheme, a lowercase scheme and host, and no fragment.
+        """
+        url = url.strip()
+        if not url.startswith("http"):
+            url = f"https://{url}"
+        parts = urlsplit(url)
+        return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, parts.query, ""))
+
+    async def check(self, url: str) -> str:
+        """
+        Checks if a given URL is a reachable image, fixing it if possible.
+
+        :param url: The URL to check.
+
+        :return: A string containing a usable URL, blank if the given URL is invalid or cannot be reached.
+        """
+        if not re.match(URL_REGEX, url):
+            return ""
+        key = self.normalize(url)
+        cached = self.cache.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+
+        lookup = self._pending.get(key)
+        if lookup is None:
+            # The lookup runs on its own, so cancelling whoever started it doesn't cancel it for everyone else waiting
+            lookup = self._pending[key] = asyncio.ensure_future(self._lookup(key))
+            lookup.add_done_callback(lambda task: task.cancelled() or task.exception())  # Even if nobody's waiting
+        return await asyncio.shield(lookup)
+
+    async def _lookup(self, key: str) -> str:
+        try:
+            result = await self._check(key)
+            self.cache.put(key, (time.monotonic() + (self.ttl if result else self.failure_ttl), result))
+            return result
+        finally:
+            self._pending.pop(key, None)
+
+    async def _check(self, url: str) -> str:
+        try:
+            content_type = await self._content_type(url)
+            if content_type is None:
+                if url.startswith("http://"):
+                    return ""  # URL was already HTTP, we can't try anything else
+                url = f"http://{url[8:]}"  # Try HTTP
+                content_type = await self._content_type(url)
+                if content_type is None:
+                    return ""
+            # Something that can be reached, but isn't an image, won't become one over HTTP
+            return url if content_type.startswith("image/") else ""
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+            return ""
+
+    async def _content_type(self, url: str) -> str | None:
+        # The content type of the URL, or None if it can't be reached
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=32, ttl_dns_cache=300),
+                                                  timeout=aiohttp.ClientTimeout(total=self.timeout))
+        async with self._session.head(url, allow_redirects=True) as response:
+            if response.status >= 400:
+                return None
+            return response.headers.get('Content-Type', "")
+
+    async def close(self) -> None:
+        """
+        Closes the pool of connections. It will be reopened if any other URL is checked.
+
+        :return: This function does not return anything.
+        """
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+image_url_validator: ImageURLValidator = ImageURLValidator()
+
+
+async def check_url_async(url: str) -> str:
     """
-    This function will check if a given URL is a valid HTTP address, and if it isn't, and it can be fixed, fixes it.
+    Checks if a given URL is a reachable image, fixing it if possible, without blocking the event loop, and caching the
+    results. See ImageURLValidator.
 
     :param url: The URL to check.
 
     :return: A string containing a usable URL, blank if the given URL is invalid or cannot be reached.
     """
-    if not re.match(URL_REGEX, url):
-        return ""
-    if not url.startswith("http"):
-        url = f"https://{url}" # Try HTTPS
-    try: # Check that the url is reachable
-        response = requests.head(url, allow_redirects=True, timeout=60)
-        if response.status_code >= 400:
-            if url.startswith("http://"):
-                return "" # URL was already HTTP, we can't try anything else
-            url = f"http://{url[8:]}" # Try HTTP
-            response = requests.head(url, allow_redirects=True, timeout=60)
-            if response.status_code >= 400:
-                return ""
-        if not response.headers['Content-Type'].startswith("image/"):
-            return ""
-    except requests.RequestException:
-        return ""
-    return url
+    return await image_url_validator.check(url)
@@ -0,0 +1,16 @@
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+
+# The bot's configuration is read on import, so it has to be set up before importing anything from the bot. The cache
+# always lives in a temporary directory, so the real data is never touched.
+os.environ["CACHE_PATH"] = tempfile.mkdtemp(prefix="transformate-tests-")
+os.environ.pop("SQLITE_PATH", None)
+atexit.register(shutil.rmtree, os.environ["CACHE_PATH"], True)
+for name, value in {"BOT_TOKEN": "tests", "WEBHOOK_NAME": "TransforMate", "BLOCKED_USERS": "[]",
+                    "USER_REPORTS_CHANNEL_ID": "0", "MAX_REGEN_USERS": "100", "STORAGE_BACKEND": "json",
+                    "WRITE_BEHIND_INTERVAL": "0", "WATCHDOG_INTERVAL": "0"}.items():
+    os.environ[name] = value
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
@@ -0,0 +1,34 @@
+import utils
+
+
+def test_only_transformed_users_pass():
+    utils.write_transformed(4001, 701)
+    assert utils.maybe_transformed(701, 4001)
+    assert not utils.maybe_transformed(702, 4001)  # Never transformed
+    assert not utils.maybe_transformed(701, 4002)  # Transformed somewhere else
+    utils.remove_transformed(701, 4001)
+    assert not utils.maybe_transformed(701, 4001)
+    utils.write_transformed(4001, 701)
+    assert utils.maybe_transformed(701, 4001)
+
+
+def test_removed_servers_are_forgotten():
+    utils.write_transformed(4003, 703)
+    utils.remove_server_from_transformed(4003)
+    assert 4003 not in utils.active_users
+    assert not utils.maybe_transformed(703, 4003)
+
+
+def test_built_from_stored_data(monkeypatch):
+    utils.write_transformed(4004, 704)
+    utils.write_transformed(4004, 705)
+    utils.remove_transformed(705, 4004)
+    utils.flush()
+    monkeypatch.setattr(utils, "_transformed_cache", None)
+    monkeypatch.setattr(utils, "active_users", None)
+    # Until the server data is loaded, nobody can be rejected early
+    assert utils.maybe_transformed(704, 4004) and utils.maybe_transformed(706, 4004)
+    utils.load_transformed(4004)
+    assert utils.active_users[4004] == {704}
+    assert utils.maybe_transformed(704, 4004)
+    assert not utils.maybe_transformed(705, 4004) and not utils.maybe_transformed(706, 4004)
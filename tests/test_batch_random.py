@@ -0,0 +1,75 @@
+import random
+import re
+
+import pytest
+
+import utils
+from test_transform_text import profile
+
+ALL_MODIFIERS: dict = profile(prefix={"*purrs* ": 50}, suffix={" :3": 50}, sprinkle={"nya": 30}, muffle={"mmph": 30},
+                              stutter=50, censor={"hello": "meow"})
+
+
+@pytest.fixture(params=["numpy", "python"])
+def make_random(request, monkeypatch):
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(utils, "numpy", None)
+    return utils.BatchRandom
+
+
+def test_same_seed_same_output(make_random):
+    message = "hello there friend, how are you doing today? " * 5
+    first = utils.transform_text(ALL_MODIFIERS, message, rng=make_random(42))
+    assert utils.transform_text(ALL_MODIFIERS, message, rng=make_random(42)) == first
+    assert utils.transform_text(ALL_MODIFIERS, message, rng=make_random(43)) != first
+
+
+@pytest.mark.parametrize("message", ["", " ", "   ", "\n"])
+def test_empty_messages(make_random, message):
+    rng = make_random(1)
+    # Nothing to change, so nothing is changed
+    assert utils.transform_text(profile(muffle={"mmph": 0}, sprinkle={"nya": 0}), message, rng=rng) == message
+    for seed in range(50):
+        rng.seed(seed)
+        # Empty words can still be muffled (and then stuttered), or have things added around them, like in sequential
+        # mode, but nothing else can come out of them
+        transformed = re.sub(r"\b\w+-(?=\w)", "", utils.transform_text(ALL_MODIFIERS, message, rng=rng))
+        assert set(transformed.split()) <= {"*purrs*", ":3", "nya", "mmph"}
+
+
+def test_hits_shape(make_random):
+    rng = make_random(1)
+    assert rng.hits(0, [50, 50]) == []
+    assert rng.hits(3, []) == [[], [], []]
+    assert all(row == [] for row in rng.hits(50, [0, 0]))
+    assert all(sorted(column for column, _ in row) == [0, 1, 2] for row in rng.hits(50, [100, 100, 100]))
+
+
+def muffled_fraction(data: dict, rng, words: int) -> float:
+    return utils.transform_text(data, " ".join(["word"] * words), rng=rng).split(" ").count("mmph") / words
+
+
+def sprinkles_per_word(data: dict, rng, words: int) -> float:
+    return utils.transform_text(data, " ".join(["word"] * words), rng=rng).split(" ").count("nya") / words
+
+
+@pytest.mark.parametrize("chance", [10, 30, 75])
+def test_rates_match_the_chances(make_random, chance):
+    words = 20_000
+    muffle = profile(muffle={"mmph": chance})
+    sprinkle = profile(sprinkle={"nya": chance})
+    # Each sprinkle that hits goes before the word, and half the time after it too
+    expected_sprinkles = chance / 100 * 1.5
+    for rng in [make_random(7), random.Random(7)]:  # Batched, and sequential for comparison
+        assert muffled_fraction(muffle, rng, words) == pytest.approx(chance / 100, abs=0.015)
+        assert sprinkles_per_word(sprinkle, rng, words) == pytest.approx(expected_sprinkles, abs=0.03)
+
+
+def test_several_muffles_share_the_words(make_random):
+    # The last muffle applied wins, and they're applied in a random order, so both should win about as often
+    data = profile(muffle={"mmph": 100, "mrrf": 100})
+    words = utils.transform_text(data, " ".join(["word"] * 10_000), rng=make_random(3)).split(" ")
+    assert words.count("mmph") + words.count("mrrf") == 10_000
+    assert words.count("mmph") / 10_000 == pytest.approx(0.5, abs=0.02)
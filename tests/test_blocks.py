@@ -0,0 +1,36 @@
+import storage
+import utils
+
+
+def test_bulk_blocks_write_the_server_once():
+    utils.write_transformed(1001)
+    before = storage.io_counts.copy()
+    assert sorted(utils.block_server_channels(1001, [1, 2, 3], mode="add")) == ["1", "2", "3"]
+    assert (storage.io_counts - before)["write_transformed"] == 1
+    before = storage.io_counts.copy()
+    assert utils.block_server_users(1001, [4, 5], mode="toggle") == ["4", "5"]
+    assert (storage.io_counts - before)["write_transformed"] == 1
+
+
+def test_bulk_blocks_set_up_new_servers():
+    assert utils.block_server_channels(1002, [7], mode="add") == ["7"]
+    assert utils.load_transformed(1002)['blocked_channels'] == ["7"]
+    assert storage.load_file(f"{utils.storage.path}/guilds/1002.json")["1002"]['blocked_channels'] == ["7"]
+
+
+def test_block_modes():
+    assert utils.block_server_users(1003, [1, 2], mode="add") == ["1", "2"]
+    assert utils.block_server_users(1003, [2, 3], mode="toggle") == ["1", "3"]
+    assert utils.block_server_users(1003, [1], mode="remove") == ["3"]
+    assert utils.block_server_users(1003, [3, 3], mode="add") == ["3"]
+
+
+def test_users_without_data_in_the_server_cant_block_anything():
+    before = storage.io_counts.copy()
+    assert utils.block_channels(1201, 1004, [1, 2], mode="add") is None
+    assert utils.block_users(1201, 1004, [3], mode="toggle") is None
+    assert utils.load_tf(1201, 1004) == {}
+    utils.flush()
+    assert (storage.io_counts - before)["write_user"] == 0
+    utils.write_tf(1201, 1004, transformed_by=1, into="Kitty")
+    assert utils.block_channels(1201, 1004, [1, 2], mode="add") == ["1", "2"]
@@ -0,0 +1,57 @@
+import storage
+import utils
+
+
+def broken(*args, **kwargs):
+    raise OSError(28, "No space left on device")
+
+
+def also_broken(*args, **kwargs):
+    raise OSError(28, "No space left on device")
+
+
+def test_failed_writes_are_retried(monkeypatch):
+    with monkeypatch.context() as patch:
+        patch.setattr(utils.storage, "write_user", broken)
+        patch.setattr(utils.storage, "write_transformed", also_broken)
+        utils._store_user("500", {'version': 16, '2001': {'into': "Failed"}}, "2001")
+        utils.write_transformed(2001, 500)
+        assert "500" in utils._dirty_users
+        assert utils._dirty_transformed is None or "2001" in utils._dirty_transformed
+    assert utils.storage.load_user("500") == {}
+    assert utils.flush() == 2
+    assert utils._dirty_users == {}
+    assert utils.storage.load_user("500") == {'version': 16, '2001': {'into': "Failed"}}
+    assert "500" in utils.storage.load_transformed()["2001"]['transformed_users']
+
+
+def test_changes_made_after_a_failed_write_are_kept(monkeypatch):
+    with monkeypatch.context() as patch:
+        patch.setattr(utils.storage, "write_user", broken)
+        utils._store_user("501", {'version': 16, '2002': {'into': "First"}}, "2002")
+    utils._store_user("501", {'version': 16, '2002': {'into': "First"}, '2003': {'into': "Second"}}, "2003")
+    assert utils.storage.load_user("501") == {'version': 16, '2002': {'into': "First"}, '2003': {'into': "Second"}}
+
+
+def test_failed_removals_are_retried(monkeypatch):
+    utils._store_user("502", {'version': 16, '2004': {'into': "Gone"}})
+    assert utils.storage.load_user("502") != {}
+    with monkeypatch.context() as patch:
+        patch.setattr(utils.storage, "remove_user", broken)
+        utils._remove_user("502")
+        assert utils._dirty_users["502"] is utils.REMOVED
+    utils.flush()
+    assert utils.storage.load_user("502") == {}
+
+
+def test_failed_writes_leave_the_old_file(monkeypatch, tmp_path):
+    storage.write_file(str(tmp_path / "data.json"), {'old': True})
+    monkeypatch.setattr(storage.os, "fsync", broken)
+    try:
+        storage.write_file(str(tmp_path / "data.json"), {'new': True})
+    except OSError:
+        pass
+    else:
+        raise AssertionError("The error should have been raised")
+    assert storage.load_file(str(tmp_path / "data.json")) == {'old': True}
+    assert not (tmp_path / "data.json.tmp").exists()
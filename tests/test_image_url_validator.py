@@ -0,0 +1,156 @@
+import asyncio
+import contextlib
+
+from collections import Counter
+
+from aiohttp import web
+
+import utils
+
+
+@contextlib.asynccontextmanager
+async def serve(delay: float = 0.0):
+    """
+    Serves a few stand-in URLs on a random local port, counting how many times each one is requested.
+
+    :param delay: Seconds to wait before answering any request.
+
+    :return: The base URL of the server, and the request counts, keyed by path.
+    """
+    hits = Counter()
+
+    async def handle(request: web.Request) -> web.Response:
+        hits[request.path] += 1
+        await asyncio.sleep(float(request.query.get("delay", delay)))
+        if request.path == "/image.png":
+            return web.Response(content_type="image/png")
+        if request.path == "/page.html":
+            return web.Response(content_type="text/html")
+        return web.Response(status=404)
+
+    app = web.Application()
+    app.router.add_route("HEAD", "/{path}", handle)
+    runner = web.AppRunner(app, shutdown_timeout=0)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    try:
+        yield f"http://127.0.0.1:{runner.addresses[0][1]}", hits
+    finally:
+        await runner.cleanup()
+
+
+def run(coroutine_function, **kwargs):
+    # Runs a test against a fresh server and validator, closing both afterwards
+    async def main():
+        validator = utils.ImageURLValidator(**kwargs)
+        try:
+            async with serve() as (base, hits):
+                return await coroutine_function(validator, base, hits)
+        finally:
+            await validator.close()
+    return asyncio.run(main())
+
+
+def test_image():
+    async def check(validator, base, hits):
+        assert await validator.check(f"{base}/image.png") == f"{base}/image.png"
+    run(check)
+
+
+def test_not_an_image():
+    async def check(validator, base, hits):
+        assert await validator.check(f"{base}/page.html") == ""
+    run(check)
+
+
+def test_not_found():
+    async def check(validator, base, hits):
+        assert await validator.check(f"{base}/missing.png") == ""
+    run(check)
+
+
+def test_timeout():
+    async def check(validator, base, hits):
+        assert await validator.check(f"{base}/image.png?delay=1") == ""
+    run(check, timeout=0.2)
+
+
+def test_results_are_cached_until_they_expire():
+    async def check(validator, base, hits):
+        for _ in range(3):
+            assert await validator.check(f"{base}/image.png") == f"{base}/image.png"
+        assert hits["/image.png"] == 1
+        await asyncio.sleep(0.3)
+        assert await validator.check(f"{base}/image.png") == f"{base}/image.png"
+        assert hits["/image.png"] == 2
+    run(check, ttl=0.2)
+
+
+def test_failures_are_cached():
+    async def check(validator, base, hits):
+        for _ in range(3):
+            assert await validator.check(f"{base}/missing.png") == ""
+        assert hits["/missing.png"] == 1
+        await asyncio.sleep(0.3)
+        assert await validator.check(f"{base}/missing.png") == ""
+        assert hits["/missing.png"] == 2
+    run(check, failure_ttl=0.2)
+
+
+def test_concurrent_checks_are_coalesced():
+    async def check(validator, base, hits):
+        results = await asyncio.gather(*[validator.check(f"{base}/image.png?delay=0.2") for _ in range(5)])
+        assert results == [f"{base}/image.png?delay=0.2"] * 5
+        assert hits["/image.png"] == 1
+    run(check)
+
+
+def test_errors_reach_coalesced_checks():
+    async def check(validator, base, hits):
+        async def broken(url: str) -> str:
+            await asyncio.sleep(0.1)
+            raise RuntimeError("broken")
+        validator._check = broken
+        results = await asyncio.gather(*[validator.check(f"{base}/image.png") for _ in range(3)],
+                                       return_exceptions=True)
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert validator._pending == {}
+    run(check)
+
+
+def test_only_unreachable_urls_are_retried_over_http():
+    async def check(validator, base, hits):
+        requested = []
+
+        async def content_type(url: str) -> str | None:
+            requested.append(url)
+            return {"https://example.com/page.html": "text/html",
+                    "http://example.com/image.png": "image/png"}.get(url)
+        validator._content_type = content_type
+        assert await validator.check("example.com/page.html") == ""
+        assert requested == ["https://example.com/page.html"]
+        assert await validator.check("example.com/image.png") == "http://example.com/image.png"
+        assert requested[1:] == ["https://example.com/image.png", "http://example.com/image.png"]
+    run(check)
+
+
+def test_cancelling_one_check_doesnt_cancel_the_others():
+    async def check(validator, base, hits):
+        url = f"{base}/image.png?delay=0.2"
+        first = asyncio.create_task(validator.check(url))
+        await asyncio.sleep(0.05)
+        others = [asyncio.create_task(validator.check(url)) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        first.cancel()
+        assert await asyncio.gather(*others) == [url] * 3
+        assert first.cancelled()
+        assert hits["/image.png"] == 1
+
+        # Even if everyone waiting gives up, the result is still remembered for next time
+        lonely = asyncio.create_task(validator.check(f"{base}/image.png?delay=0.1"))
+        await asyncio.sleep(0.05)
+        lonely.cancel()
+        await asyncio.sleep(0.2)
+        assert await validator.check(f"{base}/image.png?delay=0.1") == f"{base}/image.png?delay=0.1"
+        assert hits["/image.png"] == 2
+    run(check)
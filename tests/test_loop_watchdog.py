@@ -0,0 +1,25 @@
+import asyncio
+import time
+
+from loop_watchdog import LoopWatchdog
+
+
+def block_the_loop() -> None:
+    time.sleep(0.5)
+
+
+def test_blocking_calls_are_caught():
+    async def main():
+        watchdog = LoopWatchdog(interval=0.05, threshold=0.2)
+        watchdog.start()
+        await asyncio.sleep(0.2)
+        block_the_loop()
+        await asyncio.sleep(0.2)
+        watchdog._task.cancel()
+        return watchdog
+    watchdog = asyncio.run(main())
+    assert watchdog.blocks == 1
+    assert watchdog.stats()['lag_max'] >= 0.4
+    [site] = watchdog.top_sites()
+    assert site.name == "test_loop_watchdog.block_the_loop"
+    assert site.count == 1 and site.stack
@@ -0,0 +1,48 @@
+import asyncio
+
+from types import SimpleNamespace
+
+import utils
+
+ids = iter(range(900_000, 1_000_000))
+
+
+def transform(user_id: int, guild_id: int, name: str) -> None:
+    utils._store_user(str(user_id), {'version': 16, str(guild_id): {'into': name}}, str(guild_id))
+    utils.write_transformed(guild_id, user_id)
+
+
+def message(guild_id: int, name: str) -> SimpleNamespace:
+    return SimpleNamespace(id=next(ids), guild=guild_id, author=SimpleNamespace(display_name=name))
+
+
+def test_removed_users_leave_the_index():
+    async def main():
+        transform(601, 3001, "Kitty")
+        transform(602, 3001, "Kitty")
+        assert sorted((await utils.get_name_index(3001)).get("Kitty")) == ["601", "602"]
+        utils.remove_transformed(601, 3001)
+        assert utils.name_indexes["3001"].get("Kitty") == ["602"]
+        assert [user_id for user_id, _ in await utils.check_message(message(3001, "Kitty"))] == [602]
+        utils.write_transformed(3001, 601)  # Transformed again
+        assert sorted((await utils.get_name_index(3001)).get("Kitty")) == ["601", "602"]
+    asyncio.run(main())
+
+
+def test_renamed_users_move_in_the_index():
+    async def main():
+        transform(603, 3002, "Puppy")
+        assert (await utils.get_name_index(3002)).get("Puppy") == ["603"]
+        transform(603, 3002, "Bunny")
+        assert utils.name_indexes["3002"].get("Puppy") == []
+        assert [user_id for user_id, _ in await utils.check_message(message(3002, "Bunny"))] == [603]
+    asyncio.run(main())
+
+
+def test_the_index_skips_removed_users_when_built():
+    async def main():
+        transform(604, 3003, "Fox")
+        utils.remove_transformed(604, 3003)
+        utils.name_indexes.pop("3003", None)
+        assert (await utils.get_name_index(3003)).get("Fox") == []
+    asyncio.run(main())
@@ -0,0 +1,122 @@
+import random
+import re
+
+import pytest
+
+import utils
+from test_transform_text import profile
+
+
+def reference_censor(censors: dict, message: str) -> str:
+    """
+    The censors, applied the straightforward way: every pattern and every censor, for every word, with nothing compiled
+    ahead of time. This is how transform_text() used to do it.
+    """
+    words = message.split(" ")
+    for pattern in censors:
+        try:
+            if pattern.startswith("-/") and re.search(pattern[2:], " ".join(words)):
+                words = re.sub(pattern[2:], censors[pattern], " ".join(words)).split(" ")
+        except Exception as e:
+            return f"```REGEX ERROR with pattern \"{pattern[2:]}\":\n{e}```"
+
+    for i in range(len(words)):
+        word = ''.join(e for e in words[i] if e.isalnum())
+        for censor in censors:
+            if word.casefold() == censor.casefold():
+                words[i] = words[i].replace(word, censors[censor])
+        if words[i] in censors:
+            words[i] = censors[words[i]]
+        for pattern in censors:
+            try:
+                if pattern.startswith("/") and re.search(pattern[1:], words[i]):
+                    words[i] = re.sub(pattern[1:], censors[pattern], words[i])
+            except Exception as e:
+                return f"```REGEX ERROR with pattern \"{pattern[1:]}\":\n{e}```"
+    return " ".join(words)
+
+
+MESSAGES: list[str] = [
+    "Hello there friend, sorry for the wait!",
+    "HELLO hello HeLLo hello!! (hello) hello... hellos",
+    "good morning, good night, goodgood good",
+    "I'm sorry Sorry SORRY sorry?",
+    "cat catalog category cats <@123456789012345678> http://example.com/cat.png",
+    "",
+    "   ",
+    "a  b   c"
+]
+
+CENSORS: dict[str, dict] = {
+    'literal': {"hello": "meow", "friend": "fren", "cat": "dog", "hello!!": "mrrp"},
+    'regex': {"/[Ss]orry": "sowwy", "/^cat": "dog", "-/good (\\w+)": "great \\1", "-/ +": " "},
+    'uncombinable': {"/(o)\\1": "00", "/(?i)HELLO": "hi", "-/(?P<word>good) (?P=word)": "twice"},
+    'overlapping': {"hello": "hi", "/hel+o": "HELLO", "-/hello": "hey", "HELLO": "bye", "hi": "yo",
+                    "/^h": "H", "-/o": "0"},
+    'invalid_word': {"hello": "meow", "/[unclosed": "x", "/(": "y"},
+    'invalid_line': {"-/(?<": "x", "/[unclosed": "y"}
+}
+
+
+@pytest.mark.parametrize("name", CENSORS)
+@pytest.mark.parametrize("message", MESSAGES)
+def test_compiled_censors_match_reference(name, message):
+    data = profile(censor=CENSORS[name])
+    expected = reference_censor(CENSORS[name], message)
+    assert utils.transform_text(data, message, batched=False, rng=random.Random(1)) == expected
+    # Without the combined filters, every pattern is tried one by one, which must give the same result
+    plan = utils.compile_profile(data)._replace(censor_line_filter=None, censor_word_filter=None)
+    assert utils.transform_text(plan, message, batched=False, rng=random.Random(1)) == expected
+
+
+def test_invalid_patterns_are_reported():
+    plan = utils.compile_profile(profile(censor=CENSORS['invalid_word']))
+    assert plan.censor_error.startswith("```REGEX ERROR with pattern \"[unclosed\"")
+    assert plan.censor_word_patterns == ()  # Only the valid patterns are kept
+    assert utils.compile_profile(profile(censor=CENSORS['invalid_line'])).censor_error.startswith(
+        "```REGEX ERROR with pattern \"(?<\"")
+
+
+def test_patterns_that_cant_be_combined_arent():
+    plan = utils.compile_profile(profile(censor=CENSORS['uncombinable']))
+    assert plan.censor_word_filter is None
+    assert utils.compile_profile(profile(censor=CENSORS['regex'])).censor_word_filter is not None
+
+
+def test_plans_are_compiled_again_after_edits():
+    user_id, guild_id = 1101, 6001
+    utils.write_tf(user_id, guild_id, transformed_by=1, into="Kitty")
+    utils.write_transformed(guild_id, user_id)
+    plan = utils.get_profile_plan(user_id, guild_id)
+    assert plan is utils.get_profile_plan(user_id, guild_id)  # Cached while nothing changes
+    assert utils.transform_text(plan, "hello there", rng=random.Random(1)) == "hello there"
+
+    utils.write_tf(user_id, guild_id, censor="hello", censor_replacement="meow")
+    new_plan = utils.get_profile_plan(user_id, guild_id)
+    assert new_plan is not plan
+    assert utils.transform_text(new_plan, "hello there", rng=random.Random(1)) == "meow there"
+
+    utils.write_tf(user_id, guild_id, censor="$/-hello")
+    assert utils.transform_text(utils.get_profile_plan(user_id, guild_id), "hello there",
+                                rng=random.Random(1)) == "hello there"
+
+
+PUNCTUATION_CENSORS: dict = {"word": "thing", "don't": "do not", "dont": "do", "wait...": "hold on", "o.k.": "okay",
+                             "ok": "fine"}
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("word!", "thing!"),
+    ("(word)", "(thing)"),
+    ("word...", "thing..."),
+    ("...word...", "...thing..."),
+    ("WORD?!", "thing?!"),  # Matched ignoring case, but punctuation is kept
+    ("words sword", "words sword"),  # Only whole words
+    ("don't", "do not"),  # Censors with punctuation replace the entire word
+    ("dont!", "do!"),
+    ("wait... wait", "hold on wait"),
+    ("o.k. ok. ok", "okay fine. fine")
+])
+def test_censors_keep_punctuation(message, expected):
+    assert utils.transform_text(profile(censor=PUNCTUATION_CENSORS), message, rng=random.Random(1)) == expected
+    assert reference_censor(PUNCTUATION_CENSORS, message) == expected
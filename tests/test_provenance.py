@@ -0,0 +1,124 @@
+import time
+
+import utils
+from provenance import Provenance, ProvenanceStore
+
+
+def record(message_id: int, guild_id: int = 1, author_id: int = 10, age: float = 0) -> Provenance:
+    return Provenance(message_id, 99, 5, guild_id, author_id, time.time() - age, {'into': "Kitty"})
+
+
+def store(tmp_path, **kwargs) -> ProvenanceStore:
+    return ProvenanceStore(str(tmp_path / "provenance.log"), **{'capacity': 100, 'retention': 3600} | kwargs)
+
+
+def test_records_survive_a_restart(tmp_path):
+    old = store(tmp_path)
+    for message_id in range(5):
+        old.add(record(message_id))
+    old.append(old.take_pending())
+    new = store(tmp_path)
+    new.load(new.compact())
+    assert [r.message_id for r in new.records.values()] == list(range(5))
+    assert new.get(3) == old.get(3)
+
+
+def test_compact_drops_old_and_broken_records(tmp_path):
+    log = store(tmp_path)
+    log.append([record(1, age=7200), record(2), record(3, age=7200), record(4)])
+    with open(log.path, "a") as f:
+        f.write('{"message_id": 5, "webhook_id"')  # Cut short by a crash
+    assert [r.message_id for r in log.compact()] == [2, 4]
+    assert [r.message_id for r in store(tmp_path).compact()] == [2, 4]  # Rewritten without them
+
+
+def test_log_is_compacted_once_it_grows(tmp_path):
+    log = store(tmp_path, capacity=3)
+    for message_id in range(10):
+        log.append([record(message_id, age=7200 if message_id < 5 else 0)])
+    with open(log.path) as f:
+        assert len(f.readlines()) < 10
+
+
+def test_load_keeps_newer_records_and_the_capacity(tmp_path):
+    log = store(tmp_path, capacity=3)
+    log.append([record(message_id) for message_id in range(5)])
+    log.add(record(100))
+    log.load(log.compact())
+    assert list(log.records) == [3, 4, 100]
+    assert log.loaded
+
+
+def test_forgotten_records_leave_memory_and_the_log(tmp_path):
+    log = store(tmp_path)
+    for message_id, guild_id, author_id in [(1, 1, 10), (2, 1, 11), (3, 2, 10), (4, 2, 11)]:
+        log.add(record(message_id, guild_id, author_id))
+    log.append(log.take_pending())
+    log.add(record(5, 1, 10))
+    log.forget(guild_id=1, author_id=10)
+    assert sorted(log.records) == [2, 3, 4]
+    assert [r.message_id for r in log.pending] == []
+    log.forget(guild_id=2)
+    log.append(log.take_pending())
+    assert log.forgotten == {}
+    assert [r.message_id for r in store(tmp_path).compact()] == [2]
+
+
+def test_records_forgotten_while_loading_stay_forgotten(tmp_path):
+    log = store(tmp_path)
+    log.append([record(1, author_id=10), record(2, author_id=11)])
+    records = log.compact()
+    log.forget(author_id=10)  # While the log was being read
+    log.load(records)
+    assert list(log.records) == [2]
+
+
+def test_index_follows_the_records(tmp_path):
+    log = store(tmp_path, capacity=3)
+    for message_id in range(5):
+        log.add(record(message_id, guild_id=message_id % 2, author_id=10))
+    assert log.index == {0: {10: {2, 4}}, 1: {10: {3}}}  # The oldest ones were dropped
+    log.forget(guild_id=0, author_id=10)
+    assert log.index == {1: {10: {3}}} and list(log.records) == [3]
+    log.load([record(7, guild_id=2, author_id=11)])
+    assert log.index == {1: {10: {3}}, 2: {11: {7}}}
+
+
+def test_wider_rules_replace_narrower_ones(tmp_path):
+    log = store(tmp_path)
+    for author_id in range(100):
+        log.add(record(author_id, guild_id=1, author_id=author_id))
+        log.forget(guild_id=1, author_id=author_id)
+    assert len(log.forgotten) == 100
+    log.forget(guild_id=1)
+    assert list(log.forgotten) == [(1, None)]
+    log.forget(guild_id=1, author_id=5)  # Already covered
+    log.forget(guild_id=2, author_id=5)
+    log.forget(author_id=5)
+    assert sorted(log.forgotten, key=str) == [(1, None), (None, 5)]
+    assert log.records == {} and log.index == {}
+
+
+def test_rules_added_again_while_compacting_are_kept(tmp_path):
+    log = store(tmp_path)
+    log.append([record(1, author_id=10)])
+    log.forget(author_id=10)
+    applied = dict(log.forgotten)
+    log.forget(author_id=10)  # Again, as if it happened while the log was being compacted
+    log._drop_rules(applied)
+    assert list(log.forgotten) == [(None, 10)]
+    log.compact()
+    assert log.forgotten == {}
+
+
+def test_removing_data_forgets_its_records():
+    store = utils.provenance_store
+    store.add(record(1001, guild_id=7001, author_id=701))
+    store.add(record(1002, guild_id=7001, author_id=702))
+    store.add(record(1003, guild_id=7002, author_id=702))
+    utils.flush()
+    utils.remove_all_tf(701)
+    utils.write_transformed(7002)
+    utils.remove_server_from_transformed(7002)
+    assert store.get(1001) is None and store.get(1003) is None and store.get(1002) is not None
+    assert [r.message_id for r in store.compact() if r.message_id > 1000] == [1002]
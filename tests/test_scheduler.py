@@ -0,0 +1,88 @@
+import asyncio
+import time
+
+import discord
+
+from scheduler import OutboundScheduler
+
+
+class FakeResponse:
+    def __init__(self, status: int, headers: dict | None = None) -> None:
+        self.status = status
+        self.reason = "Too Many Requests"
+        self.headers = headers or {}
+
+
+def job(log: list, name: str, duration: float = 0.0, error: Exception | None = None):
+    async def function():
+        log.append(name)
+        await asyncio.sleep(duration)
+        if error is not None:
+            raise error
+        return name
+    return function
+
+
+def test_servers_take_turns():
+    async def main():
+        scheduler = OutboundScheduler(send_rate=1000, burst=1000)
+        log = []
+        futures = [scheduler.submit(1, ("busy", i), ("send", 10), job(log, f"busy{i}")) for i in range(10)]
+        futures += [scheduler.submit(2, ("quiet", i), ("send", 20), job(log, f"quiet{i}")) for i in range(2)]
+        await asyncio.gather(*futures)
+        return log
+    log = asyncio.run(main())
+    # The quiet server doesn't have to wait for the whole burst of the busy one
+    assert log.index("quiet0") <= 2 and log.index("quiet1") <= 4
+
+
+def test_jobs_with_the_same_key_run_in_order():
+    async def main():
+        scheduler = OutboundScheduler(send_rate=1000, burst=1000)
+        log = []
+        futures = [scheduler.submit(1, "author", ("send", 10), job(log, f"m{i}", duration=0.03 if i % 2 else 0))
+                   for i in range(6)]
+        futures.append(scheduler.submit(1, "other", ("send", 10), job(log, "other")))
+        assert await asyncio.gather(*futures) == [f"m{i}" for i in range(6)] + ["other"]
+        return log
+    log = asyncio.run(main())
+    assert [name for name in log if name != "other"] == [f"m{i}" for i in range(6)]
+    assert log.index("other") < 5  # Other keys don't wait for it
+
+
+def test_routes_are_rate_limited():
+    async def main():
+        scheduler = OutboundScheduler(send_rate=20, burst=1)
+        log = []
+        start = time.monotonic()
+        await asyncio.gather(*[scheduler.submit(1, i, ("send", 10), job(log, str(i))) for i in range(5)])
+        return time.monotonic() - start
+    assert asyncio.run(main()) >= 0.18  # Four waits of 1/20 seconds, after the first one
+
+
+def test_rate_limited_jobs_are_retried():
+    async def main():
+        scheduler = OutboundScheduler(send_rate=1000, burst=1000)
+        attempts = []
+
+        async def function():
+            attempts.append(time.monotonic())
+            if len(attempts) == 1:
+                raise discord.HTTPException(FakeResponse(429, {'Retry-After': "0.1"}), "Slow down")
+            return "sent"
+        assert await scheduler.submit(1, "author", ("send", 10), function) == "sent"
+        return attempts
+    attempts = asyncio.run(main())
+    assert len(attempts) == 2 and attempts[1] - attempts[0] >= 0.09
+
+
+def test_jobs_after_a_failed_one_are_skipped():
+    async def main():
+        scheduler = OutboundScheduler(send_rate=1000, burst=1000)
+        log = []
+        send = scheduler.submit(1, "author", ("send", 10), job(log, "send", error=RuntimeError("broken")))
+        delete = scheduler.submit(1, "author", ("delete", 10), job(log, "delete"), after=send)
+        await asyncio.gather(send, delete, return_exceptions=True)
+        assert delete.cancelled() and log == ["send"]
+        assert scheduler.stats()['failures'] == 1
+    asyncio.run(main())
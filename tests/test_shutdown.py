@@ -0,0 +1,32 @@
+import asyncio
+import json
+
+import discord
+
+import utils
+
+
+def test_pending_changes_are_written_on_close(monkeypatch):
+    loop = asyncio.new_event_loop()  # The bot needs one to be set up
+    asyncio.set_event_loop(loop)
+    import main  # Only imported here, since it sets up the whole bot
+
+    closed = []
+
+    async def close(self) -> None:
+        closed.append(self)
+    monkeypatch.setattr(discord.Bot, "close", close)
+    monkeypatch.setattr(utils, "WRITE_BEHIND_INTERVAL", 5)  # So changes wait for the next flush
+
+    async def main_():
+        utils._store_user("1301", {'version': 16, '8001': {'into': "Kitty"}}, "8001")
+        assert "1301" in utils._dirty_users
+        await main.bot.close()
+    try:
+        loop.run_until_complete(main_())
+    finally:
+        loop.close()
+        asyncio.set_event_loop(None)
+    assert closed == [main.bot] and "1301" not in utils._dirty_users
+    with open(f"{utils.storage.path}/people/1301.json") as f:
+        assert json.load(f) == {'version': 16, '8001': {'into': "Kitty"}}
@@ -0,0 +1,95 @@
+import copy
+
+import storage
+
+
+def profile(name: str, **fields) -> dict:
+    return {
+        'blocked_channels': ["11"],
+        'blocked_users': ["12", "13"],
+        'transformed_by': 123456789012345678,
+        'into': name,
+        'image_url': "https://example.com/cat.png",
+        'claim': 0,
+        'eternal': False,
+        'prefix': {"nya~ ": 50},
+        'suffix': {},
+        'big': True,
+        'small': False,
+        'hush': False,
+        'backwards': False,
+        'censor': {"hello": "meow"},
+        'sprinkle': {"purr": 10},
+        'muffle': {},
+        'alt_muffle': {"*meows*": 5},
+        'stutter': 20,
+        'bio': "A very good cat"
+    } | fields
+
+
+def server(**fields) -> dict:
+    return {
+        'blocked_users': ["21"],
+        'blocked_channels': ["22", "23"],
+        'logs': [31, None, 33, None],
+        'clear_other_logs': True,
+        'transformed_users': {"1": True, "2": False},
+        'images': 34
+    } | fields
+
+
+def import_users(tmp_path, users: dict, transformed: dict) -> storage.SQLiteStorage:
+    source = storage.JSONStorage(str(tmp_path / "json"))
+    for user_id, data in users.items():
+        source.write_user(user_id, data)
+    source.write_transformed(transformed)
+    target = storage.SQLiteStorage(str(tmp_path / "transformate.db"))
+    assert storage.import_json_cache(source, target) == len(users)
+    return target
+
+
+def test_json_to_sqlite_round_trip(tmp_path):
+    users = {
+        "1": {'version': 16, "100": profile("Kitty"), "200": profile("Puppy", eternal=True, claim=2)},
+        "2": {'version': 16, "100": profile("Fox", index=3, notes={"favourite": "cheese"})}
+    }
+    transformed = {'version': 10, "100": server(), "200": server(webhook_names=["TransforMate"])}
+    target = import_users(tmp_path, copy.deepcopy(users), copy.deepcopy(transformed))
+    for user_id, data in users.items():
+        assert target.load_user(user_id) == data
+    assert target.load_transformed() == transformed
+
+
+def test_single_server_writes_keep_unknown_fields(tmp_path):
+    target = storage.SQLiteStorage(str(tmp_path / "transformate.db"))
+    target.write_user("1", {'version': 16, "100": profile("Kitty", index=1), "200": profile("Puppy", index=2)})
+    target.write_user("1", {'version': 16, "100": profile("Kitty", index=5), "200": profile("Puppy", index=2)}, "100")
+    data = target.load_user("1")
+    assert data["100"]['index'] == 5 and data["200"]['index'] == 2
+
+
+def test_old_data_is_migrated_on_import(tmp_path):
+    old_profile = profile("Kitty", proxy_prefix="k:", proxy_suffix="") | {
+        modifier: {'active': True, 'contents': contents}
+        for modifier, contents in [('prefix', {"nya~ ": 50}), ('suffix', {}), ('censor', {"hello": "meow"}),
+                                   ('sprinkle', {"purr": 10}), ('muffle', {})]
+    }
+    del old_profile['blocked_channels'], old_profile['blocked_users']
+    users = {"1": {'version': 15, "100": {'all': old_profile, "555": profile("Channel only"),
+                                          'blocked_channels': ["11"], 'blocked_users': ["12", "13"]}}}
+    transformed = {'version': 9, "100": server(transformed_users={"1": [555], "2": []})}
+    target = import_users(tmp_path, users, transformed)
+    assert target.load_user("1") == {'version': 16, "100": profile("Kitty")}
+    assert target.load_transformed() == {'version': 10, "100": server(transformed_users={"1": True})}
+
+
+def test_old_databases_get_the_extra_column(tmp_path):
+    path = str(tmp_path / "transformate.db")
+    old = storage.SQLiteStorage(path)
+    for table in ['profiles', 'guilds']:
+        old.db.execute(f"ALTER TABLE {table} DROP COLUMN extra")
+    old.db.commit()
+    old.db.close()
+    target = storage.SQLiteStorage(path)
+    target.write_user("1", {'version': 16, "100": profile("Kitty", index=1)})
+    assert target.load_user("1")["100"]['index'] == 1
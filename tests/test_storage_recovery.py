@@ -0,0 +1,113 @@
+import asyncio
+import hashlib
+import json
+import os
+
+import pytest
+
+import storage
+import utils
+
+
+@pytest.fixture
+def checksums(monkeypatch):
+    monkeypatch.setattr(storage, "STORAGE_CHECKSUMS", True)
+    monkeypatch.setattr(storage, "_checksums", {})
+
+
+def sha256(contents: bytes) -> str:
+    return hashlib.sha256(contents).hexdigest()
+
+
+def test_sidecar_holds_the_new_and_old_checksums(tmp_path, checksums):
+    filename = str(tmp_path / "data.json")
+    storage.write_file(filename, {'a': 1})
+    storage.write_file(filename, {'a': 2})
+    with open(f"{filename}.sha256") as f:
+        assert f.read().split() == [sha256(b'{"a": 2}'), sha256(b'{"a": 1}')]
+    assert storage.load_file(filename) == {'a': 2}
+    assert not os.path.exists(f"{filename}.tmp")
+
+
+def test_crash_between_sidecar_and_data_still_loads(tmp_path, checksums, monkeypatch):
+    filename = str(tmp_path / "data.json")
+    storage.write_file(filename, {'a': 1})
+    replace = storage._replace
+
+    def crash(target: str, contents: bytes) -> None:
+        if not target.endswith(".sha256"):
+            raise OSError("Power went out")
+        replace(target, contents)
+    monkeypatch.setattr(storage, "_replace", crash)
+    with pytest.raises(OSError):
+        storage.write_file(filename, {'a': 2})
+    monkeypatch.setattr(storage, "_checksums", {})  # As if the bot restarted
+    assert storage.load_file(filename) == {'a': 1}
+
+
+@pytest.mark.parametrize("use_checksums", [False, True])
+def test_scan_quarantines_broken_files(tmp_path, monkeypatch, use_checksums):
+    monkeypatch.setattr(storage, "STORAGE_CHECKSUMS", use_checksums)
+    monkeypatch.setattr(storage, "_checksums", {})
+    json_storage = storage.JSONStorage(str(tmp_path))
+    for user_id in ["1", "2", "3"]:
+        json_storage.write_user(user_id, {'version': 16, 'name': "x" * 20})
+    with open(tmp_path / "people" / "1.json", "r+b") as f:  # Truncated
+        f.truncate(10)
+    with open(tmp_path / "people" / "2.json", "r+b") as f:  # A single flipped bit, still valid JSON
+        contents = bytearray(f.read())
+        contents[-5] ^= 1
+        f.seek(0)
+        f.write(contents)
+    (tmp_path / "people" / "4.json.tmp").write_bytes(b"{\"half")  # Left behind by a crash
+
+    quarantined = json_storage.scan()
+    # Without checksums, the flipped bit can't be noticed
+    expected = ["1", "2"] if use_checksums else ["1"]
+    assert sorted(os.path.basename(path)[:-5] for path in quarantined) == expected
+    assert sorted(json_storage.list_users()) == sorted({"1", "2", "3"} - set(expected))
+    assert not os.path.exists(tmp_path / "people" / "4.json.tmp")
+    assert len([file for file in os.listdir(tmp_path / "quarantine") if not file.endswith(".sha256")]) == len(expected)
+    assert json_storage.load_user("3") == {'version': 16, 'name': "x" * 20}
+
+
+def test_broken_files_are_quarantined_when_loaded(tmp_path, checksums):
+    json_storage = storage.JSONStorage(str(tmp_path))
+    json_storage.write_user("1", {'version': 16})
+    (tmp_path / "people" / "1.json").write_bytes(b'{"version": 17}')
+    assert json_storage.load_user("1") == {}
+    assert not os.path.exists(tmp_path / "people" / "1.json")
+    assert not os.path.exists(tmp_path / "people" / "1.json.sha256")
+    assert len(os.listdir(tmp_path / "quarantine")) == 2  # The file and its checksum
+
+
+def test_scan_doesnt_parse_files_without_checksums(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "STORAGE_CHECKSUMS", False)
+    json_storage = storage.JSONStorage(str(tmp_path))
+    for user_id in range(20):
+        json_storage.write_user(str(user_id), {'version': 16, 'bio': "x" * 1000})
+    (tmp_path / "people" / "blank.json").write_bytes(b"  \n")  # Loads as no data at all
+    loads = storage.io_counts['load_file']
+    assert json_storage.scan() == []
+    assert storage.io_counts['load_file'] == loads
+
+
+def test_scan_writes_cached_users_back(monkeypatch):
+    monkeypatch.setattr(utils, "_storage_scanned", False)
+
+    async def main():
+        utils._store_user("801", {'version': 16, '5001': {'into': "Kitty"}}, "5001")
+        await utils.flush_async()
+        filename = f"{utils.storage.path}/people/801.json"
+        with open(filename, "w") as f:
+            f.write("{\"version\": 1")
+        assert filename in await utils.scan_storage()
+        await utils.flush_async()
+        with open(filename) as f:
+            assert json.load(f) == {'version': 16, '5001': {'into': "Kitty"}}
+        # on_ready() runs again on every reconnect, but the storage is only scanned once
+        with open(filename, "w") as f:
+            f.write("{\"version\": 1")
+        assert await utils.scan_storage() == []
+        assert os.path.exists(filename)
+    asyncio.run(main())
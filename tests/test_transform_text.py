@@ -0,0 +1,103 @@
+import random
+
+import pytest
+
+import utils
+
+MESSAGE = ("Hello there friend, sorry for the wait! It was a good day <@123456789012345678> "
+           "http://example.com/cat.png")
+
+
+def profile(**fields) -> dict:
+    return {
+        'blocked_channels': [],
+        'blocked_users': [],
+        'transformed_by': 1,
+        'into': "Kitty",
+        'image_url': "",
+        'claim': 0,
+        'eternal': False,
+        'prefix': {},
+        'suffix': {},
+        'big': False,
+        'small': False,
+        'hush': False,
+        'backwards': False,
+        'censor': {},
+        'sprinkle': {},
+        'muffle': {},
+        'alt_muffle': {},
+        'stutter': 0,
+        'bio': None
+    } | fields
+
+
+PROFILES: dict[str, dict] = {
+    'prefix_suffix': profile(prefix={"*purrs* ": 50, "Meow, ": 50}, suffix={" :3": 50, " nya~": 50}),
+    'censor': profile(censor={"hello": "meow", "friend": "fren", "/[Ss]orry": "sowwy", "-/good (\\w+)": "great \\1"}),
+    'sprinkle': profile(sprinkle={"uwu": 30, "nya": 20}),
+    'muffle': profile(muffle={"mmph": 30, "mrrf": 20}),
+    'alt_muffle': profile(alt_muffle={"*meows*": 30}),
+    'stutter': profile(stutter=60),
+    'small_backwards': profile(small=True, backwards=True),
+    'big_hush': profile(big=True, hush=True)
+}
+
+# What each profile turns MESSAGE into, in sequential mode, for a few seeds. These are the same outputs the original,
+# uncompiled transform_text() gave with the global random module seeded the same way, so they must never change.
+GOLDEN: list[tuple[str, int, str]] = [
+    ('prefix_suffix', 1, "Hello there friend, sorry for the wait! It was a good day <@123456789012345678> "
+                         "http://example.com/cat.png nya~ :3"),
+    ('prefix_suffix', 2, "*purrs* Meow, Hello there friend, sorry for the wait! It was a good day "
+                         "<@123456789012345678> http://example.com/cat.png"),
+    ('prefix_suffix', 3, "*purrs* Hello there friend, sorry for the wait! It was a good day <@123456789012345678> "
+                         "http://example.com/cat.png nya~"),
+    ('censor', 1, "meow there fren, sowwy for the wait! It was a great day <@123456789012345678> "
+                  "http://example.com/cat.png"),
+    ('sprinkle', 1, "Hello uwu there uwu nya friend, nya sorry uwu for nya the nya wait! It was a good day nya "
+                    "<@123456789012345678> http://example.com/cat.png"),
+    ('sprinkle', 2, "uwu nya Hello nya uwu there uwu friend, sorry for the wait! uwu It uwu nya was a good day uwu "
+                    "<@123456789012345678> http://example.com/cat.png"),
+    ('sprinkle', 3, "uwu Hello uwu there uwu uwu friend, sorry uwu for the nya uwu wait! It was a uwu good uwu uwu day "
+                    "<@123456789012345678> http://example.com/cat.png"),
+    ('muffle', 1, "Hello there friend, mmph for mmph mmph mrrf was a good day <@123456789012345678> "
+                  "http://example.com/cat.png"),
+    ('muffle', 2, "mrrf there mmph mmph for the wait! It was mmph mmph day <@123456789012345678> "
+                  "http://example.com/cat.png"),
+    ('muffle', 3, "mmph mrrf friend, mrrf for the wait! mrrf mmph a good day mmph http://example.com/cat.png"),
+    ('alt_muffle', 1, "*meows*"),
+    ('alt_muffle', 2, MESSAGE),
+    ('stutter', 1, "H-Hello th-there friend, sorry f-for the wait! I-It was a-a good d-day <@123456789012345678> "
+                   "http://example.com/cat.png"),
+    ('stutter', 2, "Hello there friend, s-sorry f-for the wait! It w-was a g-good day <@123456789012345678> "
+                   "http://example.com/cat.png"),
+    ('stutter', 3, "H-Hello th-there friend, sorry f-for the wait! I-It w-was a-a g-good d-day <@123456789012345678> "
+                   "http://example.com/cat.png"),
+    ('small_backwards', 1, "-# ᵍⁿᵖ·ᵗᵃᶜ/ᵐᵒᶜ·ᵉˡᵖᵐᵃˣᵉ//:ᵖᵗᵗʰ <@123456789012345678> ʸᵃᵈ ᵈᵒᵒᵍ ᵃ ˢᵃʷ ᵗⁱ !ᵗⁱᵃʷ ᵉʰᵗ ʳᵒᶠ ʸʳʳᵒˢ "
+                           "ʾᵈⁿᵉⁱʳᶠ ᵉʳᵉʰᵗ ᵒˡˡᵉʰ"),
+    ('big_hush', 1, "||# Hello there friend, sorry for the wait! It was a good day <@123456789012345678> "
+                    "http://example.com/cat.png||")
+]
+
+
+@pytest.mark.parametrize("name, seed, expected", GOLDEN)
+def test_golden_outputs(name, seed, expected):
+    assert utils.transform_text(PROFILES[name], MESSAGE, batched=False, rng=random.Random(seed)) == expected
+    # A compiled plan gives the same result as the raw data
+    plan = utils.compile_profile(PROFILES[name])
+    assert utils.transform_text(plan, MESSAGE, batched=False, rng=random.Random(seed)) == expected
+
+
+@pytest.mark.parametrize("batched", [False, True])
+def test_default_generators_can_be_replayed(batched):
+    plan = utils.compile_profile(PROFILES['sprinkle'] | {'muffle': {"mmph": 30}, 'stutter': 40})
+    utils.seed_transform_random(1234)
+    first = [utils.transform_text(plan, MESSAGE, batched=batched) for _ in range(5)]
+    utils.seed_transform_random(1234)
+    assert [utils.transform_text(plan, MESSAGE, batched=batched) for _ in range(5)] == first
+    assert len(set(first)) > 1  # Each message still gets its own random numbers
+
+
+def test_italics_are_left_alone():
+    assert utils.transform_text(PROFILES['muffle'] | {'muffle': {"mmph": 100}}, "*hides*",
+                                rng=random.Random(1)) == "*hides*"
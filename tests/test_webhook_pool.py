@@ -0,0 +1,154 @@
+import asyncio
+import itertools
+import time
+
+import discord
+
+import utils
+
+ids = itertools.count(1)
+
+
+class FakeResponse:
+    def __init__(self, status: int, headers: dict | None = None) -> None:
+        self.status = status
+        self.reason = "Too Many Requests"
+        self.headers = headers or {}
+
+
+class FakeWebhook:
+    def __init__(self, name: str, sent: list, delay: float = 0.0) -> None:
+        self.id = next(ids)
+        self.name = name
+        self.token = "fake"
+        self.sent = sent
+        self.delay = delay
+        self.rate_limited = 0  # How many of the next sends get rate limited
+        self.retry_after = "30"
+
+    async def send(self, content: str, **kwargs) -> str:
+        await asyncio.sleep(self.delay)
+        if self.rate_limited:
+            self.rate_limited -= 1
+            raise discord.HTTPException(FakeResponse(429, {"Retry-After": self.retry_after}), "You are being rate limited.")
+        self.sent.append((self.id, content))
+        return content
+
+
+class FakeChannel:
+    def __init__(self, delay: float = 0.0) -> None:
+        self.sent = []
+        self.delay = delay
+        self.created: list[FakeWebhook] = []
+
+    async def webhooks(self) -> list[FakeWebhook]:
+        return list(self.created)
+
+    async def create_webhook(self, name: str) -> FakeWebhook:
+        webhook = FakeWebhook(name, self.sent, self.delay)
+        self.created.append(webhook)
+        return webhook
+
+
+def test_messages_from_the_same_author_keep_their_order():
+    async def main():
+        channel = FakeChannel(delay=0.01)
+        pool = utils.WebhookPool("TransforMate", size=3)
+        sends = []
+        for i in range(20):
+            sends.append(asyncio.create_task(pool.send(channel, f"a{i}", author_id=1)))
+            sends.append(asyncio.create_task(pool.send(channel, f"b{i}", author_id=2)))
+            if i % 3 == 0:
+                await asyncio.sleep(0.015)  # So some sends find the lock free for a moment, with others still waiting
+        await asyncio.gather(*sends)
+        for author in "ab":
+            assert [content for _, content in channel.sent if content[0] == author] == \
+                [f"{author}{i}" for i in range(20)]
+        assert pool.user_locks == {} and pool.user_waiters == {}
+    asyncio.run(main())
+
+
+def test_pool_only_grows_under_pressure():
+    async def main():
+        channel = FakeChannel(delay=0.01)
+        pool = utils.WebhookPool("TransforMate", size=3)
+        await asyncio.gather(*[pool.send(channel, f"m{i}", author_id=i) for i in range(utils.WEBHOOK_QUEUE_DEPTH)])
+        assert len(pool.webhooks) == 1
+        await asyncio.gather(*[pool.send(channel, f"m{i}", author_id=i) for i in range(3 * utils.WEBHOOK_QUEUE_DEPTH)])
+        assert len(pool.webhooks) > 1
+    asyncio.run(main())
+
+
+def test_rate_limited_webhooks_are_skipped():
+    async def main():
+        channel = FakeChannel()
+        pool = utils.WebhookPool("TransforMate", size=2)
+        await pool.send(channel, "first", author_id=1)
+        first = pool.webhooks[0]
+        first.rate_limited = 1
+        # Not retried here, so the outbound scheduler can back off the whole route instead
+        try:
+            await pool.send(channel, "second", author_id=1)
+        except discord.HTTPException as e:
+            assert e.status == 429
+        else:
+            raise AssertionError("The error should have been raised")
+        assert [content for _, content in channel.sent] == ["first"]
+        assert utils.webhook_rate_limits[first.id] > time.monotonic() + 20
+        assert await pool.send(channel, "second", author_id=1) == "second"
+        assert len(pool.webhooks) == 2
+        assert channel.sent[-1] == (pool.webhooks[1].id, "second")
+        assert pool.pick() is pool.webhooks[1]  # Until the rate limit is over
+    asyncio.run(main())
+
+
+def test_rate_limited_sends_are_retried_once_by_the_scheduler():
+    async def main():
+        channel = FakeChannel()
+        pool = utils.WebhookPool("TransforMate", size=2)
+        await pool.send(channel, "first")
+        pool.webhooks[0].rate_limited = 1
+        pool.webhooks[0].retry_after = "0.2"
+        scheduler = utils.OutboundScheduler(send_rate=1000, burst=1000)
+        start = time.monotonic()
+        assert await scheduler.submit(1, 1, ("send", 1), lambda: pool.send(channel, "second")) == "second"
+        # Not sent right away through a new webhook by the pool, but after backing off for as long as Discord asked
+        assert time.monotonic() - start >= 0.19
+        assert len(pool.webhooks) == 1
+        assert [content for _, content in channel.sent] == ["first", "second"]
+        assert scheduler.stats()['failures'] == 0
+    asyncio.run(main())
+
+
+def test_other_errors_are_not_retried():
+    async def main():
+        channel = FakeChannel()
+        pool = utils.WebhookPool("TransforMate", size=2)
+        await pool.send(channel, "first")
+
+        async def broken(*args, **kwargs):
+            raise discord.HTTPException(FakeResponse(500), "Internal Server Error")
+        pool.webhooks[0].send = broken
+        try:
+            await pool.send(channel, "second")
+        except discord.HTTPException as e:
+            assert e.status == 500
+        else:
+            raise AssertionError("The error should have been raised")
+        assert len(pool.webhooks) == 1
+    asyncio.run(main())
+
+
+def test_webhook_resolutions_are_counted():
+    async def main():
+        channel = FakeChannel()
+        existing = await channel.create_webhook("TransforMate")
+        pool = utils.WebhookPool("TransforMate", size=2)
+        before = utils.webhook_resolutions.copy()
+        await pool.send(channel, "first")  # Picks up the webhook that was already there
+        await pool.send(channel, "second")
+        utils.webhook_rate_limits[existing.id] = time.monotonic() + 30
+        await pool.send(channel, "third")  # Rate limited, so a new one is created for it
+        return {resolution: utils.webhook_resolutions[resolution] - before[resolution]
+                for resolution in ['fetched', 'reused', 'created']}
+    assert asyncio.run(main()) == {'fetched': 1, 'reused': 1, 'created': 1}